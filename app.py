@@ -1,21 +1,43 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, url_for
 import os
 import uuid
-from pydub import AudioSegment
+import base64
 from werkzeug.utils import secure_filename
 import json
 from datetime import datetime
 import threading
 import time
 import re
-from whisper_wrapper import WhisperCpp
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from whisper_wrapper import LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_THRESHOLD, WhisperCpp
+from metrics import CONTENT_TYPE, REGISTRY, observe_stage, stage_timer
+from model_profiles import profile_for
+from model_registry import get_model_registry, model_name_from_path, preload_models_from_env
+from model_router import AUTO_MODEL, ModelRouter, parse_quality
+import audio_utils
+import diarization
+import live
+import resumable_upload
+from pcm_audio import PcmAudio, PcmMemoryStore
+from diarization import assign_speakers
+from segments import EXPORT_FORMATS, MIMETYPES, SegmentTable, render, segments_filename
+from retention import RetentionPolicy, StorageJanitor
+from scheduler import JobScheduler, QueueFullError, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITIES
+from whisper_server import configure_server_pool, get_server_pool
+from transcription_cache import TranscriptionCache
+from events import EventBus, sse_stream
+from job_store import create_job_store, process_owner
+from zip_stream import ZIP_MIMETYPE, open_chunks, stream_zip
 from flask_cors import CORS
 
 app = Flask(__name__)
 # Enable CORS with credentials support for session cookies
 CORS(app, resources={r"/*": {
     "origins": ["http://localhost:5173", "http://127.0.0.1:5173"],
-    "supports_credentials": True
+    "supports_credentials": True,
+    "expose_headers": ["Location", "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Batch-Id",
+                       "X-Next-Cursor"]
 }})
 app.secret_key = 'sua-chave-secreta-aqui'
 # Configure session to work with CORS
@@ -26,65 +48,428 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'ogg', 'opus', 'm4a', 'flac'}
 TRANSCRIPTIONS_FOLDER = 'transcriptions'
+CACHE_FOLDER = 'cache'
 
 # Criar diretórios necessários
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(TRANSCRIPTIONS_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max para uploads em lote
-
-# Armazenamento de sessões de transcrição em lote
-batch_sessions = {}
+app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max para uploads em lote (e por parte em /uploads)
+
+# Uploads resumíveis (/uploads): partes gravadas direto no arquivo final
+RESUMABLE_FOLDER = os.path.join(UPLOAD_FOLDER, 'partial')
+RESUMABLE_MAX_BYTES = int(float(os.environ.get('RESUMABLE_UPLOAD_MAX_GB', 20)) * 1024 * 1024 * 1024)
+
+# Trabalhos (individuais e em lote) persistidos fora da memória do processo
+job_store = create_job_store(os.environ.get('JOB_STORE_URL', 'sqlite:///jobs.db'))
+
+# Fila central de transcrições (individuais e em lote)
+scheduler = JobScheduler()
+
+# Conversões de uploads em lote, em paralelo com a fila de transcrição
+DECODE_WORKERS = int(os.environ.get('DECODE_WORKERS') or max(1, min(4, (os.cpu_count() or 1) // 2)))
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='decode')
+
+# Diarização (opção 'diarize'), executada em paralelo com a inferência de cada arquivo
+DIARIZATION_WORKERS = int(os.environ.get('DIARIZATION_WORKERS') or scheduler.workers)
+diarize_pool = ThreadPoolExecutor(max_workers=DIARIZATION_WORKERS, thread_name_prefix='diarize')
+
+# Com language='auto', o idioma é detectado antes em um trecho curto, com o menor modelo
+LANGUAGE_DETECTION = os.environ.get('LANGUAGE_DETECTION', '1') != '0'
+# Confiança mínima para reaproveitar o idioma de um arquivo nos demais do lote ('same_language')
+LANGUAGE_PROPAGATION_MIN_PROBABILITY = float(os.environ.get('LANGUAGE_PROPAGATION_MIN_PROBABILITY', 0.8))
+# Áudio em inglês usa a variante .en do modelo, quando instalada
+ENGLISH_ONLY_MODELS = os.environ.get('ENGLISH_ONLY_MODELS', '1') != '0'
+shutting_down = threading.Event()
+
+# Estados finais de um arquivo do lote
+FINAL_FILE_STATUSES = ('completed', 'error')
+
+# Eventos de progresso enviados aos clientes via SSE
+event_bus = EventBus()
+
+# Servidores whisper.cpp residentes: um por worker, com as mesmas threads
+configure_server_pool(
+    max_instances=int(os.environ.get('WHISPER_SERVER_INSTANCES', scheduler.workers)),
+    threads=scheduler.threads_per_job
+)
+
+# Cache de transcrições indexado pelo hash do áudio convertido
+transcription_cache = None
+if os.environ.get('TRANSCRIPTION_CACHE', '1') != '0':
+    transcription_cache = TranscriptionCache(
+        CACHE_FOLDER,
+        max_bytes=int(float(os.environ.get('TRANSCRIPTION_CACHE_MAX_MB', 1024)) * 1024 * 1024),
+        max_age=float(os.environ.get('TRANSCRIPTION_CACHE_MAX_AGE_DAYS', 30)) * 86400
+    )
+
+# Áudio decodificado mantido em memória em vez de gravar o WAV em uploads/
+audio_memory = None
+if os.environ.get('AUDIO_IN_MEMORY', '0') == '1':
+    audio_memory = PcmMemoryStore(int(float(os.environ.get('AUDIO_IN_MEMORY_MAX_MB', 1024)) * 1024 * 1024))
+
+# Mapear idiomas para o formato do whisper.cpp
+LANGUAGE_MAPPING = {
+    'pt-BR': 'pt',
+    'en-US': 'en',
+    'es-ES': 'es',
+    'fr-FR': 'fr',
+    'de-DE': 'de',
+    'it-IT': 'it'
+}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def convert_to_wav(input_path, output_path):
-    """Converte arquivo de áudio para formato WAV"""
+    """
+    Converte arquivo de áudio para WAV 16 kHz mono e retorna o tempo de decodificação (ou None)
+
+    Com AUDIO_IN_MEMORY, o áudio decodificado fica em memória sob a chave
+    `output_path` e o WAV não é gravado.
+    """
     try:
-        audio = AudioSegment.from_file(input_path)
-        audio.export(output_path, format="wav")
-        return True
+        if audio_memory is not None:
+            audio, elapsed = audio_utils.decode_to_memory(input_path, name=output_path)
+            audio_memory.put(output_path, audio)
+        else:
+            elapsed = audio_utils.convert_to_wav(input_path, output_path)
+        observe_stage('decode', elapsed)
+        print(f"Conversão de {os.path.basename(input_path)} concluída em {elapsed:.2f}s")
+        return elapsed
     except Exception as e:
         print(f"Erro na conversão: {e}")
+        return None
+
+def audio_input(wav_path, original_filename=None):
+    """
+    Áudio a transcrever: o PcmAudio em memória (com AUDIO_IN_MEMORY) ou o caminho do WAV
+
+    Se o buffer foi descartado (limite de memória, reinício ou outro processo),
+    o upload original é decodificado novamente.
+    """
+    if audio_memory is None or os.path.exists(wav_path):
+        return wav_path
+    audio = audio_memory.get(wav_path)
+    if audio is None and original_filename:
+        original_path = os.path.join(UPLOAD_FOLDER, original_filename)
+        if os.path.exists(original_path) and convert_to_wav(original_path, wav_path) is not None:
+            audio = audio_memory.get(wav_path)
+    return audio or wav_path
+
+def audio_exists(audio):
+    return isinstance(audio, PcmAudio) or os.path.exists(audio)
+
+def audio_available(file_info):
+    """O arquivo pode ser transcrito de novo (WAV em disco, em memória ou original a decodificar)"""
+    if os.path.exists(file_info['wav_path']):
+        return True
+    if audio_memory is None:
         return False
+    return file_info['wav_path'] in audio_memory or os.path.exists(
+        os.path.join(UPLOAD_FOLDER, file_info['original_filename'])
+    )
+
+def release_audio(wav_path):
+    """Libera o áudio em memória de um arquivo já transcrito"""
+    if audio_memory is not None:
+        audio_memory.discard(wav_path)
+
+_whisper = None
+_whisper_lock = threading.Lock()
+
+def get_whisper():
+    """Instância compartilhada do WhisperCpp (o wrapper não guarda estado entre transcrições)"""
+    global _whisper
+    if _whisper is None:
+        with _whisper_lock:
+            if _whisper is None:
+                _whisper = WhisperCpp(cache=transcription_cache)
+    return _whisper
+
+def preload_models():
+    """Pré-carrega os modelos de PRELOAD_MODELS no page cache e nos servidores residentes"""
+    names = preload_models_from_env()
+    pool = get_server_pool()
+    if not names or pool is None or not pool.is_available():
+        return
+
+    def start_servers():
+        for name in names:
+            try:
+                pool.preload(get_model_registry().resolve(name))
+            except Exception as e:
+                print(f"Erro ao pré-carregar o modelo {name}: {e}")
+
+    threading.Thread(target=start_servers, name='server-preload', daemon=True).start()
+
+@contextmanager
+def chunk_workers(audio_path):
+    """
+    Trechos de um arquivo longo transcritos ao mesmo tempo
+
+    O trabalho já ocupa um slot do agendador; trechos adicionais só usam
+    slots ociosos emprestados (devolvidos ao final), para que os whisper-cli
+    paralelos não ultrapassem o orçamento de núcleos.
+    """
+    borrowed = 0
+    duration = audio_duration(audio_path)
+    if LONG_AUDIO_THRESHOLD and duration and duration > LONG_AUDIO_THRESHOLD:
+        chunks = -(-duration // LONG_AUDIO_CHUNK_SECONDS)
+        borrowed = scheduler.borrow_idle(int(chunks) - 1)
+    try:
+        yield 1 + borrowed
+    finally:
+        scheduler.release(borrowed)
 
-def transcribe_audio(audio_path, language='auto', model=None):
-    """Transcreve arquivo de áudio usando whisper.cpp"""
+def transcribe_audio(audio_path, language='auto', model=None, threads=None, on_segment=None):
+    """Transcreve arquivo de áudio usando whisper.cpp (on_segment recebe os segmentos ao final)"""
     try:
-        # Inicializar whisper.cpp
-        whisper = WhisperCpp()
-
-        # Mapear idiomas para o formato do whisper.cpp
-        language_mapping = {
-            'pt-BR': 'pt',
-            'en-US': 'en',
-            'es-ES': 'es',
-            'fr-FR': 'fr',
-            'de-DE': 'de',
-            'it-IT': 'it'
-        }
+        whisper = get_whisper()
 
-        whisper_lang = language_mapping.get(language, language)
+        whisper_lang = LANGUAGE_MAPPING.get(language, language)
 
         # Transcrever
-        result = whisper.transcribe(
-            audio_path=audio_path,
-            language=whisper_lang,
-            model=model,
-            output_format='json'
-        )
+        with chunk_workers(audio_path) as workers:
+            result = whisper.transcribe(
+                audio_path=audio_path,
+                language=whisper_lang,
+                model=model,
+                output_format='json',
+                threads=threads or scheduler.threads_per_job,
+                chunk_workers=workers
+            )
+
+        if on_segment:
+            for segment in result.get('segments', []):
+                on_segment(segment)
 
         return result.get('text', '').strip()
 
     except Exception as e:
         return f"Erro ao processar áudio com whisper.cpp: {e}"
 
+def transcribe_audio_stream(audio_path, language='auto', model=None, on_segment=None, threads=None):
+    """Transcreve chamando on_segment(segmento) a cada trecho decodificado; retorna o texto final"""
+    try:
+        whisper = get_whisper()
+        whisper_lang = LANGUAGE_MAPPING.get(language, language)
+
+        texts = []
+        with chunk_workers(audio_path) as workers:
+            for segment in whisper.transcribe_stream(
+                audio_path,
+                language=whisper_lang,
+                model=model,
+                threads=threads or scheduler.threads_per_job,
+                chunk_workers=workers
+            ):
+                texts.append(segment['text'])
+                if on_segment:
+                    on_segment(segment)
+
+        return ' '.join(texts).strip()
+
+    except Exception as e:
+        return f"Erro ao processar áudio com whisper.cpp: {e}"
+
+def prefer_streaming():
+    """
+    Transcrições usam o servidor residente (modelo já carregado) quando disponível;
+    sem ele, o whisper-cli é executado de qualquer forma e o streaming sai de graça
+    """
+    pool = get_server_pool()
+    return pool is None or not pool.is_available()
+
+def is_cached(audio_path, language='auto', model=None):
+    """Verifica se a transcrição já está no cache (para responder sem passar pela fila)"""
+    if transcription_cache is None:
+        return False
+    try:
+        whisper = get_whisper()
+        whisper_lang = LANGUAGE_MAPPING.get(language, language)
+        if whisper_lang == 'auto' and LANGUAGE_DETECTION:
+            # Com a pré-detecção, o resultado fica no cache com o idioma detectado
+            detected = whisper.cached_language(audio_path)
+            if detected is None:
+                return False
+            whisper_lang = detected['language']
+            model = language_model(model, whisper_lang)
+        return whisper.is_cached(audio_path, whisper_lang, model, 'json')
+    except Exception:
+        return False
+
+# Escolha automática do modelo para requisições com model='auto'
+model_router = ModelRouter(
+    lambda: get_model_registry().models().keys(),
+    default_quality=os.environ.get('MODEL_QUALITY', 'balanced')
+)
+
+def parse_routing_options(data):
+    """
+    Nível de qualidade e orçamento de latência (segundos) da requisição
+
+    Raises:
+        ValueError: Se algum dos valores for inválido
+    """
+    quality = parse_quality(data.get('quality'), model_router.default_quality)
+    budget = data.get('latency_budget')
+    if budget is not None:
+        try:
+            budget = float(budget)
+        except (TypeError, ValueError):
+            raise ValueError('latency_budget deve ser um número de segundos')
+        if budget <= 0:
+            raise ValueError('latency_budget deve ser positivo')
+    return {'quality': quality, 'latency_budget': budget}
+
+def parse_diarization_options(data):
+    """
+    Diarização pedida na requisição ('diarize') e número de falantes, se conhecido ('speakers')
+
+    Raises:
+        ValueError: Se os valores forem inválidos ou a diarização estiver indisponível
+    """
+    if not data.get('diarize'):
+        return {}
+    if not diarization.is_available():
+        raise ValueError('Diarização indisponível: instale o numpy')
+    speakers = data.get('speakers')
+    if speakers is not None:
+        try:
+            speakers = int(speakers)
+        except (TypeError, ValueError):
+            raise ValueError('speakers deve ser um número inteiro')
+        if speakers < 1:
+            raise ValueError('speakers deve ser positivo')
+    return {'diarize': True, 'speakers': speakers}
+
+def resolve_language(job_id, index, audio, options):
+    """
+    Idioma de um arquivo com language='auto', antes da transcrição
+
+    Na ordem: o já detectado para o arquivo (nova execução do lote), o de
+    outro arquivo do lote com confiança suficiente (opção 'same_language') ou
+    a detecção no trecho inicial do áudio. O resultado é gravado no arquivo.
+
+    Returns:
+        {'language', 'probability'} ou None (idioma informado, detecção
+        desativada ou com erro: o whisper.cpp detecta durante a transcrição)
+    """
+    if options.get('language', 'auto') != 'auto' or not LANGUAGE_DETECTION:
+        return None
+    job = job_store.get_job(job_id)
+    file_info = job['files'][index]
+    if file_info.get('language'):
+        return {'language': file_info['language'], 'probability': file_info.get('language_probability')}
+
+    detected = None
+    if options.get('same_language'):
+        for other in job['files']:
+            if other.get('language') and (other.get('language_probability') or 0) >= LANGUAGE_PROPAGATION_MIN_PROBABILITY:
+                detected = {'language': other['language'], 'probability': other['language_probability']}
+                break
+    if detected is None:
+        try:
+            detected = get_whisper().detect_language(audio, threads=scheduler.threads_per_job)
+        except Exception as e:
+            print(f"Erro na detecção de idioma: {e}")
+            return None
+
+    job_store.update_file(job_id, index, language=detected['language'],
+                          language_probability=detected['probability'])
+    return detected
+
+def language_model(model, language):
+    """Modelo para o idioma detectado: a variante .en do modelo escolhido para áudio em inglês"""
+    if language != 'en' or not ENGLISH_ONLY_MODELS:
+        return model
+    name = model or model_name_from_path(get_whisper().model_path)
+    return get_model_registry().english_variant(name) or model
+
+def start_diarization(audio, options):
+    """Inicia a diarização no diarize_pool, enquanto o whisper.cpp transcreve (None se não foi pedida)"""
+    if not options.get('diarize'):
+        return None
+
+    def run():
+        with stage_timer('diarize'):
+            return diarization.Diarizer().diarize(audio, options.get('speakers'))
+
+    return diarize_pool.submit(run)
+
+def apply_diarization(pending, segments, text):
+    """
+    Aguarda a diarização e marca o falante de cada segmento
+
+    Returns:
+        O texto com um parágrafo por turno de fala, ou o texto original se a
+        diarização não foi pedida ou falhou
+    """
+    if pending is None:
+        return text
+    try:
+        assign_speakers(segments, pending.result())
+    except Exception as e:
+        print(f"Erro na diarização: {e}")
+        return text
+    if not segments.has_speakers:
+        return text
+    return ''.join(render(segments, 'txt'))
+
+def route_model(audio, options):
+    """Modelo de um arquivo: o pedido na requisição ou, com 'auto', o escolhido pelo roteador"""
+    model = options.get('model')
+    if model != AUTO_MODEL:
+        return model
+    stats = scheduler.stats()
+    decision = model_router.choose(
+        audio_duration(audio),
+        queued=stats['queued'],
+        active=stats['active'],
+        workers=stats['workers'],
+        latency_budget=options.get('latency_budget'),
+        quality=options.get('quality')
+    )
+    print(f"Modelo automático para {audio_utils.source_name(audio)}: {decision.model} ({decision.reason})")
+    return decision.model
+
+# Serializa a escolha do modelo fixado de cada lote entre as threads do processo
+batch_routing_lock = threading.Lock()
+
+def batch_model(batch_id, audio, options):
+    """
+    Modelo de um arquivo do lote: com 'auto', escolhido no primeiro arquivo
+    despachado e fixado nas opções do lote, para que as estimativas de tempo
+    real atualizadas pelos primeiros arquivos do próprio lote não rebaixem os
+    seguintes para modelos menores (uma nova execução escolhe de novo)
+    """
+    if options.get('model') != AUTO_MODEL:
+        return route_model(audio, options)
+    with batch_routing_lock:
+        batch_options = job_store.get_job(batch_id)['options']
+        if batch_options.get('pinned_model'):
+            return batch_options['pinned_model']
+        model = route_model(audio, options)
+        job_store.update_job(batch_id, options=dict(batch_options, pinned_model=model))
+        return model
+
+def file_model(file_info, options):
+    """Modelo escolhido para o arquivo (None usa o modelo padrão do whisper.cpp)"""
+    model = file_info.get('model') or options.get('model')
+    return None if model == AUTO_MODEL else model
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def parse_priority(value, default):
+    """Converte a prioridade recebida na requisição ('high', 'normal', 'low')"""
+    if value is None:
+        return default
+    return PRIORITIES.get(str(value).lower(), default)
+
 def sanitize_session_name(name):
     """Sanitiza o nome da sessão para usar em nomes de arquivo"""
     if not name:
@@ -110,13 +495,17 @@ def upload_file():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         original_filename = f"{timestamp}_{filename}"
         original_path = os.path.join(app.config['UPLOAD_FOLDER'], original_filename)
-        file.save(original_path)
+        with stage_timer('upload_save'):
+            file.save(original_path)
 
-        # Converter para WAV
-        wav_filename = f"{timestamp}_converted.wav"
+        # Converter para WAV (sufixo único: uploads no mesmo segundo não se sobrescrevem)
+        wav_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_converted.wav"
         wav_path = os.path.join(app.config['UPLOAD_FOLDER'], wav_filename)
 
-        if convert_to_wav(original_path, wav_path):
+        track_upload(original_path, 'original')
+        decode_seconds = convert_to_wav(original_path, wav_path)
+        if decode_seconds is not None:
+            track_upload(wav_path, 'wav')
             # Salvar informações na sessão
             session['original_file'] = original_filename
             session['converted_file'] = wav_filename
@@ -125,6 +514,7 @@ def upload_file():
             return jsonify({
                 'message': 'Arquivo enviado com sucesso',
                 'filename': original_filename,
+                'decode_seconds': round(decode_seconds, 3),
                 'ready_for_transcription': True
             })
         else:
@@ -134,7 +524,12 @@ def upload_file():
 
 @app.route('/upload_batch', methods=['POST'])
 def upload_batch():
-    """Upload de múltiplos arquivos em lote"""
+    """
+    Upload de múltiplos arquivos em lote
+
+    Responde assim que os arquivos estão gravados em disco; a conversão para
+    WAV acontece em segundo plano (estados 'uploaded' → 'converting' → 'pending').
+    """
     if 'audio_files' not in request.files:
         return jsonify({'error': 'Nenhum arquivo enviado'}), 400
 
@@ -163,22 +558,19 @@ def upload_batch():
             file_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")[:17]
             original_filename = f"{file_timestamp}_{filename}"
             original_path = os.path.join(app.config['UPLOAD_FOLDER'], original_filename)
-            file.save(original_path)
-
-            # Converter para WAV
-            wav_filename = f"{file_timestamp}_converted.wav"
-            wav_path = os.path.join(app.config['UPLOAD_FOLDER'], wav_filename)
-
-            if convert_to_wav(original_path, wav_path):
-                uploaded_files.append({
-                    'original_filename': original_filename,
-                    'display_name': filename,
-                    'converted_file': wav_filename,
-                    'wav_path': wav_path,
-                    'status': 'pending'
-                })
-            else:
-                errors.append(f"Falha ao converter: {filename}")
+            with stage_timer('upload_save'):
+                file.save(original_path)
+
+            # Sufixo único: vários arquivos são gravados no mesmo centésimo de segundo
+            wav_filename = f"{file_timestamp}_{uuid.uuid4().hex[:8]}_converted.wav"
+            uploaded_files.append({
+                'original_filename': original_filename,
+                'display_name': filename,
+                'converted_file': wav_filename,
+                'wav_path': os.path.join(app.config['UPLOAD_FOLDER'], wav_filename),
+                'status': 'uploaded',
+                'owner': process_owner()
+            })
         else:
             errors.append(f"Formato não suportado: {file.filename}")
 
@@ -186,17 +578,21 @@ def upload_batch():
         return jsonify({'error': 'Nenhum arquivo válido foi enviado', 'details': errors}), 400
 
     # Armazenar informações da sessão de lote
-    batch_sessions[batch_id] = {
-        'session_name': session_name,
-        'sanitized_name': sanitized_session_name,
-        'timestamp': timestamp,
-        'files': uploaded_files,
-        'total': len(uploaded_files),
-        'completed': 0,
-        'status': 'ready',
-        'transcriptions': [],
-        'errors': errors
-    }
+    job_store.create_job(
+        batch_id,
+        kind='batch',
+        session_name=session_name,
+        sanitized_name=sanitized_session_name,
+        timestamp=timestamp,
+        total=len(uploaded_files),
+        status='ready',
+        errors=errors
+    )
+    for index, file_info in enumerate(uploaded_files):
+        job_store.add_file(batch_id, index, **file_info)
+        track_upload(os.path.join(app.config['UPLOAD_FOLDER'], file_info['original_filename']),
+                     'original', batch_id, index)
+        decode_pool.submit(ingest_batch_file, batch_id, index)
     
     # Salvar batch_id na sessão do usuário
     session['batch_id'] = batch_id
@@ -210,316 +606,1348 @@ def upload_batch():
         'ready_for_transcription': True
     })
 
+def ingest_batch_file(batch_id, index):
+    """
+    Trabalho do decode_pool: converte um arquivo enviado para WAV
+
+    Se a transcrição do lote já foi iniciada, o arquivo convertido segue
+    direto para a fila, sobrepondo a conversão dos próximos arquivos com a
+    transcrição dos anteriores.
+    """
+    if shutting_down.is_set():
+        # Continua 'uploaded' e será retomado pelo próximo processo
+        return
+    if not job_store.claim_file(batch_id, index, 'uploaded', status='converting', owner=process_owner()):
+        return
+    publish_file_event(batch_id, index)
+
+    file_info = job_store.get_file(batch_id, index)
+    original_path = os.path.join(app.config['UPLOAD_FOLDER'], file_info['original_filename'])
+    decode_seconds = convert_to_wav(original_path, file_info['wav_path'])
+
+    if decode_seconds is None:
+        job_store.update_file(batch_id, index, status='error', error='Falha ao converter arquivo de áudio')
+        job_store.append_job_error(batch_id, f"Falha ao converter: {file_info['display_name']}")
+        publish_file_event(batch_id, index)
+        mark_batch_file_finished(batch_id)
+        return
+
+    track_upload(file_info['wav_path'], 'wav', batch_id, index)
+    job_store.update_file(batch_id, index, status='pending', decode_seconds=round(decode_seconds, 3))
+    publish_file_event(batch_id, index)
+
+    batch = job_store.get_job(batch_id)
+    if batch is not None and batch['status'] == 'processing':
+        priority = batch['options'].get('priority', PRIORITY_NORMAL)
+        dispatch_batch_file(batch_id, index, priority)
+
+def tus_response(status=204, headers=None, body=''):
+    """Resposta do protocolo tus (sempre com Tus-Resumable e sem cache)"""
+    response = Response(body, status=status)
+    response.headers['Tus-Resumable'] = resumable_upload.TUS_VERSION
+    response.headers['Cache-Control'] = 'no-store'
+    for name, value in (headers or {}).items():
+        response.headers[name] = str(value)
+    return response
+
+@app.route('/uploads', methods=['OPTIONS'])
+def resumable_upload_options():
+    """Capacidades do servidor tus"""
+    return tus_response(headers={
+        'Tus-Version': resumable_upload.TUS_VERSION,
+        'Tus-Extension': resumable_upload.TUS_EXTENSIONS,
+        'Tus-Max-Size': RESUMABLE_MAX_BYTES,
+        'Tus-Checksum-Algorithm': ','.join(resumable_upload.CHECKSUM_ALGORITHMS)
+    })
+
+@app.route('/uploads', methods=['POST'])
+def create_resumable_upload():
+    """
+    Cria um upload resumível (tus 'creation')
+
+    Cabeçalhos:
+        Upload-Length: tamanho total do arquivo em bytes
+        Upload-Metadata: 'filename' (obrigatório), 'batch_id' (lote existente),
+                         'session_name' (novo lote) e 'crc32' (hex, arquivo inteiro)
+
+    O arquivo entra em um lote (novo ou informado) e é convertido assim que a
+    última parte chega.
+    """
+    try:
+        length = int(request.headers.get('Upload-Length', ''))
+        metadata = resumable_upload.parse_metadata(request.headers.get('Upload-Metadata', ''))
+        expected_crc32 = int(metadata['crc32'], 16) if metadata.get('crc32') else None
+    except ValueError as e:
+        return tus_response(400, body=str(e) or 'Upload-Length inválido')
+    if length < 0:
+        return tus_response(400, body='Upload-Length inválido')
+    if length > RESUMABLE_MAX_BYTES:
+        return tus_response(413, body='Arquivo maior que o limite do servidor')
+
+    display_name = secure_filename(metadata.get('filename', ''))
+    if not display_name or not allowed_file(display_name):
+        return tus_response(400, body='Formato de arquivo não permitido')
+
+    batch_id = metadata.get('batch_id')
+    if batch_id:
+        batch = job_store.get_job(batch_id)
+        if batch is None or batch['kind'] != 'batch':
+            return tus_response(404, body='Sessão de lote não encontrada')
+        if batch['status'] == 'completed':
+            return tus_response(409, body='Lote já concluído')
+    else:
+        session_name = metadata.get('session_name', '').strip()
+        batch_id = str(uuid.uuid4())[:8]
+        job_store.create_job(
+            batch_id,
+            kind='batch',
+            session_name=session_name,
+            sanitized_name=sanitize_session_name(session_name),
+            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+            total=0,
+            status='ready',
+            errors=[]
+        )
+
+    upload_id = uuid.uuid4().hex
+    file_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")[:17]
+    wav_filename = f"{file_timestamp}_{upload_id[:8]}_converted.wav"
+    index = job_store.increment_job(batch_id, total=1)['total'] - 1
+    job_store.add_file(
+        batch_id,
+        index,
+        display_name=display_name,
+        original_filename=f"{file_timestamp}_{display_name}",
+        converted_file=wav_filename,
+        wav_path=os.path.join(app.config['UPLOAD_FOLDER'], wav_filename),
+        status='receiving',
+        owner=process_owner()
+    )
+
+    path = os.path.join(RESUMABLE_FOLDER, f"{upload_id}.part")
+    resumable_upload.create_file(path)
+    track_upload(path, 'partial', batch_id, index)
+    job_store.create_upload(
+        upload_id,
+        job_id=batch_id,
+        idx=index,
+        filename=display_name,
+        path=path,
+        length=length,
+        expected_crc32=expected_crc32
+    )
+    session['batch_id'] = batch_id
+
+    if length == 0:
+        finish_resumable_upload(upload_id)
+
+    return tus_response(201, headers={
+        'Location': url_for('resumable_upload_offset', upload_id=upload_id),
+        'Upload-Offset': 0,
+        'Upload-Batch-Id': batch_id
+    })
+
+@app.route('/uploads/<upload_id>', methods=['HEAD'])
+def resumable_upload_offset(upload_id):
+    """Deslocamento atual do upload, para retomar após uma queda"""
+    upload = job_store.get_upload(upload_id)
+    if upload is None:
+        return tus_response(404)
+    return tus_response(200, headers={
+        'Upload-Offset': upload['received'],
+        'Upload-Length': upload['length'],
+        'Upload-Batch-Id': upload['job_id']
+    })
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def resumable_upload_patch(upload_id):
+    """
+    Recebe uma parte do upload a partir de Upload-Offset
+
+    O corpo é lido diretamente de request.stream e gravado no arquivo. Com
+    Upload-Checksum, uma parte divergente é descartada (status 460).
+    """
+    if request.mimetype != 'application/offset+octet-stream':
+        return tus_response(415, body='Content-Type deve ser application/offset+octet-stream')
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        checksum = resumable_upload.parse_checksum(request.headers.get('Upload-Checksum'))
+    except ValueError as e:
+        return tus_response(400, body=str(e) or 'Upload-Offset inválido')
+
+    upload = job_store.get_upload(upload_id)
+    if upload is None:
+        return tus_response(404)
+    if not job_store.claim_upload(upload_id, process_owner()):
+        return tus_response(423, body='Outra parte deste upload está sendo gravada')
+
+    received, crc32 = upload['received'], upload['crc32']
+    try:
+        # Reler após a reserva: outra requisição pode ter acabado de gravar
+        upload = job_store.get_upload(upload_id)
+        received, crc32 = upload['received'], upload['crc32']
+        if upload['status'] != 'receiving' or offset != received:
+            return tus_response(409, headers={'Upload-Offset': received},
+                                body='Upload-Offset não confere com o servidor')
+
+        with stage_timer('upload_save'):
+            received, crc32 = resumable_upload.write_chunk(
+                upload['path'],
+                offset,
+                request.stream,
+                crc32,
+                checksum=checksum,
+                max_bytes=upload['length'] - offset
+            )
+    except resumable_upload.ChecksumMismatch as e:
+        return tus_response(460, headers={'Upload-Offset': received}, body=str(e))
+    except ValueError as e:
+        return tus_response(413, headers={'Upload-Offset': received}, body=str(e))
+    finally:
+        job_store.update_upload(upload_id, writer=None, received=received, crc32=crc32)
+        job_store.track_file(upload['path'], 'uploads', 'partial', received,
+                             job_id=upload['job_id'], idx=upload['idx'])
+
+    if received == upload['length']:
+        finish_resumable_upload(upload_id)
+
+    return tus_response(headers={'Upload-Offset': received})
+
+def finish_resumable_upload(upload_id):
+    """Move o arquivo completo para uploads/ e o envia para conversão"""
+    upload = job_store.get_upload(upload_id)
+    batch_id, index = upload['job_id'], upload['idx']
+    file_info = job_store.get_file(batch_id, index)
+
+    if upload['expected_crc32'] is not None and upload['crc32'] != upload['expected_crc32']:
+        job_store.update_upload(upload_id, status='error')
+        job_store.update_file(batch_id, index, status='error', error='Checksum do arquivo não confere')
+        job_store.append_job_error(batch_id, f"Checksum não confere: {file_info['display_name']}")
+        publish_file_event(batch_id, index)
+        mark_batch_file_finished(batch_id)
+        return
+
+    original_path = os.path.join(app.config['UPLOAD_FOLDER'], file_info['original_filename'])
+    os.replace(upload['path'], original_path)
+    job_store.untrack_file(upload['path'])
+    track_upload(original_path, 'original', batch_id, index)
+    job_store.update_upload(upload_id, status='completed')
+    job_store.update_file(batch_id, index, status='uploaded')
+    publish_file_event(batch_id, index)
+    decode_pool.submit(ingest_batch_file, batch_id, index)
+
+def audio_duration(audio):
+    """Duração do WAV (ou PcmAudio) em segundos, ou None se não for possível ler"""
+    try:
+        return round(audio_utils.get_wav_duration(audio), 3)
+    except Exception:
+        return None
+
+def track_upload(path, role, job_id=None, idx=None):
+    """Contabiliza um arquivo em UPLOAD_FOLDER (tamanho, dono) para /storage_info e a retenção"""
+    if audio_memory is not None and role == 'wav':
+        # O WAV convertido fica em memória, não em disco
+        return
+    fields = {'job_id': job_id, 'idx': idx} if job_id is not None else {}
+    job_store.track_file(path, 'uploads', role, os.path.getsize(path), **fields)
+
+def record_transcription(filename, **fields):
+    """Registra um arquivo gravado em TRANSCRIPTIONS_FOLDER no índice do histórico"""
+    path = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
+    stat = os.stat(path)
+    job_store.record_transcription(filename, size=stat.st_size, created_at=stat.st_mtime, **fields)
+    job_store.track_file(path, 'transcriptions', fields.get('kind', 'transcription'), stat.st_size,
+                         modified_at=stat.st_mtime)
+
+def index_transcript(filename, kind, text, segments=None):
+    """Indexa a transcrição para /search, por segmento quando há tempos"""
+    if segments:
+        rows = [(seg.start, seg.end, seg.text) for seg in segments]
+    else:
+        rows = [(None, None, text)]
+    job_store.index_transcript(filename, kind, rows)
+
+def save_segments(transcription_filename, segments, job_id=None, idx=None):
+    """Grava os segmentos (tempos, texto e probabilidade) ao lado da transcrição, para /export"""
+    if not segments:
+        return
+    path = os.path.join(TRANSCRIPTIONS_FOLDER, segments_filename(transcription_filename))
+    segments.dump(path)
+    job_store.track_file(path, 'transcriptions', 'segments', os.path.getsize(path), job_id=job_id, idx=idx)
+
+def load_segments(transcription_filename):
+    """Segmentos gravados de uma transcrição, ou None se não existirem"""
+    path = os.path.join(TRANSCRIPTIONS_FOLDER, segments_filename(transcription_filename))
+    try:
+        return SegmentTable.load(path)
+    except (OSError, ValueError):
+        return None
+
+def process_single(job_id, cached=False):
+    """Trabalho do agendador: transcreve o arquivo de uma transcrição individual"""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return
+    options = job['options']
+    file_info = job['files'][0]
+    model = file_model(file_info, options)
+    audio = audio_input(file_info['wav_path'], file_info['original_filename'])
+
+    job_store.update_job(job_id, status='processing')
+    job_store.update_file(job_id, 0, status='processing', owner=process_owner())
+    event_bus.publish(f"single:{job_id}", 'status', {'status': 'processing'})
+    try:
+        # Persistir e publicar cada segmento assim que o whisper.cpp o decodifica
+        segments = SegmentTable()
+
+        def on_segment(segment):
+            segments.append(segment)
+            job_store.append_partial_text(job_id, 0, segment['text'])
+            event_bus.publish(f"single:{job_id}", 'segment', segment)
+
+        language = options.get('language', 'auto')
+        detected = resolve_language(job_id, 0, audio, options)
+        if detected:
+            language = detected['language']
+            model = language_model(model, language)
+
+        speakers = start_diarization(audio, options)
+        started = time.perf_counter()
+        if prefer_streaming():
+            text = transcribe_audio_stream(audio, language, model, on_segment)
+        else:
+            # Servidor residente: os segmentos são publicados ao fim da inferência
+            text = transcribe_audio(audio, language, model, on_segment=on_segment)
+        duration = audio_duration(audio)
+        if segments and not cached:
+            model_router.observe(model, duration, time.perf_counter() - started)
+        text = apply_diarization(speakers, segments, text)
+
+        # Salvar transcrição
+        transcription_filename = f"{job['timestamp']}_{job_id}_transcription.txt"
+        transcription_path = os.path.join(TRANSCRIPTIONS_FOLDER, transcription_filename)
+
+        with stage_timer('result_write'):
+            with open(transcription_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            record_transcription(
+                transcription_filename,
+                kind='transcription',
+                job_id=job_id,
+                source_name=file_info['display_name'],
+                language=language,
+                model=model,
+                duration=duration
+            )
+            index_transcript(transcription_filename, 'transcription', text, segments)
+            save_segments(transcription_filename, segments, job_id, 0)
+
+        job_store.update_file(job_id, 0, status='completed', transcription=text,
+                              transcription_file=transcription_filename, partial_text=None, model=model)
+        job_store.update_job(job_id, status='completed', completed=1, finished=1,
+                             result_text=text, result_file=transcription_filename)
+
+        event_bus.publish(f"single:{job_id}", 'completed', {
+            'status': 'completed',
+            'text': text,
+            'filename': transcription_filename,
+            'model': model,
+            'language': language,
+            'language_probability': detected['probability'] if detected else None
+        })
+        JOBS_TOTAL.inc(kind='single', status='completed', cached=str(cached).lower())
+
+    except Exception as e:
+        job_store.update_file(job_id, 0, status='error', error=str(e))
+        job_store.update_job(job_id, status='error', finished=1, error=str(e))
+        JOBS_TOTAL.inc(kind='single', status='error', cached=str(cached).lower())
+
+        event_bus.publish(f"single:{job_id}", 'failed', {
+            'status': 'error',
+            'error': str(e)
+        })
+
+    finally:
+        release_audio(file_info['wav_path'])
+
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     data = request.get_json()
     language = data.get('language', 'auto')
     model = data.get('model', None)
+    try:
+        routing = parse_routing_options(data)
+        diarize = parse_diarization_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Debug logging
-    print(f"DEBUG: Session keys: {list(session.keys())}")
-    print(f"DEBUG: Session data: {dict(session)}")
-    
     if 'converted_file' not in session:
         return jsonify({'error': 'Nenhum arquivo carregado'}), 400
 
     wav_path = os.path.join(app.config['UPLOAD_FOLDER'], session['converted_file'])
+    audio = audio_input(wav_path, session.get('original_file'))
 
-    if not os.path.exists(wav_path):
+    if not audio_exists(audio):
         return jsonify({'error': 'Arquivo de áudio não encontrado'}), 404
 
-    # Transcrever em uma thread separada para não bloquear
-    # Obter dados necessários da sessão antes de iniciar a thread
+    # Obter dados necessários da sessão antes de enfileirar
     upload_time = session.get('upload_time', datetime.now().strftime("%Y%m%d_%H%M%S"))
     # Gerar um ID único para esta transcrição
-    if 'transcription_id' not in session:
-        session['transcription_id'] = str(int(time.time()))
-    session_id = session['transcription_id']
-    
-    def transcribe_thread():
-        try:
-            text = transcribe_audio(wav_path, language, model)
+    job_id = f"t{uuid.uuid4().hex[:12]}"
+    session['transcription_id'] = job_id
+
+    options = {'language': language, 'model': model, **routing, **diarize}
+    model = route_model(audio, options)
+    job_store.create_job(
+        job_id,
+        kind='single',
+        timestamp=upload_time,
+        total=1,
+        status='queued',
+        options=options
+    )
+    job_store.add_file(
+        job_id, 0,
+        display_name=session.get('original_file', ''),
+        original_filename=session.get('original_file'),
+        converted_file=session['converted_file'],
+        wav_path=wav_path,
+        status='queued',
+        queue_id=f"single:{job_id}",
+        owner=process_owner(),
+        model=model
+    )
+    track_upload(wav_path, 'wav', job_id, 0)
+
+    # Resultado já em cache: à frente da fila e sem inferência, mas fora da
+    # requisição (detecção de idioma, diarização e gravação rodam no worker)
+    cached = is_cached(audio, language, model)
+
+    # Enfileirar transcrição no agendador central
+    try:
+        position = scheduler.submit(
+            f"single:{job_id}",
+            process_single,
+            job_id,
+            cached=cached,
+            priority=PRIORITY_HIGH if cached else parse_priority(data.get('priority'), PRIORITY_HIGH)
+        )
+    except QueueFullError as e:
+        job_store.update_file(job_id, 0, status='error', error=str(e))
+        job_store.update_job(job_id, status='error', finished=1, error=str(e))
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({
+        'message': 'Transcrição iniciada (cache)' if cached else 'Transcrição iniciada',
+        'cached': cached,
+        'queue_position': position,
+        'model': model
+    })
 
-            # Salvar transcrição
-            transcription_filename = f"{upload_time}_transcription.txt"
-            transcription_path = os.path.join(TRANSCRIPTIONS_FOLDER, transcription_filename)
+def process_batch_file(batch_id, index, cached=False):
+    """Trabalho do agendador: transcreve um arquivo de um lote"""
+    job = job_store.get_job(batch_id)
+    if job is None:
+        return
+    file_info = job['files'][index]
+    options = job['options']
+    language = options.get('language', 'auto')
+    model = file_model(file_info, options)
+    session_name = job['sanitized_name']
+    timestamp = job['timestamp']
+
+    job_store.update_file(batch_id, index, status='processing', owner=process_owner())
+    job_store.update_job(batch_id, current_file=max(job['current_file'], index + 1))
+    publish_file_event(batch_id, index)
 
+    try:
+        wav_path = file_info['wav_path']
+        audio = audio_input(wav_path, file_info['original_filename'])
+
+        if not audio_exists(audio):
+            job_store.update_file(batch_id, index, status='error', error='Arquivo não encontrado')
+            job_store.append_job_error(batch_id, f"Erro em {file_info['display_name']}: Arquivo não encontrado")
+            publish_file_event(batch_id, index)
+            return
+
+        detected = resolve_language(batch_id, index, audio, options)
+        if detected:
+            language = detected['language']
+            model = language_model(model, language)
+
+        segments = SegmentTable()
+        # Diarização em paralelo com a inferência, sobre o mesmo áudio
+        speakers = start_diarization(audio, options)
+        started = time.perf_counter()
+        if prefer_streaming():
+            def on_segment(segment):
+                segments.append(segment)
+                job_store.append_partial_text(batch_id, index, segment['text'])
+                event_bus.publish(f"batch:{batch_id}", 'segment', dict(segment, index=index))
+
+            text = transcribe_audio_stream(audio, language, model, on_segment)
+        else:
+            text = transcribe_audio(audio, language, model, on_segment=segments.append)
+        duration = audio_duration(audio)
+        if segments and not cached:
+            model_router.observe(model, duration, time.perf_counter() - started)
+        text = apply_diarization(speakers, segments, text)
+
+        # Gerar nome do arquivo de transcrição
+        file_index = str(index + 1).zfill(2)
+        if session_name:
+            transcription_filename = f"{timestamp}_{session_name}_{file_index}_transcription.txt"
+        else:
+            transcription_filename = f"{timestamp}_batch_{file_index}_transcription.txt"
+
+        transcription_path = os.path.join(TRANSCRIPTIONS_FOLDER, transcription_filename)
+
+        with stage_timer('result_write'):
             with open(transcription_path, 'w', encoding='utf-8') as f:
                 f.write(text)
+            record_transcription(
+                transcription_filename,
+                kind='transcription',
+                job_id=batch_id,
+                session_name=job['session_name'],
+                source_name=file_info['display_name'],
+                language=language,
+                model=model,
+                duration=duration
+            )
+            index_transcript(transcription_filename, 'transcription', text, segments)
+            save_segments(transcription_filename, segments, batch_id, index)
+
+        job_store.update_file(batch_id, index, status='completed', transcription=text,
+                              transcription_file=transcription_filename, partial_text=None, model=model)
+        job_store.increment_job(batch_id, completed=1)
+        publish_file_event(batch_id, index, text=text)
+        JOBS_TOTAL.inc(kind='batch', status='completed', cached=str(cached).lower())
 
-            # Usar app_context para acessar a sessão
-            with app.app_context():
-                # Obter a sessão usando o session_id
-                from flask import session
-                # Criar uma nova sessão para armazenar os resultados
-                # Como não podemos modificar a sessão original diretamente,
-                # vamos armazenar os resultados em um arquivo temporário
-                result_file = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_result.json")
-                with open(result_file, 'w') as f:
-                    json.dump({
-                        'transcription': text,
-                        'transcription_file': transcription_filename
-                    }, f)
-
-        except Exception as e:
-            # Armazenar erro em um arquivo temporário
-            with app.app_context():
-                result_file = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_result.json")
-                with open(result_file, 'w') as f:
-                    json.dump({
-                        'transcription_error': str(e)
-                    }, f)
+    except Exception as e:
+        job_store.update_file(batch_id, index, status='error', error=str(e))
+        job_store.append_job_error(batch_id, f"Erro em {file_info['display_name']}: {str(e)}")
+        publish_file_event(batch_id, index)
+        JOBS_TOTAL.inc(kind='batch', status='error', cached=str(cached).lower())
+
+    finally:
+        release_audio(file_info['wav_path'])
+        mark_batch_file_finished(batch_id)
+
+def mark_batch_file_finished(batch_id):
+    """Fecha o lote quando todos os arquivos chegaram a um estado final"""
+    batch = job_store.get_job(batch_id)
+    if batch is None or batch['status'] != 'processing':
+        return
+    if any(f['status'] not in FINAL_FILE_STATUSES for f in batch['files']):
+        return
+    # Apenas quem fizer a transição fecha o lote
+    if job_store.claim_job(batch_id, 'processing', status='completed'):
+        finish_batch(batch_id)
+
+def batch_transcriptions(job):
+    """Transcrições concluídas do lote, na ordem original dos arquivos"""
+    return [{
+        'index': f['idx'],
+        'filename': f['display_name'],
+        'transcription_file': f['transcription_file'],
+        'language': f.get('language'),
+        'text': f['transcription']
+    } for f in job['files'] if f['status'] == 'completed']
+
+def finish_batch(batch_id):
+    batch = job_store.get_job(batch_id)
+    session_name = batch['sanitized_name']
+    timestamp = batch['timestamp']
+    transcriptions = batch_transcriptions(batch)
+
+    # Salvar resumo da sessão se houver nome
+    if session_name and transcriptions:
+        summary_filename = f"{timestamp}_{session_name}_resumo.md"
+        summary_path = os.path.join(TRANSCRIPTIONS_FOLDER, summary_filename)
+
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(f"# Sessão de Transcrição: {batch['session_name']}\n\n")
+            f.write(f"**Data:** {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+            f.write(f"**Total de arquivos:** {batch['total']}\n")
+            f.write(f"**Transcrições concluídas:** {batch['completed']}\n\n")
+            f.write("---\n\n")
 
-    # Iniciar transcrição em background
-    thread = threading.Thread(target=transcribe_thread)
-    thread.daemon = True
-    thread.start()
+            for idx, trans in enumerate(transcriptions, 1):
+                f.write(f"## {idx}. {trans['filename']}\n\n")
+                f.write(f"{trans['text']}\n\n")
+                f.write("---\n\n")
+        record_transcription(
+            summary_filename,
+            kind='summary',
+            job_id=batch_id,
+            session_name=batch['session_name'],
+            language=batch['options'].get('language'),
+            model=batch['options'].get('model')
+        )
+        job_store.index_transcript(
+            summary_filename,
+            'summary',
+            [(None, None, f"{trans['filename']}: {trans['text']}") for trans in transcriptions]
+        )
 
-    return jsonify({'message': 'Transcrição iniciada'})
+    event_bus.publish(f"batch:{batch_id}", 'completed', batch_status_payload(batch))
+
+def dispatch_batch_file(batch_id, index, priority=PRIORITY_NORMAL):
+    """
+    Envia um arquivo convertido ('pending') para transcrição, uma única vez
+
+    Returns:
+        Posição na fila, 0 se o resultado está no cache (processado com
+        prioridade alta), ou None se o arquivo não estava pendente ou foi
+        recusado pela fila
+    """
+    queue_id = f"batch:{batch_id}:{index}"
+    batch = job_store.get_job(batch_id)
+    file_info = batch['files'][index]
+    if file_info['status'] != 'pending':
+        return None
+
+    options = batch['options']
+    audio = audio_input(file_info['wav_path'], file_info['original_filename'])
+    model = batch_model(batch_id, audio, options)
+    if not job_store.claim_file(batch_id, index, 'pending', status='queued',
+                                queue_id=queue_id, owner=process_owner(), model=model):
+        return None
+    publish_file_event(batch_id, index)
+
+    # Resultado já em cache: à frente da fila e sem inferência, fora da requisição
+    cached = is_cached(audio, options.get('language', 'auto'), model)
+    try:
+        position = scheduler.submit(queue_id, process_batch_file, batch_id, index, cached=cached,
+                                    priority=PRIORITY_HIGH if cached else priority)
+        return 0 if cached else position
+    except QueueFullError as e:
+        # Arquivos não admitidos contam como finalizados com erro
+        job_store.update_file(batch_id, index, status='error', error=str(e))
+        job_store.append_job_error(batch_id, f"Erro em {file_info['display_name']}: {str(e)}")
+        publish_file_event(batch_id, index)
+        mark_batch_file_finished(batch_id)
+        return None
 
 @app.route('/transcribe_batch', methods=['POST'])
 def transcribe_batch():
-    """Transcreve múltiplos arquivos em lote"""
+    """
+    Transcreve múltiplos arquivos em lote
+
+    Arquivos já convertidos são enfileirados agora; os que ainda estão em
+    conversão são enfileirados pelo decode_pool assim que ficam prontos.
+    """
     data = request.get_json()
     language = data.get('language', 'auto')
     model = data.get('model', None)
     batch_id = data.get('batch_id') or session.get('batch_id')
+    try:
+        routing = parse_routing_options(data)
+        diarize = parse_diarization_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not batch_id or batch_id not in batch_sessions:
+    batch = job_store.get_job(batch_id) if batch_id else None
+    if batch is None or batch['kind'] != 'batch':
         return jsonify({'error': 'Sessão de lote não encontrada'}), 400
 
-    batch = batch_sessions[batch_id]
-    
     if batch['status'] == 'processing':
         return jsonify({'error': 'Transcrição já em andamento'}), 400
 
-    batch['status'] = 'processing'
-    batch['completed'] = 0
-    batch['current_file'] = 0
-
-    def transcribe_batch_thread():
-        session_name = batch['sanitized_name']
-        timestamp = batch['timestamp']
-        
-        for i, file_info in enumerate(batch['files']):
-            batch['current_file'] = i + 1
-            file_info['status'] = 'processing'
-            
-            try:
-                wav_path = file_info['wav_path']
-                
-                if not os.path.exists(wav_path):
-                    file_info['status'] = 'error'
-                    file_info['error'] = 'Arquivo não encontrado'
-                    continue
-
-                text = transcribe_audio(wav_path, language, model)
-                
-                # Gerar nome do arquivo de transcrição
-                file_index = str(i + 1).zfill(2)
-                if session_name:
-                    transcription_filename = f"{timestamp}_{session_name}_{file_index}_transcription.txt"
-                else:
-                    transcription_filename = f"{timestamp}_batch_{file_index}_transcription.txt"
-                
-                transcription_path = os.path.join(TRANSCRIPTIONS_FOLDER, transcription_filename)
-
-                with open(transcription_path, 'w', encoding='utf-8') as f:
-                    f.write(text)
-
-                file_info['status'] = 'completed'
-                file_info['transcription'] = text
-                file_info['transcription_file'] = transcription_filename
-                batch['transcriptions'].append({
-                    'filename': file_info['display_name'],
-                    'transcription_file': transcription_filename,
-                    'text': text
-                })
-                batch['completed'] += 1
-
-            except Exception as e:
-                file_info['status'] = 'error'
-                file_info['error'] = str(e)
-                batch['errors'].append(f"Erro em {file_info['display_name']}: {str(e)}")
-
-        batch['status'] = 'completed'
-        
-        # Salvar resumo da sessão se houver nome
-        if session_name and batch['transcriptions']:
-            summary_filename = f"{timestamp}_{session_name}_resumo.md"
-            summary_path = os.path.join(TRANSCRIPTIONS_FOLDER, summary_filename)
-            
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                f.write(f"# Sessão de Transcrição: {batch['session_name']}\n\n")
-                f.write(f"**Data:** {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-                f.write(f"**Total de arquivos:** {batch['total']}\n")
-                f.write(f"**Transcrições concluídas:** {batch['completed']}\n\n")
-                f.write("---\n\n")
-                
-                for idx, trans in enumerate(batch['transcriptions'], 1):
-                    f.write(f"## {idx}. {trans['filename']}\n\n")
-                    f.write(f"{trans['text']}\n\n")
-                    f.write("---\n\n")
-
-    # Iniciar transcrição em background
-    thread = threading.Thread(target=transcribe_batch_thread)
-    thread.daemon = True
-    thread.start()
+    # Nova execução de um lote já concluído: transcrever novamente os arquivos convertidos
+    kept_completed = 0
+    for index, file_info in enumerate(batch['files']):
+        if file_info['status'] in FINAL_FILE_STATUSES and audio_available(file_info):
+            job_store.update_file(batch_id, index, status='pending', error=None,
+                                  transcription=None, transcription_file=None, model=None)
+        elif file_info['status'] == 'completed':
+            # Áudio já removido pela retenção: a transcrição anterior continua valendo
+            kept_completed += 1
+
+    priority = parse_priority(data.get('priority'), PRIORITY_NORMAL)
+    job_store.update_job(
+        batch_id,
+        status='processing',
+        completed=kept_completed,
+        current_file=0,
+        options={'language': language, 'model': model, 'priority': priority,
+                 'same_language': bool(data.get('same_language')), **routing, **diarize}
+    )
+
+    # Enfileirar cada arquivo convertido como um trabalho independente
+    first_position = None
+    cached_count = 0
+    for index in range(len(batch['files'])):
+        position = dispatch_batch_file(batch_id, index, priority)
+        if position == 0:
+            cached_count += 1
+        elif position is not None and first_position is None:
+            first_position = position
+
+    # Lote sem arquivos a transcrever (por exemplo, todas as conversões falharam)
+    mark_batch_file_finished(batch_id)
 
     return jsonify({
         'message': 'Transcrição em lote iniciada',
         'batch_id': batch_id,
-        'total_files': batch['total']
+        'total_files': batch['total'],
+        'cached_files': cached_count,
+        'queue_position': first_position
     })
 
-@app.route('/batch_status/<batch_id>')
-def batch_status(batch_id):
-    """Retorna o status da transcrição em lote"""
-    if batch_id not in batch_sessions:
-        return jsonify({'error': 'Sessão não encontrada'}), 404
-
-    batch = batch_sessions[batch_id]
-    
-    files_status = [{
-        'name': f['display_name'],
-        'status': f['status'],
-        'error': f.get('error')
-    } for f in batch['files']]
+def recover_interrupted_jobs():
+    """Reenfileira trabalhos interrompidos por uma reinicialização do processo dono"""
+    for file_info in job_store.claim_interrupted_files(process_owner()):
+        job_id = file_info['job_id']
+        if file_info['status'] == 'uploaded':
+            decode_pool.submit(ingest_batch_file, job_id, file_info['idx'])
+            continue
+        try:
+            if file_info['kind'] == 'single':
+                scheduler.submit(f"single:{job_id}", process_single, job_id, priority=PRIORITY_HIGH)
+            else:
+                scheduler.submit(
+                    f"batch:{job_id}:{file_info['idx']}",
+                    process_batch_file,
+                    job_id,
+                    file_info['idx'],
+                    priority=PRIORITY_NORMAL
+                )
+        except QueueFullError:
+            break
+
+def file_status_payload(file_info):
+    """Estado de um arquivo do lote, como exibido para o cliente"""
+    return {
+        'name': file_info['display_name'],
+        'status': file_info['status'],
+        'error': file_info.get('error'),
+        'model': file_info.get('model'),
+        'language': file_info.get('language'),
+        'language_probability': file_info.get('language_probability'),
+        'decode_seconds': file_info.get('decode_seconds'),
+        'queue_position': scheduler.position(file_info['queue_id']) if file_info['status'] == 'queued' else None,
+        'partial_text': file_info.get('partial_text') if file_info['status'] == 'processing' else None
+    }
 
-    return jsonify({
+def batch_status_payload(batch):
+    """Estado completo do lote (usado por /batch_status e pelos eventos SSE)"""
+    return {
+        'batch_id': batch['id'],
         'status': batch['status'],
         'session_name': batch['session_name'],
         'total': batch['total'],
         'completed': batch['completed'],
         'current_file': batch.get('current_file', 0),
-        'files': files_status,
-        'transcriptions': batch['transcriptions'] if batch['status'] == 'completed' else [],
+        'files': [file_status_payload(f) for f in batch['files']],
+        'transcriptions': batch_transcriptions(batch) if batch['status'] == 'completed' else [],
         'errors': batch['errors']
+    }
+
+def publish_file_event(batch_id, index, text=None):
+    """Publica a mudança de estado de um arquivo do lote"""
+    batch = job_store.get_job(batch_id)
+    if batch is None:
+        return
+    data = file_status_payload(batch['files'][index])
+    data.update({
+        'index': index,
+        'completed': batch['completed'],
+        'total': batch['total']
     })
+    if text is not None:
+        data['text'] = text
+    event_bus.publish(f"batch:{batch_id}", 'file', data)
+
+@app.route('/batch_status/<batch_id>')
+def batch_status(batch_id):
+    """Retorna o status da transcrição em lote"""
+    batch = job_store.get_job(batch_id)
+    if batch is None or batch['kind'] != 'batch':
+        return jsonify({'error': 'Sessão não encontrada'}), 404
+
+    return jsonify(batch_status_payload(batch))
+
+# Streams SSE abertos por processo: cada um ocupa uma thread do servidor web
+# enquanto estiver conectado (run.py dimensiona WEB_THREADS para eles)
+WEB_STREAM_CONNECTIONS = int(os.environ.get('WEB_STREAM_CONNECTIONS', 32))
+stream_slots = threading.BoundedSemaphore(WEB_STREAM_CONNECTIONS)
+
+def stream_limit_response():
+    """Limite de streams atingido: o frontend volta a consultar os endpoints de status"""
+    return jsonify({'error': 'Muitas conexões de acompanhamento abertas; consulte o status'}), 503
+
+def event_stream_response(stream):
+    """Resposta text/event-stream sem buffering em proxies (libera o slot do stream ao fechar)"""
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(stream_slots.release)
+    return response
+
+# Intervalo entre as verificações de qual processo executa um trabalho acompanhado por SSE
+JOB_OWNER_CHECK_SECONDS = 10.0
+
+def job_refresher(job_id, to_event):
+    """
+    Cobre, nos streams SSE, trabalhos executados por outro processo do servidor
+
+    Os eventos dos arquivos processados aqui já chegam pelo barramento, então
+    a versão do trabalho só é consultada enquanto algum arquivo pendente
+    pertence a outro processo (verificado a cada JOB_OWNER_CHECK_SECONDS), e
+    uma última vez quando ele deixa de pertencer, para entregar o estado final.
+    """
+    owner = process_owner()
+    state = {'version': job_store.get_job_version(job_id), 'remote': False, 'checked': 0.0}
+
+    def refresh():
+        was_remote = state['remote']
+        now = time.monotonic()
+        if now - state['checked'] >= JOB_OWNER_CHECK_SECONDS:
+            state['checked'] = now
+            state['remote'] = any(o != owner for o in job_store.get_job_owners(job_id))
+        if not state['remote'] and not was_remote:
+            return None
+        version = job_store.get_job_version(job_id)
+        if version is None or version == state['version']:
+            return None
+        state['version'] = version
+        return to_event(job_store.get_job(job_id))
+
+    return refresh
+
+def batch_event(batch):
+    return ('completed' if batch['status'] == 'completed' else 'status', batch_status_payload(batch))
+
+@app.route('/events/batch/<batch_id>')
+def batch_events(batch_id):
+    """Stream SSE com o progresso de um lote (alternativa a /batch_status)"""
+    # Assinar antes de ler o estado para não perder eventos entre os dois passos
+    subscription = event_bus.subscribe(f"batch:{batch_id}")
+    refresh = job_refresher(batch_id, batch_event)
+    batch = job_store.get_job(batch_id)
+    if batch is None or batch['kind'] != 'batch':
+        subscription.close()
+        return jsonify({'error': 'Sessão não encontrada'}), 404
+
+    if not stream_slots.acquire(blocking=False):
+        subscription.close()
+        return stream_limit_response()
+    return event_stream_response(sse_stream(subscription, [batch_event(batch)], refresh=refresh))
+
+def single_event(job):
+    """Evento SSE correspondente ao estado de uma transcrição individual"""
+    if job['status'] == 'completed':
+        return ('completed', {'status': 'completed', 'text': job['result_text'], 'filename': job['result_file']})
+    if job['status'] == 'error':
+        return ('failed', {'status': 'error', 'error': job['error']})
+    position = scheduler.position(f"single:{job['id']}")
+    if position is not None:
+        return ('status', {'status': 'queued', 'queue_position': position})
+    return ('status', {'status': 'processing'})
+
+@app.route('/events/transcription')
+def transcription_events():
+    """Stream SSE da transcrição individual da sessão (alternativa a /transcription_status)"""
+    job_id = session.get('transcription_id')
+    if not job_id:
+        return jsonify({'status': 'not_started'}), 404
+
+    subscription = event_bus.subscribe(f"single:{job_id}")
+    refresh = job_refresher(job_id, single_event)
+    job = job_store.get_job(job_id)
+    if job is None:
+        subscription.close()
+        return jsonify({'status': 'not_started'}), 404
+
+    if not stream_slots.acquire(blocking=False):
+        subscription.close()
+        return stream_limit_response()
+    return event_stream_response(sse_stream(subscription, [single_event(job)], refresh=refresh))
 
 @app.route('/transcription_status')
 def transcription_status():
-    # Verificar se há um arquivo de resultado temporário
-    if 'transcription_id' not in session:
-        return jsonify({'status': 'not_started'})
-    
-    session_id = session['transcription_id']
-    result_file = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_result.json")
-    
-    if os.path.exists(result_file):
-        try:
-            with open(result_file, 'r') as f:
-                result = json.load(f)
-            
-            # Remover o arquivo temporário após a leitura
-            os.remove(result_file)
-            
-            if 'transcription' in result:
-                # Atualizar a sessão com os resultados
-                session['transcription'] = result['transcription']
-                session['transcription_file'] = result.get('transcription_file')
-                
-                return jsonify({
-                    'status': 'completed',
-                    'text': result['transcription'],
-                    'filename': result.get('transcription_file')
-                })
-            elif 'transcription_error' in result:
-                # Atualizar a sessão com o erro
-                session['transcription_error'] = result['transcription_error']
-                
-                return jsonify({
-                    'status': 'error',
-                    'error': result['transcription_error']
-                })
-        except Exception as e:
-            return jsonify({
-                'status': 'error',
-                'error': f'Erro ao ler resultado: {str(e)}'
-            })
-    elif 'converted_file' in session:
-        return jsonify({'status': 'processing'})
-    else:
+    job_id = session.get('transcription_id')
+    job = job_store.get_job(job_id) if job_id else None
+    if job is None:
         return jsonify({'status': 'not_started'})
 
+    if job['status'] == 'completed':
+        session['transcription_file'] = job['result_file']
+        return jsonify({
+            'status': 'completed',
+            'text': job['result_text'],
+            'filename': job['result_file'],
+            'model': job['files'][0].get('model'),
+            'language': job['files'][0].get('language'),
+            'language_probability': job['files'][0].get('language_probability')
+        })
+    if job['status'] == 'error':
+        session['transcription_error'] = job['error']
+        return jsonify({
+            'status': 'error',
+            'error': job['error']
+        })
+
+    position = scheduler.position(f"single:{job_id}")
+    if position is not None:
+        return jsonify({'status': 'queued', 'queue_position': position})
+
+    # Texto parcial já gravado pela transcrição em andamento
+    return jsonify({'status': 'processing', 'partial_text': job['files'][0].get('partial_text') or ''})
+
+def export_info(language=None, original_file=None, model=None, fmt='txt'):
+    """Metadados da exportação (cabeçalho do md e campos do json)"""
+    now = datetime.now()
+    info = {
+        'timestamp': now.strftime('%d/%m/%Y %H:%M:%S') if fmt == 'md' else now.strftime("%Y%m%d_%H%M%S"),
+        'language': language,
+        'original_file': original_file,
+        'model': model
+    }
+    return {key: value for key, value in info.items() if value}
+
+def export_filename(name, fmt):
+    """Nome do arquivo exportado a partir do nome da transcrição ou do áudio"""
+    stem = secure_filename(os.path.splitext(name or '')[0]) or 'transcription'
+    return f"{stem}.{fmt}"
+
+def export_response(chunks, fmt, download_name):
+    """Exportação enviada em streaming, sem gravar arquivo"""
+    return Response(stream_with_context(chunks), mimetype=MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{download_name}"'
+    })
+
+def file_segments(file_info):
+    """Segmentos gravados de um arquivo concluído (ou o texto salvo, se não houver .seg)"""
+    segments = None
+    if file_info.get('transcription_file'):
+        segments = load_segments(file_info['transcription_file'])
+    if segments is None:
+        segments = SegmentTable.from_text(file_info.get('transcription') or '')
+    return segments
+
+@app.route('/export/<job_id>')
+def export_job(job_id):
+    """
+    Exporta a transcrição de um trabalho em txt, json, md, srt ou vtt
+
+    Gerada em streaming dos segmentos gravados (.seg), sem transcrever de novo
+    e sem gravar arquivos. Em lotes, `index` escolhe o arquivo (padrão 0).
+    """
+    format_type = request.args.get('format', 'txt')
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato não suportado'}), 400
+
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Transcrição não encontrada'}), 404
+    index = request.args.get('index', 0, type=int)
+    if index < 0:
+        return jsonify({'error': 'Índice inválido'}), 400
+    try:
+        file_info = job['files'][index]
+    except IndexError:
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    if file_info['status'] != 'completed':
+        return jsonify({'error': 'Transcrição ainda não concluída'}), 409
+
+    info = export_info(file_info.get('language') or job['options'].get('language'), file_info['display_name'],
+                       file_info.get('model'), format_type)
+    try:
+        chunks = render(file_segments(file_info), format_type, info)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return export_response(chunks, format_type, export_filename(file_info['display_name'], format_type))
+
+def text_edited(text, segments):
+    """Se o texto enviado difere da transcrição gravada (com ou sem os rótulos de falante)"""
+    words = text.split()
+    if words == segments.text.split():
+        return False
+    return not segments.has_speakers or words != ''.join(render(segments, 'txt')).split()
+
 @app.route('/export', methods=['POST'])
 def export_transcription():
+    """
+    Exporta o texto enviado (ex: editado pelo usuário) em txt, json, md, srt ou vtt
+
+    Com `filename` (arquivo da transcrição) e o texto sem alterações, a
+    exportação é gerada dos segmentos gravados, com os tempos; legendas (srt,
+    vtt) exigem os segmentos. Para exportar um resultado salvo, sem enviar o
+    texto, use GET /export/<job_id>.
+    """
     data = request.get_json()
     format_type = data.get('format', 'txt')
     text = data.get('text', '')
 
-    if not text:
-        return jsonify({'error': 'Nenhum texto para exportar'}), 400
-
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato não suportado'}), 400
 
-    if format_type == 'txt':
-        filename = f"transcription_{timestamp}.txt"
-        filepath = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(text)
+    segments = None
+    if data.get('filename'):
+        segments = load_segments(secure_filename(data['filename']))
+    if segments is None or (text and text_edited(text, segments)):
+        if not text:
+            return jsonify({'error': 'Nenhum texto para exportar'}), 400
+        segments = SegmentTable.from_text(text)
 
-    elif format_type == 'json':
-        filename = f"transcription_{timestamp}.json"
-        filepath = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
-        json_data = {
-            'text': text,
-            'timestamp': timestamp,
-            'language': data.get('language', 'pt-BR'),
-            'original_file': session.get('original_file', '')
-        }
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
-
-    elif format_type == 'md':
-        filename = f"transcription_{timestamp}.md"
-        filepath = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"# Transcrição de Áudio\n\n")
-            f.write(f"**Data:** {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-            f.write(f"**Arquivo Original:** {session.get('original_file', 'N/A')}\n\n")
-            f.write(f"## Transcrição\n\n{text}")
+    info = export_info(data.get('language', 'pt-BR'), session.get('original_file', ''), fmt=format_type)
+    try:
+        chunks = render(segments, format_type, info)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    else:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return export_response(chunks, format_type, f"transcription_{timestamp}.{format_type}")
+
+def batch_zip_entries(batch, format_type):
+    """Entradas do ZIP de um lote: uma transcrição por arquivo concluído e o resumo"""
+    completed = [f for f in batch['files'] if f['status'] == 'completed']
+    width = max(2, len(str(batch['total'])))
+    for file_info in completed:
+        name = export_filename(file_info['display_name'], format_type)
+        name = f"{file_info['idx'] + 1:0{width}d}_{name}"
+        path = os.path.join(TRANSCRIPTIONS_FOLDER, file_info['transcription_file'] or '')
+        if format_type == 'txt' and file_info['transcription_file'] and os.path.isfile(path):
+            # O .txt gravado já é a exportação em texto
+            yield name, open_chunks(path)
+            continue
+        info = export_info(file_info.get('language') or batch['options'].get('language'), file_info['display_name'],
+                           file_info.get('model'), format_type)
+        segments = file_segments(file_info)
+        try:
+            chunks = render(segments, format_type, info)
+        except ValueError:
+            # Sem tempos para legendas: o texto vai em .txt
+            name, chunks = f"{os.path.splitext(name)[0]}.txt", render(segments, 'txt')
+        yield name, chunks
+
+    if batch['sanitized_name']:
+        summary_filename = f"{batch['timestamp']}_{batch['sanitized_name']}_resumo.md"
+        summary_path = os.path.join(TRANSCRIPTIONS_FOLDER, summary_filename)
+        if os.path.isfile(summary_path):
+            yield summary_filename, open_chunks(summary_path)
+
+@app.route('/batch/<batch_id>/export.zip')
+def export_batch_zip(batch_id):
+    """
+    Baixa todas as transcrições concluídas do lote (e o resumo) em um ZIP
+
+    O ZIP é montado em streaming, com memória constante, a partir dos
+    arquivos gravados; `format` escolhe o formato das transcrições (padrão txt).
+    """
+    format_type = request.args.get('format', 'txt')
+    if format_type not in EXPORT_FORMATS:
         return jsonify({'error': 'Formato não suportado'}), 400
 
-    return send_file(filepath, as_attachment=True, download_name=filename)
+    batch = job_store.get_job(batch_id)
+    if batch is None or batch['kind'] != 'batch':
+        return jsonify({'error': 'Sessão não encontrada'}), 404
+    if not any(f['status'] == 'completed' for f in batch['files']):
+        return jsonify({'error': 'Nenhuma transcrição concluída'}), 409
+
+    download_name = secure_filename(f"{batch['timestamp']}_{batch['sanitized_name'] or batch_id}.zip")
+    return Response(stream_with_context(stream_zip(batch_zip_entries(batch, format_type))),
+                    mimetype=ZIP_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+
+# Transcrição ao vivo por WebSocket (/live), disponível com o flask-sock instalado.
+# Cada sessão reserva um slot do agendador (threads_per_job núcleos) enquanto
+# estiver aberta, então sessões e trabalhos da fila dividem o mesmo orçamento
+sock = live.create_sock(app)
+LIVE_MAX_SESSIONS = int(os.environ.get('LIVE_MAX_SESSIONS', 2))
+# Espera máxima por um slot livre ao abrir uma sessão
+LIVE_SLOT_WAIT_SECONDS = float(os.environ.get('LIVE_SLOT_WAIT_SECONDS', 30))
+live_sessions = threading.BoundedSemaphore(LIVE_MAX_SESSIONS)
+live_session_ids = set()
+
+def live_decoder(language, model):
+    """Transcreve cada janela da sessão ao vivo no slot reservado, sem passar pelo cache"""
+    whisper_lang = LANGUAGE_MAPPING.get(language, language)
+
+    def decode(audio):
+        result = get_whisper().transcribe(
+            audio,
+            language=whisper_lang,
+            model=model,
+            output_format='json',
+            threads=scheduler.threads_per_job,
+            use_cache=False
+        )
+        return result.get('segments', [])
+
+    return decode
+
+def live_transcription(ws):
+    """
+    Sessão de transcrição ao vivo (ver live.py para o protocolo)
+
+    Parâmetros da URL: language, model e format ('pcm', 'webm' ou 'ogg').
+    O texto estável é gravado em TRANSCRIPTIONS_FOLDER à medida que é
+    confirmado e entra no histórico ao final da sessão.
+    """
+    language = request.args.get('language', 'auto')
+    model = request.args.get('model') or None
+    input_format = request.args.get('format', 'pcm')
+    if model == AUTO_MODEL:
+        model = None
+    if input_format not in live.INPUT_FORMATS:
+        ws.send(json.dumps({'type': 'error', 'error': 'Formato não suportado'}))
+        return
+    if not live_sessions.acquire(blocking=False):
+        ws.send(json.dumps({'type': 'error', 'error': 'Limite de sessões ao vivo atingido'}))
+        return
+    # Com prioridade sobre a fila: o próximo slot liberado vai para a sessão
+    if not scheduler.reserve(LIVE_SLOT_WAIT_SECONDS):
+        live_sessions.release()
+        ws.send(json.dumps({'type': 'error', 'error': 'Sem capacidade livre para a transcrição ao vivo'}))
+        return
+
+    session_id = uuid.uuid4().hex[:8]
+    transcription_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_live_{session_id}_transcription.txt"
+    transcription_path = os.path.join(TRANSCRIPTIONS_FOLDER, transcription_filename)
+    live_session_ids.add(session_id)
+    status = 'error'
+    try:
+        with open(transcription_path, 'w', encoding='utf-8') as output:
+            def on_stable(text, start, end):
+                output.write(text if output.tell() == 0 else ' ' + text)
+                output.flush()
+
+            transcriber = live.LiveTranscriber(live_decoder(language, model), on_stable=on_stable)
+            live.run_session(ws, transcriber, input_format)
+            duration = transcriber.buffer.end / live.BYTES_PER_SECOND
+
+        with open(transcription_path, encoding='utf-8') as f:
+            text = f.read()
+        if not text:
+            os.remove(transcription_path)
+            transcription_filename = None
+        else:
+            record_transcription(
+                transcription_filename,
+                kind='transcription',
+                source_name='Transcrição ao vivo',
+                language=language,
+                model=model,
+                duration=duration
+            )
+            index_transcript(transcription_filename, 'transcription', text)
+        status = 'completed'
+        ws.send(json.dumps({'type': 'final', 'filename': transcription_filename}))
+    except Exception as e:
+        try:
+            ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+        except Exception:
+            pass
+    finally:
+        live_session_ids.discard(session_id)
+        scheduler.release(1)
+        live_sessions.release()
+        JOBS_TOTAL.inc(kind='live', status=status, cached='false')
+
+if sock is not None:
+    sock.route('/live')(live_transcription)
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+
+def encode_history_cursor(item):
+    raw = json.dumps([item['created_at'], item['filename']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_history_cursor(cursor):
+    created_at, filename = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return float(created_at), filename
+
+def parse_history_time(value):
+    """Aceita timestamp Unix ou data ISO (AAAA-MM-DD[THH:MM:SS])"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def history_item(row):
+    created = datetime.fromtimestamp(row['created_at'])
+    return {
+        'filename': row['filename'],
+        'created': created.strftime('%d/%m/%Y %H:%M:%S'),
+        'created_at': created.isoformat(timespec='seconds'),
+        'size': row['size'],
+        'kind': row['kind'],
+        'batch_id': row['job_id'],
+        'session_name': row['session_name'],
+        'source_name': row['source_name'],
+        'language': row['language'],
+        'model': row['model'],
+        'duration': row['duration']
+    }
 
 @app.route('/history')
 def history():
-    """Retorna histórico de transcrições"""
-    transcriptions = []
+    """
+    Retorna histórico de transcrições, do mais recente para o mais antigo
+
+    Parâmetros (query string):
+        limit: itens por página (padrão 100, máximo 500)
+        cursor: valor do cabeçalho X-Next-Cursor da página anterior
+        batch_id, session_name, language, model, kind: filtros exatos
+        since, until: intervalo de criação (timestamp Unix ou data ISO)
+
+    O corpo continua sendo uma lista; o cursor da próxima página vem no
+    cabeçalho X-Next-Cursor (ausente na última página).
+    """
+    try:
+        limit = min(HISTORY_MAX_PAGE_SIZE, max(1, int(request.args.get('limit', HISTORY_PAGE_SIZE))))
+        cursor = request.args.get('cursor')
+        before = decode_history_cursor(cursor) if cursor else None
+        since = parse_history_time(request.args.get('since'))
+        until = parse_history_time(request.args.get('until'))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Parâmetros de histórico inválidos'}), 400
+
+    rows = job_store.list_transcriptions(
+        limit + 1,
+        before=before,
+        job_id=request.args.get('batch_id'),
+        session_name=request.args.get('session_name'),
+        language=request.args.get('language'),
+        model=request.args.get('model'),
+        kind=request.args.get('kind'),
+        since=since,
+        until=until
+    )
+
+    response = jsonify([history_item(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = encode_history_cursor(rows[limit - 1])
+    return response
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+def fts_literal_query(query):
+    """Transforma o texto em uma consulta FTS5 literal (cada palavra entre aspas)"""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+@app.route('/search')
+def search():
+    """
+    Busca nas transcrições armazenadas
+
+    Parâmetros (query string):
+        q: consulta ("frase exata", prefixo*, OR, NOT); acentos são ignorados
+        kind: 'transcription' ou 'summary'
+        limit, offset: paginação (padrão 20, máximo 100)
+
+    Cada resultado é um segmento, com o trecho destacado (<mark>) e os tempos
+    do segmento em segundos quando disponíveis.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Informe o parâmetro q'}), 400
+    try:
+        limit = min(SEARCH_MAX_PAGE_SIZE, max(1, int(request.args.get('limit', SEARCH_PAGE_SIZE))))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'Parâmetros de busca inválidos'}), 400
+
+    kind = request.args.get('kind')
+    try:
+        rows = job_store.search_transcripts(query, limit, offset, kind=kind)
+    except ValueError:
+        # Sintaxe FTS5 inválida (aspas abertas, operadores soltos...): buscar as palavras
+        literal = fts_literal_query(query)
+        if not literal:
+            return jsonify({'results': [], 'query': query})
+        try:
+            rows = job_store.search_transcripts(literal, limit, offset, kind=kind)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    results = [{
+        'filename': row['filename'],
+        'kind': row['kind'],
+        'start': row['seg_start'],
+        'end': row['seg_end'],
+        'snippet': row['snippet'],
+        'score': round(-row['score'], 4),
+        'batch_id': row['job_id'],
+        'session_name': row['session_name'],
+        'source_name': row['source_name'],
+        'language': row['language'],
+        'model': row['model'],
+        'created_at': datetime.fromtimestamp(row['created_at']).isoformat(timespec='seconds') if row['created_at'] else None
+    } for row in rows]
+
+    return jsonify({'results': results, 'query': query, 'limit': limit, 'offset': offset})
+
+def backfill_history():
+    """Indexa, uma única vez, as transcrições gravadas antes do índice existir"""
+    if not job_store.get_meta('search_indexed'):
+        backfill_search()
+    if job_store.get_meta('history_indexed'):
+        return
     if os.path.exists(TRANSCRIPTIONS_FOLDER):
         for filename in os.listdir(TRANSCRIPTIONS_FOLDER):
             if ('transcription' in filename or 'resumo' in filename) and (filename.endswith('.txt') or filename.endswith('.md')):
-                filepath = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
-                stat = os.stat(filepath)
-                transcriptions.append({
-                    'filename': filename,
-                    'created': datetime.fromtimestamp(stat.st_ctime).strftime('%d/%m/%Y %H:%M:%S'),
-                    'size': stat.st_size
-                })
+                if not os.path.isfile(os.path.join(TRANSCRIPTIONS_FOLDER, filename)):
+                    continue
+                if 'resumo' in filename:
+                    kind = 'summary'
+                elif filename.startswith('transcription_'):
+                    kind = 'export'
+                else:
+                    kind = 'transcription'
+                record_transcription(filename, kind=kind)
+    job_store.set_meta('history_indexed', datetime.now().isoformat(timespec='seconds'))
 
-    transcriptions.sort(key=lambda x: x['created'], reverse=True)
-    return jsonify(transcriptions)
+def backfill_search():
+    """Indexa para /search as transcrições gravadas antes da busca existir (sem tempos)"""
+    if os.path.exists(TRANSCRIPTIONS_FOLDER):
+        for filename in os.listdir(TRANSCRIPTIONS_FOLDER):
+            path = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
+            if not os.path.isfile(path):
+                continue
+            if filename.endswith('_transcription.txt'):
+                kind = 'transcription'
+            elif filename.endswith('_resumo.md'):
+                kind = 'summary'
+            else:
+                continue
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                index_transcript(filename, kind, f.read())
+    job_store.set_meta('search_indexed', datetime.now().isoformat(timespec='seconds'))
 
 @app.route('/models')
 def list_models():
     """Lista modelos disponíveis do whisper.cpp com informações detalhadas"""
     try:
-        whisper = WhisperCpp()
-        models = whisper.list_models()
+        whisper = get_whisper()
+        registry_models = get_model_registry().models()
+        models = {name: info.path for name, info in registry_models.items()}
         model_info = whisper.get_model_info()
 
-        # Adicionar informações de tamanho para cada modelo
+        # Adicionar tamanho e metadados do cabeçalho ggml para cada modelo
         models_with_info = {}
-        for name, path in models.items():
-            size_bytes = os.path.getsize(path) if os.path.exists(path) else 0
-            size_mb = round(size_bytes / (1024 * 1024), 1)
+        for name, info in registry_models.items():
+            size_mb = round(info.size_bytes / (1024 * 1024), 1)
             models_with_info[name] = {
-                'path': path,
+                'path': info.path,
                 'size_mb': size_mb,
-                'size_display': f"{size_mb} MB"
+                'size_display': f"{size_mb} MB",
+                'quantization': info.quantization,
+                'model_type': info.model_type,
+                'multilingual': info.multilingual,
+                'hparams': info.hparams,
+                'variants': get_model_registry().variants(name),
+                'profile': profile_for(info.path).to_dict()
             }
 
         # Formatar resposta
@@ -530,7 +1958,9 @@ def list_models():
             'whisper_cpp_info': {
                 'executable_path': model_info['whisper_cli_path'],
                 'model_path': model_info['model_path']
-            }
+            },
+            'registry': get_model_registry().stats(),
+            'routing': model_router.stats()
         }
 
         return jsonify(response)
@@ -542,15 +1972,17 @@ def clear_uploads():
     """Limpa todos os arquivos de upload"""
     try:
         count = 0
-        if os.path.exists(UPLOAD_FOLDER):
-            for filename in os.listdir(UPLOAD_FOLDER):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(filepath):
-                    os.remove(filepath)
-                    count += 1
+        for folder in (UPLOAD_FOLDER, RESUMABLE_FOLDER):
+            if os.path.exists(folder):
+                for filename in os.listdir(folder):
+                    filepath = os.path.join(folder, filename)
+                    if os.path.isfile(filepath):
+                        os.remove(filepath)
+                        count += 1
         
-        # Limpar sessões de lote
-        batch_sessions.clear()
+        # Limpar trabalhos (os arquivos de áudio foram removidos)
+        job_store.delete_all_jobs()
+        job_store.untrack_area('uploads')
         
         return jsonify({
             'success': True,
@@ -571,6 +2003,8 @@ def clear_history():
                 if os.path.isfile(filepath):
                     os.remove(filepath)
                     count += 1
+        job_store.delete_all_transcriptions()
+        job_store.untrack_area('transcriptions')
         
         return jsonify({
             'success': True,
@@ -580,46 +2014,200 @@ def clear_history():
     except Exception as e:
         return jsonify({'error': f'Erro ao limpar histórico: {str(e)}'}), 500
 
+def cache_info():
+    """Estatísticas do cache de transcrições"""
+    if transcription_cache is None:
+        return {'enabled': False}
+    stats = transcription_cache.stats()
+    stats['enabled'] = True
+    stats['size_display'] = f"{round(stats['size_bytes'] / (1024 * 1024), 2)} MB"
+    return stats
+
+# Métricas do processo, exportadas em /metrics
+JOBS_TOTAL = REGISTRY.counter(
+    'transcriber_jobs_total', 'Transcrições finalizadas', ['kind', 'status', 'cached']
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'transcriber_http_request_seconds', 'Duração das requisições HTTP (até o início da resposta)',
+    ['endpoint', 'method', 'status']
+)
+
+def _cache_counts():
+    if transcription_cache is None:
+        return None
+    return [({'result': 'hit'}, transcription_cache.hits), ({'result': 'miss'}, transcription_cache.misses)]
+
+def _language_cache_counts():
+    if transcription_cache is None:
+        return None
+    counts = transcription_cache.kind_counts.get('language', {'hits': 0, 'misses': 0})
+    return [({'result': 'hit'}, counts['hits']), ({'result': 'miss'}, counts['misses'])]
+
+def _cache_hit_rate():
+    if transcription_cache is None:
+        return None
+    total = transcription_cache.hits + transcription_cache.misses
+    return transcription_cache.hits / total if total else 0.0
+
+def _server_instances():
+    pool = get_server_pool()
+    if pool is None:
+        return None
+    samples = []
+    for model, info in pool.stats().items():
+        samples.append(({'model': model, 'state': 'idle'}, info['idle']))
+        samples.append(({'model': model, 'state': 'busy'}, info['instances'] - info['idle']))
+    return samples
+
+REGISTRY.callback('transcriber_queue_depth', 'Trabalhos aguardando na fila',
+                  lambda: scheduler.stats()['queued'])
+REGISTRY.callback('transcriber_active_jobs', 'Trabalhos em execução',
+                  lambda: scheduler.stats()['active'])
+REGISTRY.callback('transcriber_workers', 'Trabalhos executados simultaneamente',
+                  lambda: scheduler.workers)
+REGISTRY.callback('transcriber_cache_requests_total', 'Consultas ao cache de transcrições',
+                  _cache_counts, type_name='counter', labelnames=['result'])
+REGISTRY.callback('transcriber_language_cache_requests_total', 'Consultas ao cache de idiomas detectados',
+                  _language_cache_counts, type_name='counter', labelnames=['result'])
+REGISTRY.callback('transcriber_cache_hit_ratio', 'Fração das consultas atendidas pelo cache',
+                  _cache_hit_rate)
+REGISTRY.callback('transcriber_whisper_servers', 'Servidores whisper.cpp residentes',
+                  _server_instances, labelnames=['model', 'state'])
+REGISTRY.callback('transcriber_live_sessions', 'Sessões de transcrição ao vivo abertas',
+                  lambda: len(live_session_ids))
+REGISTRY.callback('transcriber_audio_memory_bytes', 'Bytes de áudio decodificado mantidos em memória (AUDIO_IN_MEMORY)',
+                  lambda: audio_memory.stats()['size_bytes'] if audio_memory is not None else None)
+REGISTRY.callback('transcriber_storage_bytes', 'Bytes armazenados por área',
+                  lambda: [({'area': area}, totals['bytes'])
+                           for area, totals in job_store.storage_totals().items()],
+                  labelnames=['area'])
+
+@app.before_request
+def start_request_timer():
+    request.environ['transcriber.started'] = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = request.environ.get('transcriber.started')
+    if started is not None and request.url_rule is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule,
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato de texto do Prometheus (por processo)"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/storage_info')
 def storage_info():
-    """Retorna informações sobre uso de armazenamento"""
+    """Retorna informações sobre uso de armazenamento (contadores mantidos a cada gravação)"""
     try:
-        uploads_size = 0
-        uploads_count = 0
-        if os.path.exists(UPLOAD_FOLDER):
-            for filename in os.listdir(UPLOAD_FOLDER):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(filepath):
-                    uploads_size += os.path.getsize(filepath)
-                    uploads_count += 1
-        
-        transcriptions_size = 0
-        transcriptions_count = 0
-        if os.path.exists(TRANSCRIPTIONS_FOLDER):
-            for filename in os.listdir(TRANSCRIPTIONS_FOLDER):
-                filepath = os.path.join(TRANSCRIPTIONS_FOLDER, filename)
-                if os.path.isfile(filepath):
-                    transcriptions_size += os.path.getsize(filepath)
-                    transcriptions_count += 1
+        totals = job_store.storage_totals()
+        uploads = totals.get('uploads', {'bytes': 0, 'count': 0})
+        transcriptions = totals.get('transcriptions', {'bytes': 0, 'count': 0})
+        uploads_size = uploads['bytes']
+        transcriptions_size = transcriptions['bytes']
         
         return jsonify({
             'uploads': {
-                'count': uploads_count,
+                'count': uploads['count'],
                 'size_bytes': uploads_size,
                 'size_display': f"{round(uploads_size / (1024 * 1024), 2)} MB"
             },
             'transcriptions': {
-                'count': transcriptions_count,
+                'count': transcriptions['count'],
                 'size_bytes': transcriptions_size,
                 'size_display': f"{round(transcriptions_size / (1024 * 1024), 2)} MB"
             },
             'total': {
                 'size_bytes': uploads_size + transcriptions_size,
                 'size_display': f"{round((uploads_size + transcriptions_size) / (1024 * 1024), 2)} MB"
-            }
+            },
+            'cache': cache_info(),
+            'retention': storage_janitor.stats()
         })
     except Exception as e:
         return jsonify({'error': f'Erro ao obter informações de armazenamento: {str(e)}'}), 500
 
+def backfill_storage():
+    """Contabiliza, uma única vez, os arquivos gravados antes dos contadores existirem"""
+    if job_store.get_meta('storage_indexed'):
+        return
+    folders = (
+        (UPLOAD_FOLDER, 'uploads'),
+        (RESUMABLE_FOLDER, 'uploads'),
+        (TRANSCRIPTIONS_FOLDER, 'transcriptions')
+    )
+    for folder, area in folders:
+        if not os.path.exists(folder):
+            continue
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path):
+                continue
+            if area == 'transcriptions':
+                role = 'summary' if filename.endswith('_resumo.md') else 'transcription'
+            elif folder == RESUMABLE_FOLDER:
+                role = 'partial'
+            else:
+                role = 'wav' if filename.endswith('_converted.wav') else 'original'
+            stat = os.stat(path)
+            job_store.track_file(path, area, role, stat.st_size, modified_at=stat.st_mtime)
+    job_store.set_meta('storage_indexed', datetime.now().isoformat(timespec='seconds'))
+
+def on_storage_deleted(row):
+    """Mantém histórico e uploads coerentes com os arquivos removidos pela retenção"""
+    if row['area'] == 'transcriptions':
+        job_store.delete_transcription(os.path.basename(row['path']))
+    elif row['role'] == 'partial' and row['job_id'] is not None:
+        upload_id = os.path.basename(row['path'])[:-len('.part')]
+        job_store.update_upload(upload_id, status='expired')
+        job_store.update_file(row['job_id'], row['idx'], status='error', error='Upload expirado')
+        job_store.append_job_error(row['job_id'], 'Upload resumível expirado')
+        publish_file_event(row['job_id'], row['idx'])
+        mark_batch_file_finished(row['job_id'])
+
+# Retenção: remove WAVs já transcritos, arquivos antigos e o excedente da cota
+storage_janitor = StorageJanitor(job_store, RetentionPolicy.from_env(), on_deleted=on_storage_deleted)
+
+def drain_jobs(timeout=None):
+    """
+    Encerra as conversões e o agendador aguardando os trabalhos em andamento
+
+    Arquivos que ainda não começaram continuam 'uploaded' ou 'queued' no
+    armazenamento e são retomados pelo próximo processo em
+    recover_interrupted_jobs(), assim como as conversões que não terminam
+    dentro de `timeout` (o prazo vale para conversões e agendador juntos).
+    """
+    shutting_down.set()
+    storage_janitor.stop()
+    deadline = None if timeout is None else time.time() + timeout
+    # Conversões longas (uploads grandes) não podem consumir o prazo sem limite
+    decoding = threading.Thread(target=decode_pool.shutdown, kwargs={'wait': True},
+                                name='decode-shutdown', daemon=True)
+    decoding.start()
+    decoding.join(timeout)
+    remaining = None if deadline is None else max(0.0, deadline - time.time())
+    scheduler.shutdown(wait=True, timeout=remaining, cancel_pending=True)
+    diarize_pool.shutdown(wait=False)
+
+# Indexar transcrições e arquivos antigos, retomar trabalhos deixados em fila
+# por um processo que não existe mais, iniciar a limpeza em segundo plano e
+# pré-carregar os modelos configurados
+backfill_history()
+backfill_storage()
+recover_interrupted_jobs()
+storage_janitor.start()
+preload_models()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
+    # Servidor de desenvolvimento; em produção use `python run.py --prod`
+    try:
+        app.run(debug=True, host='0.0.0.0', port=8080, threaded=True)
+    finally:
+        drain_jobs(timeout=30)
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Utilitários de áudio baseados no FFmpeg
+
+O whisper.cpp espera WAV PCM 16 bits, mono, 16 kHz. Este módulo converte os
+uploads diretamente para esse formato com o FFmpeg, em streaming: o áudio
+nunca é carregado inteiro na memória do Python, e o whisper.cpp não precisa
+reamostrar o arquivo novamente.
+
+As funções de leitura aceitam o caminho de um WAV ou um PcmAudio
+(áudio decodificado em memória, ver pcm_audio).
+
+Exemplo de uso:
+    elapsed = convert_to_wav("podcast.mp3", "podcast.wav")
+    print(f"Decodificado em {elapsed:.2f}s")
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+from array import array
+from typing import List, Optional, Tuple, Union
+
+from pcm_audio import CHANNELS, SAMPLE_RATE, SAMPLE_WIDTH, PcmAudio
+
+# Caminho de um WAV ou áudio decodificado em memória
+AudioSource = Union[str, PcmAudio]
+
+
+def ffmpeg_binary() -> str:
+    """Retorna o executável do FFmpeg (variável FFMPEG_BINARY ou 'ffmpeg' no PATH)"""
+    return os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def convert_to_wav(input_path: str, output_path: str, timeout: Optional[float] = None) -> float:
+    """
+    Converte qualquer formato suportado pelo FFmpeg para WAV 16 kHz mono s16le
+
+    Args:
+        input_path: Arquivo de áudio original
+        output_path: Caminho do WAV a ser gerado
+        timeout: Tempo máximo da conversão em segundos (opcional)
+
+    Returns:
+        Duração da decodificação em segundos
+
+    Raises:
+        RuntimeError: Se o FFmpeg não for encontrado ou a conversão falhar
+    """
+    cmd = [
+        ffmpeg_binary(),
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-y",
+        "-i", input_path,
+        "-vn",
+        "-ac", str(CHANNELS),
+        "-ar", str(SAMPLE_RATE),
+        "-c:a", "pcm_s16le",
+        "-f", "wav",
+        output_path
+    ]
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg não encontrado no sistema")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("Timeout na conversão do áudio")
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        try:
+            os.unlink(output_path)
+        except OSError:
+            pass
+        raise RuntimeError(f"Erro na conversão: {result.stderr.strip()}")
+
+    return elapsed
+
+
+def decode_to_memory(input_path: str, timeout: Optional[float] = None, name: Optional[str] = None) -> Tuple[PcmAudio, float]:
+    """
+    Decodifica para PCM s16le 16 kHz mono em memória, sem gravar o WAV
+
+    O FFmpeg escreve as amostras no stdout; o cabeçalho WAV é gerado quando
+    o áudio é enviado ao whisper.cpp.
+
+    Args:
+        input_path: Arquivo de áudio original
+        timeout: Tempo máximo da conversão em segundos (opcional)
+        name: Identificador do áudio (padrão: input_path)
+
+    Returns:
+        (áudio decodificado, duração da decodificação em segundos)
+
+    Raises:
+        RuntimeError: Se o FFmpeg não for encontrado ou a conversão falhar
+    """
+    cmd = [
+        ffmpeg_binary(),
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", input_path,
+        "-vn",
+        "-ac", str(CHANNELS),
+        "-ar", str(SAMPLE_RATE),
+        "-f", "s16le",
+        "-"
+    ]
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg não encontrado no sistema")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("Timeout na conversão do áudio")
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Erro na conversão: {result.stderr.decode('utf-8', 'replace').strip()}")
+
+    return PcmAudio(result.stdout, name=name or input_path), elapsed
+
+
+def open_wav(source: AudioSource):
+    """Abre um WAV em disco ou um PcmAudio para leitura"""
+    if isinstance(source, PcmAudio):
+        return source.open()
+    return wave.open(source, 'rb')
+
+
+def source_name(source: AudioSource) -> str:
+    """Nome do áudio para logs"""
+    return os.path.basename(source.name if isinstance(source, PcmAudio) else source)
+
+
+def get_wav_duration(wav_path: AudioSource) -> float:
+    """Retorna a duração de um arquivo WAV (ou PcmAudio) em segundos"""
+    with open_wav(wav_path) as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+
+def _read_samples(wav, start_frame: int, n_frames: int) -> array:
+    """Lê amostras s16le (primeiro canal) de um WAV aberto"""
+    wav.setpos(start_frame)
+    samples = array('h')
+    samples.frombytes(wav.readframes(n_frames))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    channels = wav.getnchannels()
+    if channels > 1:
+        samples = samples[::channels]
+    return samples
+
+
+def find_split_points(
+    wav_path: AudioSource,
+    chunk_seconds: float = 120.0,
+    search_seconds: float = 10.0,
+    frame_ms: int = 30,
+    min_silence_ms: int = 300
+) -> List[float]:
+    """
+    Encontra pontos de corte em trechos de silêncio (VAD por energia)
+
+    Para cada corte, apenas uma janela de ±search_seconds em torno do alvo
+    (múltiplos de chunk_seconds) é lida e analisada, então o custo não
+    depende da duração total do arquivo.
+
+    Args:
+        wav_path: WAV PCM 16 bits (ou PcmAudio)
+        chunk_seconds: Duração aproximada de cada trecho
+        search_seconds: Distância máxima do alvo para procurar silêncio
+        frame_ms: Tamanho do quadro de análise de energia
+        min_silence_ms: Duração da janela de menor energia procurada
+
+    Returns:
+        Pontos de corte em segundos, em ordem crescente (sem 0 e sem o fim)
+    """
+    points = []
+    with open_wav(wav_path) as wav:
+        if wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError("Somente WAV PCM 16 bits é suportado")
+
+        rate = wav.getframerate()
+        duration = wav.getnframes() / float(rate)
+        frame_len = max(1, int(rate * frame_ms / 1000))
+        smooth = max(1, min_silence_ms // frame_ms)
+
+        last = 0.0
+        # Evitar um último trecho muito curto
+        while duration - last > chunk_seconds * 1.25:
+            target = last + chunk_seconds
+            lo = max(last + chunk_seconds / 2, target - search_seconds)
+            hi = min(duration, target + search_seconds)
+
+            samples = _read_samples(wav, int(lo * rate), int((hi - lo) * rate))
+            energies = [
+                sum(x * x for x in samples[i:i + frame_len])
+                for i in range(0, len(samples) - frame_len + 1, frame_len)
+            ]
+
+            if len(energies) <= smooth:
+                split = target
+            else:
+                # Janela deslizante: menor energia acumulada em min_silence_ms
+                window = sum(energies[:smooth])
+                best_sum, best_index = window, 0
+                for i in range(smooth, len(energies)):
+                    window += energies[i] - energies[i - smooth]
+                    if window < best_sum:
+                        best_sum, best_index = window, i - smooth + 1
+                split = lo + (best_index + smooth / 2) * frame_ms / 1000.0
+
+            points.append(round(split, 3))
+            last = split
+
+    return points
+
+
+def split_wav(wav_path: str, ranges: List[Tuple[float, float]], output_dir: str) -> List[str]:
+    """
+    Extrai trechos de um WAV em arquivos separados, copiando em blocos
+
+    Args:
+        wav_path: WAV de origem
+        ranges: Lista de (início, fim) em segundos
+        output_dir: Diretório onde os trechos serão gravados
+
+    Returns:
+        Caminhos dos arquivos gerados, na mesma ordem de `ranges`
+    """
+    paths = []
+    block_frames = SAMPLE_RATE * 30
+    with wave.open(wav_path, 'rb') as src:
+        rate = src.getframerate()
+        total = src.getnframes()
+        for index, (start, end) in enumerate(ranges):
+            path = os.path.join(output_dir, f"chunk_{index:04d}.wav")
+            start_frame = max(0, int(start * rate))
+            end_frame = min(total, int(end * rate))
+            src.setpos(start_frame)
+            with wave.open(path, 'wb') as dst:
+                dst.setnchannels(src.getnchannels())
+                dst.setsampwidth(src.getsampwidth())
+                dst.setframerate(rate)
+                remaining = end_frame - start_frame
+                while remaining > 0:
+                    frames = src.readframes(min(block_frames, remaining))
+                    if not frames:
+                        break
+                    dst.writeframes(frames)
+                    remaining -= len(frames) // (src.getsampwidth() * src.getnchannels())
+            paths.append(path)
+    return paths
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline de transcrição
+
+Mede, para cada modelo, duração de áudio e nível de concorrência:
+
+- convert: conversão para WAV 16 kHz mono (audio_utils.convert_to_wav)
+- transcribe: WhisperCpp.transcribe, sem cache
+- http: ida e volta completa pela aplicação (/upload → /transcribe →
+  /transcription_status) em um servidor HTTP local
+
+Para cada cenário são informados o fator de tempo real (latência / duração
+do áudio), latências p50/p95, vazão (arquivos e segundos de áudio por
+segundo) e o pico de memória (RSS) do processo e dos processos filhos. Cada
+cenário roda em um processo Python novo, para que caches e o pico de memória
+de um cenário não contaminem o seguinte.
+
+Os áudios de teste são gerados (tons com pausas, determinísticos pela
+semente) ou lidos de --audio. Com --stub, o whisper-cli e o FFmpeg são
+substituídos pelos scripts em scripts/ e modelos falsos são criados, então o
+benchmark roda sem whisper.cpp, modelos ou FFmpeg (útil em CI).
+
+Uso:
+    python benchmark.py --stub
+    python benchmark.py --models tiny,base --lengths 10,60,300 --concurrency 1,4
+    python benchmark.py --stages transcribe --audio gravacao.wav --output resultados.json
+    python benchmark.py --compare antes.json depois.json --threshold 0.15
+"""
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+STUB_WHISPER_CLI = os.path.join(PROJECT_ROOT, 'scripts', 'stub_whisper_cli.py')
+STUB_FFMPEG = os.path.join(PROJECT_ROOT, 'scripts', 'stub_ffmpeg.py')
+
+STAGES = ('convert', 'transcribe', 'http')
+SAMPLE_RATE = 16000
+
+# Camadas do encoder por família, para o cabeçalho dos modelos falsos (--stub)
+_STUB_LAYERS = {'tiny': 4, 'base': 6, 'small': 12, 'medium': 24, 'large': 32}
+
+# Métricas comparadas em --compare (True = maior é melhor)
+_COMPARED_METRICS = {
+    'p50_seconds': False,
+    'p95_seconds': False,
+    'rtf': False,
+    'files_per_second': True
+}
+
+
+def generate_fixture(path, seconds, seed=0):
+    """
+    Gera um WAV 16 kHz mono com trechos tonais separados por pausas
+
+    As pausas permitem que audio_utils.find_split_points corte arquivos
+    longos como faria com fala real.
+    """
+    rng = random.Random(seed)
+    tones = []
+    for freq in (140, 190, 230, 280):
+        block = array('h', (
+            int(9000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE)
+                * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * i / SAMPLE_RATE)))
+            for i in range(SAMPLE_RATE)
+        ))
+        if sys.byteorder == 'big':
+            block.byteswap()
+        tones.append(block.tobytes())
+
+    remaining = int(seconds * SAMPLE_RATE)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        while remaining > 0:
+            # Trecho de "fala" de 2 a 8 s
+            frames = min(remaining, int(rng.uniform(2, 8) * SAMPLE_RATE))
+            remaining -= frames
+            while frames > 0:
+                n = min(frames, SAMPLE_RATE)
+                wav.writeframes(rng.choice(tones)[:n * 2])
+                frames -= n
+            # Pausa de 0,3 a 1,2 s
+            pause = min(remaining, int(rng.uniform(0.3, 1.2) * SAMPLE_RATE))
+            wav.writeframes(b'\0\0' * pause)
+            remaining -= pause
+
+
+def create_stub_models(models_dir, models):
+    """Cria arquivos de modelo com apenas o cabeçalho ggml, para o modo --stub"""
+    os.makedirs(models_dir, exist_ok=True)
+    for name in models:
+        layers = _STUB_LAYERS.get(name.split('-')[0], 6)
+        with open(os.path.join(models_dir, f"ggml-{name}.bin"), 'wb') as f:
+            f.write(struct.pack('<12i', 0x67676d6c, 51865, 1500, 512, 8, layers,
+                                448, 512, 8, layers, 80, 1))
+
+
+def percentile(values, p):
+    """Percentil p (0-100) por interpolação linear"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low, high = math.floor(k), math.ceil(k)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def peak_rss_mb():
+    """Pico de memória do processo e dos filhos já encerrados, em MB (None sem o módulo resource)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return round(usage * unit / (1024 * 1024), 1)
+
+
+def run_scenario(config):
+    """
+    Executa um cenário em um processo novo e retorna as métricas
+
+    config traz: stage, model, audio_path, audio_seconds, concurrency,
+    repeat, warmup, threads, timeout, verbose, env e workdir.
+    """
+    os.environ.update(config['env'])
+    os.chdir(config['workdir'])
+    if not config['verbose']:
+        # Mensagens da aplicação e do servidor HTTP atrapalham a leitura dos resultados
+        sys.stdout = open(os.devnull, 'w')
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+
+    runs = config['repeat'] * config['concurrency']
+    setup = {'convert': _convert_runner, 'transcribe': _transcribe_runner, 'http': _http_runner}
+    run_once = setup[config['stage']](config, runs + config['warmup'])
+
+    for i in range(config['warmup']):
+        run_once(runs + i)
+
+    latencies = []
+    errors = []
+
+    def timed(i):
+        start = time.perf_counter()
+        run_once(i)
+        return time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config['concurrency']) as executor:
+        futures = [executor.submit(timed, i) for i in range(runs)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors.append(str(e))
+    wall = time.perf_counter() - wall_start
+
+    audio_seconds = config['audio_seconds']
+    mean = sum(latencies) / len(latencies) if latencies else None
+    return {
+        'stage': config['stage'],
+        'model': config['model'] if config['stage'] != 'convert' else None,
+        'audio_seconds': audio_seconds,
+        'concurrency': config['concurrency'],
+        'runs': runs,
+        'errors': len(errors),
+        'error_samples': errors[:3],
+        'mean_seconds': _round(mean),
+        'p50_seconds': _round(percentile(latencies, 50)),
+        'p95_seconds': _round(percentile(latencies, 95)),
+        'rtf': _round(mean / audio_seconds) if mean is not None and audio_seconds else None,
+        'files_per_second': _round(len(latencies) / wall) if wall else None,
+        'audio_seconds_per_second': _round(len(latencies) * audio_seconds / wall) if wall else None,
+        'wall_seconds': _round(wall),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def _round(value, digits=4):
+    return round(value, digits) if value is not None else None
+
+
+def _input_copies(config, count):
+    """Uma cópia (hard link quando possível) do áudio por execução: o whisper-cli grava a saída ao lado"""
+    input_dir = os.path.join(config['workdir'], 'inputs')
+    os.makedirs(input_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(input_dir, f"run_{i}.wav")
+        try:
+            os.link(config['audio_path'], path)
+        except OSError:
+            shutil.copyfile(config['audio_path'], path)
+        paths.append(path)
+    return paths
+
+
+def _convert_runner(config, count):
+    import audio_utils
+
+    output_dir = os.path.join(config['workdir'], 'converted')
+    os.makedirs(output_dir, exist_ok=True)
+
+    def run_once(i):
+        audio_utils.convert_to_wav(config['audio_path'], os.path.join(output_dir, f"{i}.wav"))
+
+    return run_once
+
+
+def _transcribe_runner(config, count):
+    from whisper_wrapper import WhisperCpp
+
+    whisper = WhisperCpp(model_name=config['model'], use_server=config['use_server'])
+    paths = _input_copies(config, count)
+
+    def run_once(i):
+        result = whisper.transcribe(paths[i], language='pt', output_format='json',
+                                    threads=config['threads'])
+        if not result.get('text'):
+            raise RuntimeError('Transcrição vazia')
+
+    return run_once
+
+
+def _http_runner(config, count):
+    import app as webapp
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, webapp.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    with open(config['audio_path'], 'rb') as f:
+        audio = f.read()
+
+    def run_once(i):
+        # Um cookie jar por execução: cada execução é uma sessão diferente
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        body, content_type = _multipart('audio_file', f"bench_{i}.wav", audio)
+        _http_json(opener, f"{base_url}/upload", body, content_type)
+        _http_json(opener, f"{base_url}/transcribe",
+                   json.dumps({'model': config['model'], 'language': 'pt'}).encode('utf-8'),
+                   'application/json')
+
+        deadline = time.monotonic() + config['timeout']
+        while time.monotonic() < deadline:
+            status = _http_json(opener, f"{base_url}/transcription_status")
+            if status['status'] == 'completed':
+                return
+            if status['status'] == 'error':
+                raise RuntimeError(status.get('error'))
+            time.sleep(0.05)
+        raise RuntimeError('Timeout aguardando a transcrição')
+
+    return run_once
+
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f"Content-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode('utf-8')
+    tail = f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return head + data + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def _http_json(opener, url, body=None, content_type=None):
+    request = urllib.request.Request(url, data=body, method='POST' if body is not None else 'GET')
+    if content_type:
+        request.add_header('Content-Type', content_type)
+    try:
+        with opener.open(request, timeout=60) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"{url}: HTTP {e.code} {e.read().decode('utf-8', 'replace')[:200]}")
+
+
+def build_scenarios(args, fixtures, base_env, workroot):
+    scenarios = []
+    for stage in args.stages:
+        # A conversão não depende do modelo
+        models = [None] if stage == 'convert' else args.models
+        for model in models:
+            for audio_path, audio_seconds in fixtures:
+                for concurrency in args.concurrency:
+                    workdir = tempfile.mkdtemp(prefix=f"{stage}_", dir=workroot)
+                    env = dict(base_env)
+                    env['JOB_STORE_URL'] = f"sqlite:///{os.path.join(workdir, 'jobs.db')}"
+                    scenarios.append({
+                        'stage': stage,
+                        'model': model,
+                        'audio_path': audio_path,
+                        'audio_seconds': audio_seconds,
+                        'concurrency': concurrency,
+                        'repeat': args.repeat,
+                        'warmup': args.warmup,
+                        'threads': args.threads,
+                        'use_server': args.server,
+                        'timeout': args.timeout,
+                        'verbose': args.verbose,
+                        'env': env,
+                        'workdir': workdir
+                    })
+    return scenarios
+
+
+def prepare_fixtures(args):
+    """Lista de (caminho, duração) dos áudios do benchmark"""
+    if args.audio:
+        fixtures = []
+        for path in args.audio:
+            with wave.open(path, 'rb') as wav:
+                fixtures.append((os.path.abspath(path), round(wav.getnframes() / wav.getframerate(), 3)))
+        return fixtures
+
+    os.makedirs(args.fixtures_dir, exist_ok=True)
+    fixtures = []
+    for seconds in args.lengths:
+        path = os.path.join(args.fixtures_dir, f"fixture_{seconds:g}s_seed{args.seed}.wav")
+        if not os.path.exists(path):
+            generate_fixture(path, seconds, seed=args.seed)
+        fixtures.append((path, float(seconds)))
+    return fixtures
+
+
+def run_benchmark(args):
+    fixtures = prepare_fixtures(args)
+    workroot = tempfile.mkdtemp(prefix='transcript_bench_')
+
+    base_env = {'TRANSCRIPTION_CACHE': '0', 'UPLOAD_RETENTION_HOURS': '0'}
+    if args.threads:
+        base_env['WHISPER_THREADS'] = str(args.threads)
+    if args.stub:
+        models_dir = os.path.join(workroot, 'models')
+        create_stub_models(models_dir, args.models)
+        base_env.update({
+            'WHISPER_CLI_PATH': STUB_WHISPER_CLI,
+            'FFMPEG_BINARY': STUB_FFMPEG,
+            'WHISPER_MODELS_DIR': models_dir,
+            'WHISPER_SERVER': '0'
+        })
+    elif not args.server:
+        base_env['WHISPER_SERVER'] = '0'
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    try:
+        for config in build_scenarios(args, fixtures, base_env, workroot):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_scenario, config).result()
+            results.append(result)
+            print_result(result)
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workroot, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'git_commit': _git_commit(),
+            'stub': args.stub,
+            'threads': args.threads,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def print_result(result):
+    model = result['model'] or '-'
+    print(
+        f"{result['stage']:<10} {model:<14} {result['audio_seconds']:>7.1f}s  "
+        f"c={result['concurrency']:<3} p50={_fmt(result['p50_seconds'])}s "
+        f"p95={_fmt(result['p95_seconds'])}s rtf={_fmt(result['rtf'])} "
+        f"{_fmt(result['files_per_second'])} arq/s rss={result['peak_rss_mb']}MB "
+        f"erros={result['errors']}"
+    )
+
+
+def _fmt(value):
+    return f"{value:.3f}" if value is not None else '-'
+
+
+def _scenario_key(result):
+    return (result['stage'], result['model'], result['audio_seconds'], result['concurrency'])
+
+
+def compare_results(baseline_path, current_path, threshold):
+    """
+    Compara dois arquivos de resultados e retorna as regressões acima do limite
+
+    Uma regressão é um aumento de latência/RTF (ou queda de vazão) maior que
+    `threshold` (fração, 0.1 = 10%) em um cenário presente nos dois arquivos.
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {_scenario_key(r): r for r in json.load(f)['results']}
+    with open(current_path, 'r', encoding='utf-8') as f:
+        current = {_scenario_key(r): r for r in json.load(f)['results']}
+
+    regressions = []
+    for key in sorted(set(baseline) & set(current), key=str):
+        old, new = baseline[key], current[key]
+        changes = []
+        for metric, higher_is_better in _COMPARED_METRICS.items():
+            if not old.get(metric) or new.get(metric) is None:
+                continue
+            delta = (new[metric] - old[metric]) / old[metric]
+            changes.append(f"{metric} {delta:+.1%}")
+            worse = -delta if higher_is_better else delta
+            if worse > threshold:
+                regressions.append({'scenario': key, 'metric': metric,
+                                    'baseline': old[metric], 'current': new[metric]})
+        stage, model, seconds, concurrency = key
+        print(f"{stage:<10} {model or '-':<14} {seconds:>7.1f}s  c={concurrency:<3} " + ', '.join(changes))
+
+    for key in sorted(set(baseline) ^ set(current), key=str):
+        origin = 'base' if key in baseline else 'atual'
+        print(f"Cenário presente apenas no arquivo {origin}: {key}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de transcrição')
+    parser.add_argument('--models', type=lambda v: v.split(','), default=['base'],
+                        help='Modelos separados por vírgula (padrão: base)')
+    parser.add_argument('--lengths', type=lambda v: [float(x) for x in v.split(',')],
+                        default=[10.0, 60.0], help='Durações dos áudios gerados, em segundos')
+    parser.add_argument('--audio', nargs='+', help='WAVs a usar em vez dos gerados')
+    parser.add_argument('--concurrency', type=lambda v: [int(x) for x in v.split(',')],
+                        default=[1], help='Níveis de concorrência separados por vírgula')
+    parser.add_argument('--stages', type=lambda v: v.split(','), default=list(STAGES),
+                        help=f"Etapas separadas por vírgula ({', '.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Execuções por nível de concorrência (total = repeat * concorrência)')
+    parser.add_argument('--warmup', type=int, default=1, help='Execuções descartadas antes da medição')
+    parser.add_argument('--threads', type=int, help='Threads do whisper.cpp por transcrição')
+    parser.add_argument('--server', action='store_true', help='Usar o whisper-server residente')
+    parser.add_argument('--timeout', type=float, default=600, help='Tempo máximo por execução HTTP')
+    parser.add_argument('--seed', type=int, default=0, help='Semente dos áudios gerados')
+    parser.add_argument('--fixtures-dir', default=os.path.join(tempfile.gettempdir(), 'transcript_bench_fixtures'),
+                        help='Diretório dos áudios gerados (reutilizados entre execuções)')
+    parser.add_argument('--stub', action='store_true',
+                        help='Usar os substitutos de whisper-cli e FFmpeg em scripts/ (sem whisper.cpp)')
+    parser.add_argument('--output', help='Arquivo JSON para gravar os resultados')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar as mensagens da aplicação')
+    parser.add_argument('--keep-workdir', action='store_true', help='Manter os arquivos temporários')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'ATUAL'),
+                        help='Comparar dois arquivos de resultados')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Piora relativa considerada regressão em --compare (padrão: 0.1)')
+    args = parser.parse_args(argv)
+
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Etapas desconhecidas: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.compare:
+        regressions = compare_results(args.compare[0], args.compare[1], args.threshold)
+        for item in regressions:
+            print(f"❌ Regressão em {item['scenario']}: {item['metric']} "
+                  f"{item['baseline']} → {item['current']}")
+        if not regressions:
+            print("✅ Nenhuma regressão acima do limite")
+        return 1 if regressions else 0
+
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}")
+    return 1 if any(r['errors'] for r in report['results']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Diarização de falantes (quem falou quando) em CPU
+
+Executada sobre o mesmo áudio PCM 16 kHz entregue ao whisper.cpp, em uma
+thread própria, enquanto a inferência roda no whisper-cli/whisper-server:
+o tempo total fica próximo ao da transcrição sozinha. As etapas são:
+
+    1. MFCC por quadro (25 ms, passo de 10 ms), lendo o áudio em blocos
+    2. Detecção de voz por energia; cada trecho de fala (entre pausas) é
+       dividido em janelas de até 1,5 s (passo de 0,75 s), e cada janela vira
+       um vetor (média e desvio padrão dos MFCC normalizados)
+    3. Agrupamento dos vetores por k-means esférico; sem o número de
+       falantes, um novo grupo é criado enquanto houver janelas distantes de
+       todos os centros (similaridade de cosseno abaixo de `threshold`)
+    4. Suavização dos rótulos e junção das janelas em turnos de fala
+
+Os turnos são atribuídos aos segmentos da transcrição por sobreposição
+(assign_speakers). Requer o numpy (opcional; sem ele a diarização fica
+indisponível e a transcrição segue normalmente).
+
+Configuração via variáveis de ambiente:
+    DIARIZATION_THRESHOLD: similaridade mínima a um centro para não criar um novo falante
+    DIARIZATION_MAX_SPEAKERS: número máximo de falantes detectados automaticamente
+
+Exemplo de uso:
+    turns = Diarizer().diarize("reuniao.wav")
+    assign_speakers(segments, turns)
+"""
+
+import os
+from typing import List, NamedTuple, Optional
+
+import audio_utils
+from pcm_audio import SAMPLE_RATE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quadros de análise (amostras a 16 kHz)
+FRAME_SIZE = 400     # 25 ms
+FRAME_HOP = 160      # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 20
+
+# Janelas agrupadas (em quadros)
+WINDOW_FRAMES = 150  # 1,5 s
+WINDOW_HOP = 75      # 0,75 s
+
+# Quadros acima de (energia máxima - faixa dinâmica) contam como voz (log natural, ~40 dB)
+VOICE_DYNAMIC_RANGE = 9.2
+MIN_VOICED_FRACTION = 0.5
+
+# Pausas mais longas que isso separam trechos de fala; trechos mais curtos que o mínimo são ignorados
+MIN_PAUSE_FRAMES = 30    # 0,3 s
+MIN_REGION_FRAMES = 50   # 0,5 s
+
+# Janelas mínimas para aceitar um novo falante (~3 s de fala)
+MIN_CLUSTER_WINDOWS = 4
+KMEANS_ITERATIONS = 20
+
+# Janelas do mesmo falante separadas por pausas até este limite (s) formam um único turno
+MAX_TURN_GAP = 1.0
+
+# Blocos lidos do áudio (60 s)
+READ_BLOCK_FRAMES = 60 * SAMPLE_RATE
+
+
+class SpeakerTurn(NamedTuple):
+    start: float
+    end: float
+    speaker: int
+
+
+def is_available() -> bool:
+    """Se a diarização pode ser usada (numpy instalado)"""
+    return np is not None
+
+
+class Diarizer:
+    """
+    Diarização por vetores espectrais e agrupamento
+
+    Args:
+        threshold: Similaridade de cosseno mínima ao centro mais próximo para
+            uma janela não originar um novo falante (padrão:
+            DIARIZATION_THRESHOLD ou 0.25)
+        max_speakers: Limite de falantes na detecção automática (padrão:
+            DIARIZATION_MAX_SPEAKERS ou 8)
+    """
+
+    def __init__(self, threshold: Optional[float] = None, max_speakers: Optional[int] = None):
+        if np is None:
+            raise RuntimeError("Diarização indisponível: instale o numpy")
+        self.threshold = threshold if threshold is not None else float(
+            os.environ.get('DIARIZATION_THRESHOLD', 0.25))
+        self.max_speakers = max_speakers or int(os.environ.get('DIARIZATION_MAX_SPEAKERS', 8))
+        self._mel = _mel_filterbank()
+        self._dct = _dct_matrix()
+        self._window = np.hamming(FRAME_SIZE).astype(np.float32)
+
+    def diarize(self, audio: audio_utils.AudioSource, num_speakers: Optional[int] = None) -> List[SpeakerTurn]:
+        """
+        Turnos de fala do áudio, em ordem, com falantes numerados pela primeira aparição
+
+        Args:
+            audio: Caminho do WAV 16 kHz mono ou PcmAudio
+            num_speakers: Número de falantes, se conhecido
+        """
+        mfcc, energy = self._features(audio)
+        windows, embeddings = self._embeddings(mfcc, energy)
+        if len(embeddings) == 0:
+            return []
+
+        if num_speakers:
+            labels = _kmeans(embeddings, _farthest_first(embeddings, num_speakers))
+        else:
+            labels = self._cluster(embeddings)
+        return _turns(windows, _smooth(labels))
+
+    def _features(self, audio):
+        """MFCC (sem o coeficiente 0) e log-energia de cada quadro, lidos em blocos"""
+        mfccs, energies = [], []
+        carry = np.zeros(0, dtype=np.float32)
+        with audio_utils.open_wav(audio) as wav:
+            while True:
+                data = wav.readframes(READ_BLOCK_FRAMES)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+                buffer = np.concatenate([carry, samples])
+                if len(buffer) < FRAME_SIZE:
+                    carry = buffer
+                    continue
+                frames = np.lib.stride_tricks.sliding_window_view(buffer, FRAME_SIZE)[::FRAME_HOP]
+                carry = buffer[len(frames) * FRAME_HOP:]
+
+                power = np.abs(np.fft.rfft(frames * self._window, N_FFT)) ** 2
+                energies.append(np.log(power.sum(axis=1) + 1e-10).astype(np.float32))
+                log_mel = np.log(power @ self._mel.T + 1e-10)
+                mfccs.append((log_mel @ self._dct.T)[:, 1:].astype(np.float32))
+
+        if not mfccs:
+            return np.zeros((0, N_MFCC - 1), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(mfccs), np.concatenate(energies)
+
+    def _embeddings(self, mfcc, energy):
+        """Vetores das janelas de fala e o intervalo (início, fim) de cada uma, em segundos"""
+        empty = np.zeros((0, 2 * (N_MFCC - 1)), dtype=np.float32)
+        if len(mfcc) == 0:
+            return [], empty
+        voiced = energy > energy.max() - VOICE_DYNAMIC_RANGE
+        if voiced.sum() < MIN_REGION_FRAMES:
+            return [], empty
+        # Normalização cepstral (média e variância do arquivo, só quadros com voz)
+        mfcc = (mfcc - mfcc[voiced].mean(axis=0)) / (mfcc[voiced].std(axis=0) + 1e-6)
+
+        # Janelas não atravessam pausas: uma janela com dois falantes formaria um grupo próprio
+        windows, vectors = [], []
+        for region_start, region_end in _speech_regions(voiced):
+            firsts = list(range(region_start, max(region_start + 1, region_end - WINDOW_FRAMES + 1), WINDOW_HOP))
+            if firsts[-1] + WINDOW_FRAMES < region_end:
+                # Última janela alinhada ao fim do trecho
+                firsts.append(region_end - WINDOW_FRAMES)
+            for first in firsts:
+                end = min(first + WINDOW_FRAMES, region_end)
+                mask = voiced[first:end]
+                if mask.mean() < MIN_VOICED_FRACTION:
+                    continue
+                frames = mfcc[first:end][mask]
+                windows.append((first * FRAME_HOP / SAMPLE_RATE, end * FRAME_HOP / SAMPLE_RATE))
+                vectors.append(np.concatenate([frames.mean(axis=0), frames.std(axis=0)]))
+        if not vectors:
+            return [], empty
+
+        embeddings = np.array(vectors, dtype=np.float32)
+        embeddings -= embeddings.mean(axis=0)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9
+        return windows, embeddings
+
+    def _cluster(self, embeddings):
+        """Rótulos com o número de falantes estimado pelo limiar de similaridade"""
+        centers = _farthest_first(embeddings, 1)
+        labels = np.zeros(len(embeddings), dtype=np.int64)
+        while len(centers) < self.max_speakers:
+            similarity = (embeddings @ centers.T).max(axis=1)
+            candidate = int(similarity.argmin())
+            if similarity[candidate] >= self.threshold:
+                break
+            trial = _kmeans(embeddings, np.vstack([centers, embeddings[candidate]]))
+            if np.bincount(trial, minlength=len(centers) + 1).min() < MIN_CLUSTER_WINDOWS:
+                break
+            labels = trial
+            centers = _centers(embeddings, labels, len(centers) + 1)
+        return labels
+
+
+def _speech_regions(voiced):
+    """Intervalos de quadros com voz, unindo pausas curtas e ignorando trechos curtos"""
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < MIN_PAUSE_FRAMES:
+            regions[-1] = (regions[-1][0], int(end))
+        else:
+            regions.append((int(start), int(end)))
+    return [(start, end) for start, end in regions if end - start >= MIN_REGION_FRAMES]
+
+
+def _mel_filterbank():
+    """Filtros triangulares na escala mel (N_MELS x bins do FFT)"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    points = mel_to_hz(np.linspace(hz_to_mel(20.0), hz_to_mel(SAMPLE_RATE / 2), N_MELS + 2))
+    bins = np.floor((N_FFT + 1) * points / SAMPLE_RATE).astype(int)
+    bank = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+    for m in range(1, N_MELS + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            bank[m - 1, k] = (k - left) / max(1, center - left)
+        for k in range(center, right):
+            bank[m - 1, k] = (right - k) / max(1, right - center)
+    return bank
+
+
+def _dct_matrix():
+    """DCT-II ortonormal (N_MFCC x N_MELS)"""
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, None]
+    matrix = np.cos(np.pi * k * (2 * n + 1) / (2 * N_MELS)) * np.sqrt(2.0 / N_MELS)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+def _farthest_first(embeddings, k):
+    """Centros iniciais determinísticos: cada novo centro é a janela menos parecida com os anteriores"""
+    centers = [embeddings[int((embeddings @ embeddings.mean(axis=0)).argmax())]]
+    while len(centers) < min(k, len(embeddings)):
+        similarity = (embeddings @ np.array(centers).T).max(axis=1)
+        centers.append(embeddings[int(similarity.argmin())])
+    return np.array(centers)
+
+
+def _centers(embeddings, labels, k):
+    centers = np.zeros((k, embeddings.shape[1]), dtype=embeddings.dtype)
+    for index in range(k):
+        members = embeddings[labels == index]
+        if len(members):
+            centers[index] = members.mean(axis=0)
+    return centers / (np.linalg.norm(centers, axis=1, keepdims=True) + 1e-9)
+
+
+def _kmeans(embeddings, centers):
+    """K-means esférico (similaridade de cosseno) a partir dos centros dados"""
+    labels = (embeddings @ centers.T).argmax(axis=1)
+    for _ in range(KMEANS_ITERATIONS):
+        centers = _centers(embeddings, labels, len(centers))
+        updated = (embeddings @ centers.T).argmax(axis=1)
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+
+def _smooth(labels):
+    """Remove trocas de falante de uma única janela (ruído do agrupamento)"""
+    labels = labels.copy()
+    for index in range(1, len(labels) - 1):
+        if labels[index - 1] == labels[index + 1] != labels[index]:
+            labels[index] = labels[index - 1]
+    return labels
+
+
+def _turns(windows, labels):
+    """Junta janelas consecutivas do mesmo falante; falantes renumerados pela ordem de aparição"""
+    numbering = {}
+    turns = []
+    for (start, end), label in zip(windows, labels):
+        speaker = numbering.setdefault(int(label), len(numbering))
+        previous = turns[-1] if turns else None
+        if previous and previous.speaker == speaker and start <= previous.end + MAX_TURN_GAP:
+            turns[-1] = previous._replace(end=end)
+        elif previous and start < previous.end:
+            # Janelas sobrepostas de falantes diferentes: a fronteira fica no meio da sobreposição
+            boundary = (start + previous.end) / 2
+            turns[-1] = previous._replace(end=boundary)
+            turns.append(SpeakerTurn(boundary, end, speaker))
+        else:
+            turns.append(SpeakerTurn(start, end, speaker))
+    return [SpeakerTurn(round(t.start, 3), round(t.end, 3), t.speaker) for t in turns]
+
+
+def assign_speakers(segments, turns: List[SpeakerTurn]):
+    """
+    Atribui a cada segmento o falante com maior sobreposição (ou o turno mais próximo)
+
+    Args:
+        segments: SegmentTable com os tempos da transcrição (alterada no lugar)
+        turns: Resultado de Diarizer.diarize
+    """
+    if not turns or not segments.timed:
+        return
+    speakers = []
+    for segment in segments:
+        best, best_overlap, best_distance = None, 0.0, float('inf')
+        for turn in turns:
+            overlap = min(segment.end, turn.end) - max(segment.start, turn.start)
+            if overlap > best_overlap:
+                best, best_overlap = turn.speaker, overlap
+            elif best_overlap <= 0:
+                distance = max(turn.start - segment.end, segment.start - turn.end)
+                if distance < best_distance:
+                    best, best_distance = turn.speaker, distance
+        speakers.append(best)
+    segments.set_speakers(speakers)
@@ -0,0 +1,129 @@
+"""
+Barramento de eventos para Server-Sent Events (SSE)
+
+Os trabalhos de transcrição publicam eventos em canais (por exemplo
+'batch:<id>' ou 'single:<id>') e cada conexão SSE assina o canal do seu
+trabalho, recebendo as mudanças assim que acontecem, sem polling.
+
+Exemplo de uso:
+    bus = EventBus()
+    subscription = bus.subscribe("batch:abc")
+    bus.publish("batch:abc", "file", {"index": 0, "status": "completed"})
+    for chunk in sse_stream(subscription, initial=[("status", {...})]):
+        ...
+"""
+
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Eventos que encerram o stream do cliente ('failed' em vez de 'error', que o
+# EventSource do navegador reserva para falhas de conexão)
+TERMINAL_EVENTS = ('completed', 'failed')
+
+
+class Subscription:
+    """Fila de eventos de um assinante"""
+
+    def __init__(self, bus: 'EventBus', channel: str, max_pending: int = 1000):
+        self.bus = bus
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=max_pending)
+
+    def get(self, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Publica eventos para todos os assinantes de um canal"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.channel, None)
+
+    def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, []))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait((event, data))
+            except queue.Full:
+                # Cliente lento: descartar em vez de bloquear o worker
+                pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Formata um evento no protocolo text/event-stream"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_stream(
+    subscription: Subscription,
+    initial: Iterable[Tuple[str, Dict[str, Any]]] = (),
+    keepalive: float = 15.0,
+    refresh: Optional[Callable[[], Optional[Tuple[str, Dict[str, Any]]]]] = None,
+    refresh_interval: float = 1.0
+) -> Iterator[str]:
+    """
+    Gera o corpo de uma resposta SSE
+
+    Envia primeiro os eventos de `initial` (estado atual do trabalho) e depois
+    os eventos publicados no canal, até um evento terminal. Comentários de
+    keepalive evitam que proxies encerrem a conexão ociosa.
+
+    Se `refresh` for informado, ele é chamado a cada `refresh_interval`
+    segundos sem eventos e pode devolver um evento com o estado atual. Isso
+    cobre trabalhos executados por outro processo, cujos eventos não passam
+    por este barramento.
+    """
+    try:
+        for event, data in initial:
+            yield format_sse(event, data)
+            if event in TERMINAL_EVENTS:
+                return
+
+        wait = refresh_interval if refresh else keepalive
+        idle = 0.0
+        while True:
+            item = subscription.get(timeout=wait)
+            if item is None and refresh:
+                item = refresh()
+            if item is None:
+                idle += wait
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+                continue
+            idle = 0.0
+            event, data = item
+            yield format_sse(event, data)
+            if event in TERMINAL_EVENTS:
+                return
+    finally:
+        subscription.close()
@@ -20,6 +20,108 @@ function App() {
   const [, setBatchId] = useState(null);
 
   const pollingRef = useRef(null);
+  const eventsRef = useRef(null);
+
+  const stopWatching = () => {
+    if (pollingRef.current) clearInterval(pollingRef.current);
+    if (eventsRef.current) {
+      eventsRef.current.close();
+      eventsRef.current = null;
+    }
+  };
+
+  // Progresso via SSE; se a conexão falhar, volta para o polling
+  const watchSingle = () => {
+    stopWatching();
+    if (typeof EventSource === 'undefined') {
+      startPollingSingle();
+      return;
+    }
+
+    const source = api.subscribeTranscriptionEvents();
+    eventsRef.current = source;
+
+    source.addEventListener('status', (e) => {
+      const data = JSON.parse(e.data);
+      setStatusObj(prev => ({ ...prev, state: data.status, queuePosition: data.queue_position }));
+    });
+    source.addEventListener('segment', (e) => {
+      const segment = JSON.parse(e.data);
+      setStatusObj(prev => ({
+        ...prev,
+        state: 'processing',
+        partialText: `${prev.partialText ? prev.partialText + ' ' : ''}${segment.text}`
+      }));
+    });
+    source.addEventListener('completed', (e) => {
+      const data = JSON.parse(e.data);
+      stopWatching();
+      setAppState('completed');
+      setResult({ text: data.text, filename: data.filename });
+      setStatusObj(prev => ({ ...prev, state: 'completed', progress: 100 }));
+    });
+    source.addEventListener('failed', (e) => {
+      const data = JSON.parse(e.data);
+      stopWatching();
+      setAppState('idle');
+      alert(`Erro: ${data.error}`);
+    });
+    source.onerror = () => {
+      if (eventsRef.current !== source) return;
+      stopWatching();
+      startPollingSingle();
+    };
+  };
+
+  const watchBatch = (bid) => {
+    stopWatching();
+    if (typeof EventSource === 'undefined') {
+      startPollingBatch(bid);
+      return;
+    }
+
+    const source = api.subscribeBatchEvents(bid);
+    eventsRef.current = source;
+
+    const applySnapshot = (data) => {
+      setStatusObj({
+        state: data.status,
+        total: data.total,
+        completed: data.completed,
+        currentFile: data.files.find(f => f.status === 'processing')?.name,
+        files: data.files
+      });
+    };
+
+    source.addEventListener('status', (e) => applySnapshot(JSON.parse(e.data)));
+    source.addEventListener('file', (e) => {
+      const data = JSON.parse(e.data);
+      setStatusObj(prev => {
+        const files = [...(prev.files || [])];
+        files[data.index] = { name: data.name, status: data.status, error: data.error };
+        return {
+          ...prev,
+          state: 'processing',
+          total: data.total,
+          completed: data.completed,
+          currentFile: files.find(f => f?.status === 'processing')?.name,
+          files
+        };
+      });
+    });
+    source.addEventListener('completed', (e) => {
+      const data = JSON.parse(e.data);
+      stopWatching();
+      applySnapshot(data);
+      setAppState('completed');
+      setResult(data);
+    });
+    source.onerror = () => {
+      if (eventsRef.current !== source) return;
+      stopWatching();
+      startPollingBatch(bid);
+    };
+  };
 
   const startPollingSingle = () => {
     if (pollingRef.current) clearInterval(pollingRef.current);
@@ -37,7 +139,7 @@ function App() {
           setAppState('idle');
           alert(`Erro: ${data.error}`);
         } else if (data.status === 'processing') {
-          setStatusObj(prev => ({ ...prev, state: 'processing' }));
+          setStatusObj(prev => ({ ...prev, state: 'processing', partialText: data.partial_text }));
         }
       } catch (e) {
         console.error("Polling error", e);
@@ -82,7 +184,7 @@ function App() {
         setStatusObj({ state: 'processing', filename: files[0].name });
 
         await api.transcribe(language, model);
-        startPollingSingle();
+        watchSingle();
 
       } else {
         setAppState('uploading');
@@ -94,7 +196,7 @@ function App() {
         setStatusObj({ state: 'ready', total: files.length, completed: 0, files: [] }); // Initial status
 
         await api.transcribeBatch(bid, language, model);
-        startPollingBatch(bid);
+        watchBatch(bid);
       }
     } catch (e) {
       console.error("Error starting process", e);
@@ -104,7 +206,7 @@ function App() {
   };
 
   const handleCancel = () => {
-    if (pollingRef.current) clearInterval(pollingRef.current);
+    stopWatching();
     setAppState('idle');
     setResult(null);
     setStatusObj({});
@@ -115,7 +217,7 @@ function App() {
       const response = await fetch('http://localhost:8080/export', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text, format })
+        body: JSON.stringify({ text, format, filename: result?.filename })
       });
       const blob = await response.blob();
       const url = window.URL.createObjectURL(blob);
@@ -2,7 +2,7 @@ import React from 'react';
 import { FileText, Download, Play, CheckCircle, AlertTriangle } from 'lucide-react';
 
 export function BatchResults({ results, onReset }) {
-    // results: { session_name, total, completed, transcriptions: [], errors: [] }
+    // results: { batch_id, session_name, total, completed, transcriptions: [], errors: [] }
 
     return (
         <div className="w-full space-y-6">
@@ -28,10 +28,13 @@ export function BatchResults({ results, onReset }) {
 
                 {/* Global Actions */}
                 <div className="flex gap-3 mb-6">
-                    <button className="flex-1 bg-primary/10 hover:bg-primary/20 text-primary border border-primary/20 rounded-lg py-3 font-medium flex items-center justify-center gap-2 transition-colors">
+                    <a
+                        href={`http://localhost:8080/batch/${results.batch_id}/export.zip`}
+                        className="flex-1 bg-primary/10 hover:bg-primary/20 text-primary border border-primary/20 rounded-lg py-3 font-medium flex items-center justify-center gap-2 transition-colors"
+                    >
                         <FileText className="w-4 h-4" />
-                        Baixar Resumo Consolidado (.md)
-                    </button>
+                        Baixar Transcrições e Resumo (.zip)
+                    </a>
                 </div>
 
                 {/* File List */}
@@ -52,9 +55,13 @@ export function BatchResults({ results, onReset }) {
                                 <button className="p-2 text-gray-400 hover:text-white rounded hover:bg-white/10" title="Editar">
                                     <FileText className="w-4 h-4" />
                                 </button>
-                                <button className="p-2 text-gray-400 hover:text-white rounded hover:bg-white/10" title="Download">
+                                <a
+                                    href={`http://localhost:8080/export/${results.batch_id}?index=${item.index}&format=txt`}
+                                    className="p-2 text-gray-400 hover:text-white rounded hover:bg-white/10"
+                                    title="Download"
+                                >
                                     <Download className="w-4 h-4" />
-                                </button>
+                                </a>
                             </div>
                         </div>
                     ))}
@@ -37,6 +37,13 @@ export function EditorSection({ transcription, filename, onExport }) {
                     >
                         <Download className="w-4 h-4" />
                     </button>
+                    <button
+                        onClick={() => onExport(text, 'srt')}
+                        className="px-2 py-1 text-xs text-gray-400 hover:text-white hover:bg-white/10 rounded-md transition-colors"
+                        title="Download legendas SRT"
+                    >
+                        SRT
+                    </button>
                     <div className="h-4 w-px bg-border mx-1"></div>
                     <button
                         className="px-3 py-1.5 bg-primary/10 text-primary hover:bg-primary/20 rounded-md text-sm font-medium transition-colors"
@@ -4,16 +4,21 @@ import { FileText, Download, Trash2, Calendar, Clock } from 'lucide-react';
 export function HistoryView() {
     const [history, setHistory] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
 
     useEffect(() => {
         loadHistory();
     }, []);
 
-    const loadHistory = async () => {
+    const loadHistory = async (cursor = null) => {
         try {
-            const res = await fetch('http://localhost:8080/history');
+            const url = cursor
+                ? `http://localhost:8080/history?cursor=${encodeURIComponent(cursor)}`
+                : 'http://localhost:8080/history';
+            const res = await fetch(url);
             const data = await res.json();
-            setHistory(data);
+            setHistory(prev => (cursor ? [...prev, ...data] : data));
+            setNextCursor(res.headers.get('X-Next-Cursor'));
         } catch (e) {
             console.error("Error loading history", e);
         } finally {
@@ -84,6 +89,14 @@ export function HistoryView() {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <button
+                            onClick={() => loadHistory(nextCursor)}
+                            className="w-full py-2 text-sm text-gray-400 hover:text-white"
+                        >
+                            Carregar mais
+                        </button>
+                    )}
                 </div>
             )}
         </div>
@@ -39,6 +39,11 @@ export function ProcessingStatus({ mode, status, onCancel }) {
                     <p className="text-xs text-gray-500 text-center">
                         Isso pode levar alguns minutos dependendo do tamanho do arquivo e do modelo escolhido.
                     </p>
+                    {status.partialText && (
+                        <div className="bg-surface rounded-lg p-4 border border-border max-h-48 overflow-y-auto text-sm text-gray-300 whitespace-pre-wrap">
+                            {status.partialText}
+                        </div>
+                    )}
                 </div>
             ) : (
                 <div className="space-y-6">
@@ -77,6 +82,10 @@ export function ProcessingStatus({ mode, status, onCancel }) {
                                     <span className="text-success flex items-center gap-1 text-xs"><CheckCircle className="w-3 h-3" /> Feito</span>
                                 ) : file.status === 'processing' ? (
                                     <span className="text-primary flex items-center gap-1 text-xs"><Loader2 className="w-3 h-3 animate-spin" /> Processando</span>
+                                ) : file.status === 'converting' ? (
+                                    <span className="text-gray-400 flex items-center gap-1 text-xs"><Loader2 className="w-3 h-3 animate-spin" /> Convertendo</span>
+                                ) : file.status === 'error' ? (
+                                    <span className="text-red-400 flex items-center gap-1 text-xs" title={file.error || ''}>Erro</span>
                                 ) : (
                                     <span className="text-gray-600 flex items-center gap-1 text-xs"><Clock className="w-3 h-3" /> Fila</span>
                                 )}
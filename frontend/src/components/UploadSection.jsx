@@ -194,6 +194,9 @@ export function UploadSection({ mode, onUploadComplete, isProcessing }) {
                             onChange={(e) => setModel(e.target.value)}
                             className="w-full bg-surface-secondary border border-border rounded-lg px-3 py-2 text-sm text-white focus:ring-2 focus:ring-primary outline-none"
                         >
+                            {Object.keys(availableModels).filter(key => availableModels[key]).length > 0 && (
+                                <option value="auto">Automático</option>
+                            )}
                             {Object.keys(availableModels).filter(key => availableModels[key]).map((modelName) => (
                                 <option key={modelName} value={modelName}>
                                     {modelName.charAt(0).toUpperCase() + modelName.slice(1)}
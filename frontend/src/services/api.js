@@ -43,6 +43,15 @@ export const api = {
         return response.data;
     },
 
+    // Server-Sent Events: progresso enviado pelo servidor, sem polling
+    subscribeTranscriptionEvents: () => {
+        return new EventSource(`${API_Base_URL}/events/transcription`, { withCredentials: true });
+    },
+
+    subscribeBatchEvents: (batchId) => {
+        return new EventSource(`${API_Base_URL}/events/batch/${batchId}`, { withCredentials: true });
+    },
+
     listModels: async () => {
         const response = await axios.get(`${API_Base_URL}/models`);
         return response.data;
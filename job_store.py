@@ -0,0 +1,885 @@
+"""
+Armazenamento durável de trabalhos de transcrição
+
+Guarda trabalhos (individuais e em lote), seus arquivos, estados e resultados
+fora da memória do processo. Assim uma reinicialização não perde os trabalhos
+e vários processos do servidor web (por exemplo, workers do gunicorn) podem
+consultar o mesmo estado.
+
+A implementação padrão usa SQLite em modo WAL, que permite leituras
+concorrentes com um escritor por vez entre processos do mesmo host.
+
+Exemplo de uso:
+    store = create_job_store("sqlite:///jobs.db")
+    store.create_job("abc123", kind="batch", total=2)
+    store.add_file("abc123", 0, display_name="audio.mp3", status="pending")
+    job = store.get_job("abc123")
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+# Colunas com valores JSON (listas/dicionários) em vez de escalares
+_JSON_COLUMNS = {'errors', 'options'}
+
+# Colunas do histórico que podem ser usadas como filtro
+_TRANSCRIPTION_FILTERS = {'job_id', 'session_name', 'language', 'model', 'kind'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    session_name TEXT NOT NULL DEFAULT '',
+    sanitized_name TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    finished INTEGER NOT NULL DEFAULT 0,
+    current_file INTEGER NOT NULL DEFAULT 0,
+    errors TEXT NOT NULL DEFAULT '[]',
+    options TEXT NOT NULL DEFAULT '{}',
+    result_text TEXT,
+    result_file TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    display_name TEXT NOT NULL DEFAULT '',
+    original_filename TEXT,
+    converted_file TEXT,
+    wav_path TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    queue_id TEXT,
+    owner TEXT,
+    decode_seconds REAL,
+    transcription TEXT,
+    transcription_file TEXT,
+    partial_text TEXT,
+    model TEXT,
+    language TEXT,
+    language_probability REAL,
+    PRIMARY KEY (job_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    received INTEGER NOT NULL DEFAULT 0,
+    crc32 INTEGER NOT NULL DEFAULT 0,
+    expected_crc32 INTEGER,
+    status TEXT NOT NULL DEFAULT 'receiving',
+    writer TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS transcriptions (
+    filename TEXT PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'transcription',
+    job_id TEXT,
+    session_name TEXT NOT NULL DEFAULT '',
+    source_name TEXT,
+    language TEXT,
+    model TEXT,
+    duration REAL,
+    size INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS storage_files (
+    path TEXT PRIMARY KEY,
+    area TEXT NOT NULL,
+    role TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    job_id TEXT,
+    idx INTEGER,
+    modified_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS storage_counters (
+    area TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_storage_files_age ON storage_files(area, modified_at);
+CREATE INDEX IF NOT EXISTS idx_storage_files_job ON storage_files(job_id, idx);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_created ON transcriptions(created_at DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_job ON transcriptions(job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_job_files_status ON job_files(status);
+"""
+
+# Colunas adicionadas depois da criação das tabelas: (tabela, coluna, definição).
+# Bancos criados por versões anteriores recebem a coluna na inicialização.
+_ADDED_COLUMNS = (
+    ('job_files', 'model', 'TEXT'),
+    ('job_files', 'language', 'TEXT'),
+    ('job_files', 'language_probability', 'REAL'),
+)
+
+
+# Índice de busca: um documento por segmento, com os tempos do segmento.
+# 'remove_diacritics 2' faz "acao" encontrar "ação" (e vice-versa).
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transcript_search USING fts5(
+    text,
+    filename UNINDEXED,
+    kind UNINDEXED,
+    seg_start UNINDEXED,
+    seg_end UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def process_owner() -> str:
+    """Identificador do processo atual ('host:pid'), usado para recuperar trabalhos"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_is_alive(owner: Optional[str]) -> bool:
+    """Verifica se o processo dono de um trabalho ainda existe (no mesmo host)"""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        # Outro host: não há como verificar, assumir que está vivo
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore(ABC):
+    """
+    Interface do armazenamento de trabalhos
+
+    Os trabalhos são retornados como dicionários com as colunas da tabela de
+    trabalhos e a chave 'files' (lista de arquivos em ordem). Backends
+    incompletos falham ao serem instanciados, e não no meio de uma requisição.
+    """
+
+    @abstractmethod
+    def create_job(self, job_id: str, kind: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job_version(self, job_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job_owners(self, job_id: str) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_job(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def increment_job(self, job_id: str, **amounts) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_job(self, job_id: str, from_status: str, **fields) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_job_error(self, job_id: str, message: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_file(self, job_id: str, index: int, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_file(self, job_id: str, index: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_file(self, job_id: str, index: int, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_file(self, job_id: str, index: int, from_status: str, **fields) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_partial_text(self, job_id: str, index: int, text: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_interrupted_files(self, owner: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_upload(self, upload_id: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_upload(self, upload_id: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_upload(self, upload_id: str, owner: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_all_jobs(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_transcription(self, filename: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_transcriptions(
+        self,
+        limit: int,
+        before: Optional[Tuple[float, str]] = None,
+        **filters
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_all_transcriptions(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def index_transcript(self, filename: str, kind: str, segments: List[Tuple[Optional[float], Optional[float], str]]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_transcripts(
+        self,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        kind: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def track_file(self, path: str, area: str, role: str, size: int, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def untrack_file(self, path: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def untrack_area(self, area: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def storage_totals(self) -> Dict[str, Dict[str, int]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_storage_files(
+        self,
+        area: Optional[str] = None,
+        roles: Optional[List[str]] = None,
+        older_than: Optional[float] = None,
+        job_status: Optional[str] = None,
+        include_active: bool = False,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_transcription(self, filename: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_meta(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_meta(self, key: str, value: str):
+        raise NotImplementedError
+
+
+class SQLiteJobStore(JobStore):
+    """
+    JobStore baseado em SQLite (WAL)
+
+    Cada thread usa sua própria conexão. Atualizações de contadores são
+    feitas dentro de transações IMMEDIATE, seguras entre processos.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        self._add_missing_columns(conn)
+        try:
+            conn.executescript(_SEARCH_SCHEMA)
+            self.search_available = True
+        except sqlite3.OperationalError:
+            # SQLite compilado sem FTS5
+            self.search_available = False
+
+    def _add_missing_columns(self, conn: sqlite3.Connection):
+        for table, column, definition in _ADDED_COLUMNS:
+            existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError:
+                    # Outro processo adicionou a coluna ao mesmo tempo
+                    pass
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def create_job(self, job_id: str, kind: str, **fields):
+        now = time.time()
+        fields = _encode(fields)
+        fields.update({'id': job_id, 'kind': kind, 'created_at': now, 'updated_at': now})
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO jobs ({columns}) VALUES ({placeholders})",
+            list(fields.values())
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = _decode(row)
+        job['files'] = [
+            dict(file_row)
+            for file_row in conn.execute(
+                "SELECT * FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,)
+            )
+        ]
+        return job
+
+    def get_job_version(self, job_id: str) -> Optional[int]:
+        row = self._conn().execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row['version'] if row else None
+
+    def get_job_owners(self, job_id: str) -> List[str]:
+        """Processos donos dos arquivos do trabalho que ainda não terminaram"""
+        rows = self._conn().execute(
+            "SELECT DISTINCT owner FROM job_files "
+            "WHERE job_id = ? AND owner IS NOT NULL AND status NOT IN ('completed', 'error')",
+            (job_id,)
+        ).fetchall()
+        return [row['owner'] for row in rows]
+
+    def update_job(self, job_id: str, **fields):
+        fields = _encode(fields)
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ?, version = version + 1 WHERE id = ?",
+            list(fields.values()) + [time.time(), job_id]
+        )
+
+    def increment_job(self, job_id: str, **amounts) -> Dict[str, int]:
+        """Incrementa contadores atomicamente e retorna os novos valores (mais 'total')"""
+        conn = self._conn()
+        assignments = ', '.join(f"{name} = {name} + ?" for name in amounts)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ?, version = version + 1 WHERE id = ?",
+                list(amounts.values()) + [time.time(), job_id]
+            )
+            columns = ', '.join(list(amounts) + ['total'])
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row) if row else {}
+
+    def claim_job(self, job_id: str, from_status: str, **fields) -> bool:
+        """Atualiza o trabalho somente se ele estiver em `from_status`; retorna se atualizou"""
+        fields = _encode(fields)
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ?, version = version + 1 "
+            "WHERE id = ? AND status = ?",
+            list(fields.values()) + [time.time(), job_id, from_status]
+        )
+        return cursor.rowcount == 1
+
+    def append_job_error(self, job_id: str, message: str):
+        self._conn().execute(
+            "UPDATE jobs SET errors = json_insert(errors, '$[#]', ?), "
+            "updated_at = ?, version = version + 1 WHERE id = ?",
+            (message, time.time(), job_id)
+        )
+
+    def add_file(self, job_id: str, index: int, **fields):
+        fields.update({'job_id': job_id, 'idx': index})
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO job_files ({columns}) VALUES ({placeholders})",
+            list(fields.values())
+        )
+        self._touch(job_id)
+
+    def get_file(self, job_id: str, index: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT * FROM job_files WHERE job_id = ? AND idx = ?", (job_id, index)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def update_file(self, job_id: str, index: int, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE job_files SET {assignments} WHERE job_id = ? AND idx = ?",
+            list(fields.values()) + [job_id, index]
+        )
+        self._touch(job_id)
+
+    def claim_file(self, job_id: str, index: int, from_status: str, **fields) -> bool:
+        """
+        Atualiza o arquivo somente se ele estiver em `from_status`
+
+        Usado para que apenas um processo/thread faça uma transição de estado
+        (por exemplo, enfileirar um arquivo recém-convertido).
+        """
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        cursor = self._conn().execute(
+            f"UPDATE job_files SET {assignments} WHERE job_id = ? AND idx = ? AND status = ?",
+            list(fields.values()) + [job_id, index, from_status]
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._touch(job_id)
+        return True
+
+    def append_partial_text(self, job_id: str, index: int, text: str):
+        self._conn().execute(
+            "UPDATE job_files SET partial_text = "
+            "CASE WHEN partial_text IS NULL OR partial_text = '' THEN ? ELSE partial_text || ' ' || ? END "
+            "WHERE job_id = ? AND idx = ?",
+            (text, text, job_id, index)
+        )
+        self._touch(job_id)
+
+    def claim_interrupted_files(self, owner: str) -> List[Dict[str, Any]]:
+        """
+        Assume os arquivos pendentes cujo processo dono não existe mais
+
+        Arquivos em conversão voltam para 'uploaded' e arquivos em
+        fila/processamento voltam para 'queued'.
+
+        Returns:
+            Arquivos assumidos (com o novo 'status', 'kind' e 'options' do trabalho)
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT f.*, j.kind, j.options FROM job_files f JOIN jobs j ON j.id = f.job_id "
+                "WHERE f.status IN ('uploaded', 'converting', 'queued', 'processing') "
+                "ORDER BY j.created_at, f.idx"
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                if owner_is_alive(row['owner']) and row['owner'] != owner:
+                    continue
+                status = 'uploaded' if row['status'] in ('uploaded', 'converting') else 'queued'
+                conn.execute(
+                    "UPDATE job_files SET owner = ?, status = ?, partial_text = NULL "
+                    "WHERE job_id = ? AND idx = ?",
+                    (owner, status, row['job_id'], row['idx'])
+                )
+                item = dict(row, status=status)
+                item['options'] = json.loads(item['options'] or '{}')
+                claimed.append(item)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def create_upload(self, upload_id: str, **fields):
+        now = time.time()
+        fields.update({'id': upload_id, 'created_at': now, 'updated_at': now})
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        self._conn().execute(
+            f"INSERT INTO uploads ({columns}) VALUES ({placeholders})",
+            list(fields.values())
+        )
+
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update_upload(self, upload_id: str, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE uploads SET {assignments}, updated_at = ? WHERE id = ?",
+            list(fields.values()) + [time.time(), upload_id]
+        )
+
+    def claim_upload(self, upload_id: str, owner: str) -> bool:
+        """
+        Reserva o upload para uma gravação (um PATCH por vez)
+
+        A reserva de um processo que não existe mais é assumida. Liberar com
+        update_upload(upload_id, writer=None, ...).
+        """
+        conn = self._conn()
+        cursor = conn.execute(
+            "UPDATE uploads SET writer = ? WHERE id = ? AND writer IS NULL",
+            (owner, upload_id)
+        )
+        if cursor.rowcount == 1:
+            return True
+        row = conn.execute("SELECT writer FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        if row is None or owner_is_alive(row['writer']):
+            return False
+        cursor = conn.execute(
+            "UPDATE uploads SET writer = ? WHERE id = ? AND writer = ?",
+            (owner, upload_id, row['writer'])
+        )
+        return cursor.rowcount == 1
+
+    def delete_all_jobs(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM uploads")
+        conn.execute("DELETE FROM job_files")
+        conn.execute("DELETE FROM jobs")
+
+    def record_transcription(self, filename: str, **fields):
+        """Registra (ou atualiza) um arquivo de transcrição no índice do histórico"""
+        fields['filename'] = filename
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        updates = ', '.join(f"{name} = excluded.{name}" for name in fields if name != 'filename')
+        self._conn().execute(
+            f"INSERT INTO transcriptions ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(filename) DO UPDATE SET {updates}",
+            list(fields.values())
+        )
+
+    def list_transcriptions(
+        self,
+        limit: int,
+        before: Optional[Tuple[float, str]] = None,
+        **filters
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista o histórico do mais recente para o mais antigo (paginação por cursor)
+
+        Args:
+            limit: Número máximo de itens
+            before: (created_at, filename) do último item da página anterior
+            filters: Igualdade por coluna (job_id, session_name, language, model, kind)
+                     e intervalo por 'since'/'until' (timestamps)
+        """
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == 'since':
+                clauses.append("created_at >= ?")
+            elif name == 'until':
+                clauses.append("created_at < ?")
+            elif name not in _TRANSCRIPTION_FILTERS:
+                raise ValueError(f"Filtro de histórico inválido: {name}")
+            else:
+                clauses.append(f"{name} = ?")
+            params.append(value)
+        if before is not None:
+            clauses.append("(created_at < ? OR (created_at = ? AND filename < ?))")
+            params.extend([before[0], before[0], before[1]])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT * FROM transcriptions {where} "
+            "ORDER BY created_at DESC, filename DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_all_transcriptions(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM transcriptions")
+        if self.search_available:
+            conn.execute("DELETE FROM transcript_search")
+
+    def index_transcript(self, filename: str, kind: str, segments: List[Tuple[Optional[float], Optional[float], str]]):
+        """Substitui os segmentos indexados de um arquivo (lista de (início, fim, texto))"""
+        if not self.search_available:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM transcript_search WHERE filename = ?", (filename,))
+            conn.executemany(
+                "INSERT INTO transcript_search (text, filename, kind, seg_start, seg_end) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(text, filename, kind, start, end) for start, end, text in segments if text]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def search_transcripts(
+        self,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        kind: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca segmentos pela sintaxe do FTS5 (palavras, "frases", prefixo*, OR, NOT)
+
+        Returns:
+            Segmentos ordenados por relevância (bm25), com trecho destacado em
+            'snippet' e os metadados do histórico do arquivo
+
+        Raises:
+            ValueError: Se a consulta for inválida ou a busca não estiver disponível
+        """
+        if not self.search_available:
+            raise ValueError("Busca indisponível: SQLite sem suporte a FTS5")
+        sql = (
+            "SELECT s.filename, s.kind, s.seg_start, s.seg_end, "
+            "snippet(transcript_search, 0, '<mark>', '</mark>', '…', 16) AS snippet, "
+            "bm25(transcript_search) AS score, "
+            "t.job_id, t.session_name, t.source_name, t.language, t.model, t.created_at "
+            "FROM transcript_search s LEFT JOIN transcriptions t ON t.filename = s.filename "
+            "WHERE transcript_search MATCH ?"
+        )
+        params: List[Any] = [query]
+        if kind:
+            sql += " AND s.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        try:
+            rows = self._conn().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Consulta inválida: {e}")
+        return [dict(row) for row in rows]
+
+    def track_file(self, path: str, area: str, role: str, size: int, **fields):
+        """
+        Registra (ou atualiza) um arquivo armazenado e ajusta os contadores da área
+
+        Campos opcionais: job_id, idx (arquivo do trabalho) e modified_at.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous = conn.execute(
+                "SELECT area, size FROM storage_files WHERE path = ?", (path,)
+            ).fetchone()
+            if previous is not None:
+                self._adjust_counters(conn, previous['area'], -previous['size'], -1)
+            row = {
+                'path': path,
+                'area': area,
+                'role': role,
+                'size': size,
+                'modified_at': fields.pop('modified_at', None) or time.time()
+            }
+            row.update(fields)
+            columns = ', '.join(row)
+            placeholders = ', '.join('?' for _ in row)
+            updates = ', '.join(f"{name} = excluded.{name}" for name in row if name != 'path')
+            conn.execute(
+                f"INSERT INTO storage_files ({columns}) VALUES ({placeholders}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}",
+                list(row.values())
+            )
+            self._adjust_counters(conn, area, size, 1)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def untrack_file(self, path: str) -> Optional[Dict[str, Any]]:
+        """Remove o registro do arquivo e devolve o registro removido (ou None)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM storage_files WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM storage_files WHERE path = ?", (path,))
+                self._adjust_counters(conn, row['area'], -row['size'], -1)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row) if row else None
+
+    def untrack_area(self, area: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM storage_files WHERE area = ?", (area,))
+            conn.execute("DELETE FROM storage_counters WHERE area = ?", (area,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def storage_totals(self) -> Dict[str, Dict[str, int]]:
+        """Bytes e quantidade de arquivos por área, sem percorrer os diretórios"""
+        return {
+            row['area']: {'bytes': row['bytes'], 'count': row['count']}
+            for row in self._conn().execute("SELECT * FROM storage_counters")
+        }
+
+    def list_storage_files(
+        self,
+        area: Optional[str] = None,
+        roles: Optional[List[str]] = None,
+        older_than: Optional[float] = None,
+        job_status: Optional[str] = None,
+        include_active: bool = False,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista arquivos armazenados, do mais antigo para o mais recente
+
+        Args:
+            area: 'uploads' ou 'transcriptions'
+            roles: Papéis do arquivo ('original', 'wav', 'partial', 'transcription'...)
+            older_than: Somente arquivos modificados antes deste timestamp
+            job_status: Somente arquivos cujo arquivo de trabalho está neste estado
+            include_active: Incluir arquivos de trabalhos ainda em andamento
+        """
+        clauses, params = [], []
+        if area:
+            clauses.append("s.area = ?")
+            params.append(area)
+        if roles:
+            clauses.append(f"s.role IN ({', '.join('?' for _ in roles)})")
+            params.extend(roles)
+        if older_than is not None:
+            clauses.append("s.modified_at < ?")
+            params.append(older_than)
+        if job_status:
+            clauses.append("f.status = ?")
+            params.append(job_status)
+        if not include_active:
+            clauses.append("(f.status IS NULL OR f.status IN ('completed', 'error'))")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            "SELECT s.* FROM storage_files s "
+            "LEFT JOIN job_files f ON f.job_id = s.job_id AND f.idx = s.idx "
+            f"{where} ORDER BY s.modified_at LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_transcription(self, filename: str):
+        """Remove um arquivo do histórico e do índice de busca"""
+        conn = self._conn()
+        conn.execute("DELETE FROM transcriptions WHERE filename = ?", (filename,))
+        if self.search_available:
+            conn.execute("DELETE FROM transcript_search WHERE filename = ?", (filename,))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _adjust_counters(self, conn: sqlite3.Connection, area: str, size: int, count: int):
+        conn.execute(
+            "INSERT INTO storage_counters (area, bytes, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(area) DO UPDATE SET bytes = bytes + excluded.bytes, count = count + excluded.count",
+            (area, size, count)
+        )
+
+    def _touch(self, job_id: str):
+        self._conn().execute(
+            "UPDATE jobs SET updated_at = ?, version = version + 1 WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+
+def _encode(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        name: json.dumps(value, ensure_ascii=False) if name in _JSON_COLUMNS else value
+        for name, value in fields.items()
+    }
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    data = dict(row)
+    for name in _JSON_COLUMNS:
+        if name in data and data[name] is not None:
+            data[name] = json.loads(data[name])
+    return data
+
+
+def create_job_store(url: str) -> JobStore:
+    """
+    Cria o armazenamento a partir de uma URL
+
+    Formatos suportados:
+        sqlite:///caminho/relativo.db
+        sqlite:////caminho/absoluto.db
+    """
+    if url.startswith('sqlite:///'):
+        return SQLiteJobStore(url[len('sqlite:///'):])
+    raise ValueError(f"Armazenamento de trabalhos não suportado: {url}")
@@ -0,0 +1,429 @@
+"""
+Transcrição ao vivo (microfone ou stream) por WebSocket
+
+O cliente envia o áudio em mensagens binárias: PCM s16le 16 kHz mono
+(format=pcm) ou WebM/Ogg com Opus (format=webm/ogg, o que o MediaRecorder
+dos navegadores produz), decodificado por um FFmpeg alimentado à medida que
+os dados chegam. O áudio recente fica em um buffer circular de tamanho fixo.
+
+A cada LIVE_STEP_SECONDS de áudio novo, a janela do buffer é transcrita de
+novo com o whisper.cpp (whisper-server, com o modelo já carregado, quando
+disponível). As palavras que duas decodificações seguidas concordam viram
+texto estável ('stable', não muda mais) e o restante é enviado como
+provisório ('tentative'). Segmentos inteiramente estáveis saem do buffer; se
+a janela passar de LIVE_MAX_WINDOW_SECONDS, o texto é confirmado à força e o
+buffer é cortado. Assim a memória por sessão fica limitada (buffer + algumas
+palavras), mesmo em transmissões de várias horas; o texto estável é
+entregue a `on_stable` (gravado em arquivo pelo app) e não fica na memória.
+
+Mensagens enviadas ao cliente (JSON):
+    {"type": "tentative", "text": "..."}
+    {"type": "stable", "text": "...", "start": 12.3, "end": 15.1}
+    {"type": "final", "filename": "..."}
+    {"type": "error", "error": "..."}
+
+O cliente encerra com a mensagem de texto {"type": "stop"} (ou fechando a
+conexão); o áudio restante é transcrito e confirmado antes do "final".
+
+Requer o flask-sock (opcional; sem ele o endpoint /live não é registrado).
+
+Configuração via variáveis de ambiente:
+    LIVE_STEP_SECONDS: áudio novo necessário para uma nova decodificação
+    LIVE_MAX_WINDOW_SECONDS: janela máxima decodificada de uma vez
+    LIVE_MAX_SESSIONS: sessões simultâneas por processo
+    LIVE_SLOT_WAIT_SECONDS: espera máxima por um slot do agendador ao abrir uma sessão
+
+Exemplo de uso:
+    transcriber = LiveTranscriber(decode, on_stable=arquivo.write)
+    transcriber.feed(pcm)
+    if transcriber.ready():
+        for event in transcriber.step():
+            ws.send(json.dumps(event))
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import audio_utils
+from pcm_audio import CHANNELS, SAMPLE_RATE, SAMPLE_WIDTH, PcmAudio
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+    ConnectionClosed = ConnectionError
+
+LIVE_STEP_SECONDS = float(os.environ.get('LIVE_STEP_SECONDS', 1.0))
+LIVE_MAX_WINDOW_SECONDS = float(os.environ.get('LIVE_MAX_WINDOW_SECONDS', 15))
+
+# Folga do buffer além da janela máxima, para o áudio que chega durante uma decodificação
+BUFFER_MARGIN_SECONDS = 10.0
+
+INPUT_FORMATS = {
+    'pcm': None,
+    'webm': 'matroska',
+    'ogg': 'ogg'
+}
+
+FRAME_BYTES = SAMPLE_WIDTH * CHANNELS
+BYTES_PER_SECOND = SAMPLE_RATE * FRAME_BYTES
+
+# Segmento decodificado: {'start', 'end', 'text'} em segundos relativos ao áudio enviado
+Decoder = Callable[[PcmAudio], List[Dict[str, Any]]]
+
+
+def create_sock(app) -> Optional[Any]:
+    """Extensão flask-sock do app, ou None se o flask-sock não estiver instalado"""
+    if Sock is None:
+        return None
+    return Sock(app)
+
+
+class PcmRingBuffer:
+    """
+    Últimos `seconds` segundos de PCM em um buffer circular de tamanho fixo
+
+    As posições são absolutas (bytes desde o início da transmissão); o que
+    passa da capacidade sobrescreve o áudio mais antigo.
+    """
+
+    def __init__(self, seconds: float):
+        self._data = bytearray(int(seconds * SAMPLE_RATE) * FRAME_BYTES)
+        self.start = 0
+        self.end = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) / BYTES_PER_SECOND
+
+    def write(self, pcm: bytes):
+        view = memoryview(pcm).cast('B')
+        if len(view) > self.capacity:
+            self.end += len(view) - self.capacity
+            view = view[-self.capacity:]
+        position = self.end % self.capacity
+        first = min(len(view), self.capacity - position)
+        self._data[position:position + first] = view[:first]
+        self._data[:len(view) - first] = view[first:]
+        self.end += len(view)
+        self.start = max(self.start, self.end - self.capacity)
+
+    def read(self) -> bytes:
+        """Cópia do conteúdo atual (do início ao fim)"""
+        size = self.end - self.start
+        position = self.start % self.capacity
+        first = min(size, self.capacity - position)
+        return bytes(self._data[position:position + first]) + bytes(self._data[:size - first])
+
+    def discard_until(self, offset: int):
+        """Descarta o áudio antes da posição absoluta `offset` (alinhada a amostras)"""
+        offset -= offset % FRAME_BYTES
+        self.start = min(max(self.start, offset), self.end)
+
+
+class LiveTranscriber:
+    """
+    Decodificação incremental com janela deslizante
+
+    Args:
+        decode: Transcreve um PcmAudio e retorna os segmentos com tempos relativos
+        on_stable: Recebe cada trecho de texto confirmado e seus tempos absolutos
+        step_seconds: Áudio novo necessário para uma nova decodificação
+        max_window_seconds: Janela máxima; acima dela o texto é confirmado à força
+    """
+
+    def __init__(
+        self,
+        decode: Decoder,
+        on_stable: Optional[Callable[[str, float, float], None]] = None,
+        step_seconds: float = LIVE_STEP_SECONDS,
+        max_window_seconds: float = LIVE_MAX_WINDOW_SECONDS
+    ):
+        self.decode = decode
+        self.on_stable = on_stable
+        self.step_seconds = step_seconds
+        self.max_window_seconds = max_window_seconds
+        self.buffer = PcmRingBuffer(max_window_seconds + BUFFER_MARGIN_SECONDS)
+        self._lock = threading.Lock()
+        self._partial = b''
+        self._decoded_until = 0
+        # Palavras já confirmadas cujo áudio ainda está no buffer
+        self._committed: List[str] = []
+        # Palavras provisórias da última decodificação
+        self._tentative: List[str] = []
+
+    def feed(self, pcm: bytes):
+        """Acrescenta áudio PCM s16le 16 kHz mono (em qualquer tamanho de bloco)"""
+        with self._lock:
+            data = self._partial + bytes(pcm)
+            cut = len(data) - len(data) % FRAME_BYTES
+            self._partial = data[cut:]
+            self.buffer.write(data[:cut])
+
+    def ready(self) -> bool:
+        """Se já chegou áudio novo suficiente para decodificar de novo"""
+        with self._lock:
+            return self.buffer.end - self._decoded_until >= self.step_seconds * BYTES_PER_SECOND
+
+    def step(self) -> List[Dict[str, Any]]:
+        """Decodifica a janela atual e retorna os eventos (stable/tentative)"""
+        with self._lock:
+            start, end = self.buffer.start, self.buffer.end
+            pcm = self.buffer.read()
+            self._decoded_until = end
+        if not pcm:
+            return []
+        segments = self.decode(PcmAudio(pcm, name='live.wav'))
+        with self._lock:
+            return self._update(segments, start / BYTES_PER_SECOND, final=False)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Decodifica o áudio restante e confirma todo o texto"""
+        with self._lock:
+            start = self.buffer.start
+            pcm = self.buffer.read()
+            self._decoded_until = self.buffer.end
+        segments = self.decode(PcmAudio(pcm, name='live.wav')) if pcm else []
+        with self._lock:
+            return self._update(segments, start / BYTES_PER_SECOND, final=True)
+
+    def _update(self, segments, offset, final):
+        # Segmentos em tempo absoluto, com as palavras de cada um
+        segments = [
+            (offset + float(segment['start']), offset + float(segment['end']), segment['text'].split())
+            for segment in segments
+        ]
+        words = [word for _, _, segment_words in segments for word in segment_words]
+
+        # Palavras já confirmadas no início da janela não são repetidas
+        skip = _common_prefix(self._committed, words)
+        hypothesis = words[skip:]
+
+        if final:
+            agreed = hypothesis
+        else:
+            agreed = hypothesis[:_common_prefix(self._tentative, hypothesis)]
+        window_end = segments[-1][1] if segments else offset
+        if not final and self.buffer.duration > self.max_window_seconds and segments:
+            # Janela longa demais: confirma tudo menos o último segmento (ou tudo, se houver só um)
+            keep = len(segments[-1][2]) if len(segments) > 1 else 0
+            agreed = hypothesis[:max(len(agreed), len(hypothesis) - keep)]
+
+        events = []
+        if agreed:
+            text = ' '.join(agreed)
+            start, end = self._span(segments, skip, len(agreed), offset)
+            if self.on_stable:
+                self.on_stable(text, start, end)
+            events.append({'type': 'stable', 'text': text, 'start': round(start, 2), 'end': round(end, 2)})
+        self._committed = words[:skip] + agreed
+        self._tentative = hypothesis[len(agreed):]
+        events.append({'type': 'tentative', 'text': ' '.join(self._tentative)})
+
+        self._trim(segments, final, window_end)
+        return events
+
+    def _span(self, segments, first_word, count, offset):
+        """Tempos absolutos (início, fim) dos segmentos que contêm as palavras confirmadas"""
+        start, end = None, offset
+        position = 0
+        for seg_start, seg_end, segment_words in segments:
+            last = position + len(segment_words)
+            if last > first_word and position < first_word + count:
+                start = seg_start if start is None else start
+                end = seg_end
+            position = last
+        return (start if start is not None else offset), end
+
+    def _trim(self, segments, final, window_end):
+        """Remove do buffer os segmentos cujas palavras já foram todas confirmadas"""
+        if final:
+            self.buffer.discard_until(self.buffer.end)
+            self._committed = []
+            return
+        confirmed = len(self._committed)
+        position = 0
+        cut = None
+        for _, seg_end, segment_words in segments:
+            if position + len(segment_words) > confirmed:
+                break
+            position += len(segment_words)
+            cut = seg_end
+        if cut is None:
+            return
+        if self._tentative == [] and position == confirmed:
+            # Tudo confirmado: o silêncio depois do último segmento também sai
+            cut = max(cut, window_end)
+        self.buffer.discard_until(int(cut * BYTES_PER_SECOND))
+        self._committed = self._committed[position:]
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def _common_prefix(a: List[str], b: List[str]) -> int:
+    """Número de palavras iguais (ignorando pontuação e maiúsculas) no início das duas listas"""
+    count = 0
+    for x, y in zip(a, b):
+        if _normalize(x) != _normalize(y):
+            break
+        count += 1
+    return count
+
+
+class FfmpegStreamDecoder:
+    """
+    Decodifica WebM/Ogg (Opus) para PCM 16 kHz mono à medida que os dados chegam
+
+    Args:
+        container: Formato de entrada do FFmpeg ('matroska', 'ogg')
+        on_pcm: Recebe os blocos de PCM decodificados (em uma thread de leitura)
+    """
+
+    def __init__(self, container: str, on_pcm: Callable[[bytes], None]):
+        cmd = [
+            audio_utils.ffmpeg_binary(),
+            "-nostdin",
+            "-hide_banner",
+            "-loglevel", "error",
+            # Sem esperar a análise do stream: a latência importa mais que a detecção do formato
+            "-fflags", "nobuffer",
+            "-probesize", "32",
+            "-analyzeduration", "0",
+            "-f", container,
+            "-i", "pipe:0",
+            "-vn",
+            "-ac", str(CHANNELS),
+            "-ar", str(SAMPLE_RATE),
+            "-f", "s16le",
+            "pipe:1"
+        ]
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise RuntimeError("FFmpeg não encontrado no sistema")
+        self._on_pcm = on_pcm
+        self._reader = threading.Thread(target=self._read, name='live-ffmpeg', daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            data = self.process.stdout.read1(BYTES_PER_SECOND // 10)
+            if not data:
+                return
+            self._on_pcm(data)
+
+    def feed(self, data: bytes):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise RuntimeError("O FFmpeg encerrou a decodificação do stream")
+
+    def close(self, timeout: float = 5.0):
+        """Encerra a entrada e aguarda o FFmpeg entregar o áudio restante"""
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._reader.join(timeout)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def run_session(ws, transcriber: LiveTranscriber, input_format: str = 'pcm'):
+    """
+    Atende uma conexão WebSocket até o cliente parar ou desconectar
+
+    Mensagens binárias são áudio; a decodificação roda em outra thread, para
+    que a recepção nunca espere o whisper.cpp. Sem áudio novo suficiente, a
+    thread aguarda em vez de decodificar a mesma janela de novo.
+
+    Raises:
+        ValueError: Se o formato de entrada não for suportado
+    """
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Formato não suportado: {input_format}")
+
+    send_lock = threading.Lock()
+    audio_arrived = threading.Condition()
+    closed = threading.Event()
+
+    def send(event):
+        with send_lock:
+            try:
+                ws.send(json.dumps(event, ensure_ascii=False))
+            except Exception:
+                closed.set()
+
+    def feed(pcm):
+        transcriber.feed(pcm)
+        with audio_arrived:
+            audio_arrived.notify()
+
+    def decode_loop():
+        while not closed.is_set():
+            with audio_arrived:
+                audio_arrived.wait_for(lambda: closed.is_set() or transcriber.ready(), timeout=1.0)
+            if closed.is_set():
+                return
+            if not transcriber.ready():
+                continue
+            try:
+                events = transcriber.step()
+            except Exception as e:
+                send({'type': 'error', 'error': str(e)})
+                continue
+            for event in events:
+                send(event)
+
+    container = INPUT_FORMATS[input_format]
+    decoder = FfmpegStreamDecoder(container, feed) if container else None
+    worker = threading.Thread(target=decode_loop, name='live-decode', daemon=True)
+    worker.start()
+    try:
+        while not closed.is_set():
+            try:
+                message = ws.receive()
+            except ConnectionClosed:
+                # Desconexão: o áudio já recebido ainda é transcrito e gravado
+                break
+            if message is None:
+                break
+            if isinstance(message, str):
+                try:
+                    command = json.loads(message)
+                except ValueError:
+                    command = {}
+                if command.get('type') == 'stop':
+                    break
+                continue
+            if decoder is not None:
+                decoder.feed(message)
+            else:
+                feed(message)
+    finally:
+        if decoder is not None:
+            decoder.close()
+        closed.set()
+        with audio_arrived:
+            audio_arrived.notify_all()
+        worker.join()
+
+    for event in transcriber.finish():
+        if event['type'] == 'stable':
+            send(event)
@@ -0,0 +1,249 @@
+"""
+Métricas no formato de texto do Prometheus
+
+Histogramas, contadores e medidores mantidos em memória e exportados em
+/metrics. As etapas do pipeline são medidas em um único histograma,
+`transcriber_stage_seconds`, com o rótulo `stage`:
+
+    upload_save: gravação do upload em disco
+    decode: conversão para WAV (FFmpeg)
+    queue_wait: espera na fila do agendador
+    model_load: carregamento do modelo em um whisper-server
+    language_detect: detecção de idioma no trecho inicial (language='auto')
+    inference: execução do whisper.cpp (no whisper-cli inclui o carregamento do modelo)
+    diarize: diarização de falantes (em paralelo com inference, opção 'diarize')
+    result_write: gravação da transcrição, do histórico e do índice de busca
+
+As métricas são do processo: com vários processos web (gunicorn), cada um
+exporta as suas.
+
+Exemplo de uso:
+    with stage_timer('decode'):
+        convert_to_wav(origem, destino)
+    observe_stage('inference', 12.3, model='base')
+    print(REGISTRY.render())
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Contador crescente, por combinação de rótulos"""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos, soma e contagem"""
+
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # [contagem por bucket..., +Inf, soma]
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        for key, data in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+            count = cumulative + data[len(self.buckets)]
+            yield f"{self.name}_bucket", dict(labels, le='+Inf'), count
+            yield f"{self.name}_sum", labels, data[-1]
+            yield f"{self.name}_count", labels, count
+
+
+class CallbackMetric(_Metric):
+    """
+    Valor lido no momento da exportação (ocupação da fila, contadores de outros objetos)
+
+    `fn` retorna um número ou uma lista de (rótulos, valor).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        fn: Callable[[], object],
+        type_name: str = 'gauge',
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+        self.type_name = type_name
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Erro ao coletar a métrica {self.name}: {e}")
+            return
+        if value is None:
+            return
+        if isinstance(value, (int, float)):
+            yield self.name, {}, value
+            return
+        for labels, item in value:
+            yield self.name, labels, item
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas juntas"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registrar de novo (ex: recarregamento do módulo) substitui a anterior
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        fn: Callable[[], object],
+        type_name: str = 'gauge',
+        labelnames: Sequence[str] = ()
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, fn, type_name, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'transcriber_stage_seconds',
+    'Duração de cada etapa do pipeline de transcrição, em segundos',
+    ['stage', 'model']
+)
+
+
+def observe_stage(stage: str, seconds: float, model: Optional[str] = None):
+    """Registra a duração de uma etapa (model apenas em etapas do whisper.cpp)"""
+    STAGE_SECONDS.observe(seconds, stage=stage, model=model or '')
+
+
+@contextmanager
+def stage_timer(stage: str, model: Optional[str] = None):
+    """Mede o bloco como uma etapa do pipeline"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, model)
@@ -0,0 +1,140 @@
+"""
+Perfis de ajuste por modelo
+
+Cada modelo tem um perfil com as opções de desempenho passadas ao
+whisper-cli e ao whisper-server:
+
+    threads (-t): limite de threads do modelo (o agendador define o máximo)
+    processors (-p): processadores (divisões do áudio) por transcrição
+    beam_size (-bs), best_of (-bo): busca do decodificador
+    audio_ctx (-ac): contexto do encoder (0 = completo)
+    flash_attn (-fa): flash attention (depende da compilação do whisper.cpp)
+
+Os padrões só limitam as threads dos modelos pequenos e mantêm a
+decodificação padrão do whisper.cpp (beam 5 / best-of 5), que altera o
+texto transcrito. Perfis podem ser sobrescritos por um arquivo JSON, por
+nome exato ('large-v3-q5_0') ou por família ('large'):
+
+    {"large": {"beam_size": 3, "flash_attn": true}, "base-q5_0": {"threads": 2}}
+
+Configuração via variáveis de ambiente:
+    WHISPER_MODEL_PROFILES: arquivo JSON com os perfis
+    WHISPER_FLASH_ATTN: '1' ativa flash attention em todos os modelos
+
+Exemplo de uso:
+    profile = profile_for("ggml-large-v3-q5_0.bin")
+    cmd.extend(profile.cli_args(threads=4))
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from model_registry import model_family, model_name_from_path
+
+_FIELDS = ('threads', 'processors', 'beam_size', 'best_of', 'audio_ctx', 'flash_attn')
+
+DEFAULT_PROFILES = {
+    'tiny': {'threads': 4},
+    'base': {'threads': 4}
+}
+
+
+class ModelProfile:
+    """
+    Opções de desempenho de um modelo (None mantém o padrão do whisper.cpp)
+    """
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        processors: Optional[int] = None,
+        beam_size: Optional[int] = None,
+        best_of: Optional[int] = None,
+        audio_ctx: Optional[int] = None,
+        flash_attn: bool = False
+    ):
+        self.threads = threads
+        self.processors = processors
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self.audio_ctx = audio_ctx
+        self.flash_attn = flash_attn
+
+    def effective_threads(self, threads: Optional[int]) -> Optional[int]:
+        """Threads do trabalho limitadas pelo perfil"""
+        if threads and self.threads:
+            return min(threads, self.threads)
+        return threads or self.threads
+
+    def cli_args(self, threads: Optional[int] = None) -> List[str]:
+        """Argumentos do whisper-cli/whisper-server para este perfil"""
+        args = []
+        threads = self.effective_threads(threads)
+        if threads:
+            args.extend(["-t", str(threads)])
+        if self.processors and self.processors > 1:
+            args.extend(["-p", str(self.processors)])
+        if self.beam_size:
+            args.extend(["-bs", str(self.beam_size)])
+        if self.best_of:
+            args.extend(["-bo", str(self.best_of)])
+        if self.audio_ctx:
+            args.extend(["-ac", str(self.audio_ctx)])
+        if self.flash_attn:
+            args.append("-fa")
+        return args
+
+    def result_options(self) -> Dict[str, Any]:
+        """Opções definidas que alteram o texto transcrito (para a chave do cache)"""
+        options = {
+            'beam_size': self.beam_size,
+            'best_of': self.best_of,
+            'audio_ctx': self.audio_ctx,
+            'flash_attn': self.flash_attn or None
+        }
+        return {name: value for name, value in options.items() if value}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in _FIELDS}
+
+
+_overrides = None
+_overrides_lock = threading.Lock()
+
+
+def load_overrides() -> Dict[str, Dict[str, Any]]:
+    """Perfis do arquivo WHISPER_MODEL_PROFILES (lido uma vez por processo)"""
+    global _overrides
+    if _overrides is None:
+        with _overrides_lock:
+            if _overrides is None:
+                path = os.environ.get('WHISPER_MODEL_PROFILES')
+                overrides = {}
+                if path:
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            overrides = json.load(f)
+                    except (OSError, ValueError) as e:
+                        print(f"Erro ao ler perfis de modelo em {path}: {e}")
+                _overrides = overrides
+    return _overrides
+
+
+def profile_for(model: str) -> ModelProfile:
+    """
+    Perfil de um modelo (nome curto ou caminho)
+
+    Ordem de precedência: arquivo por nome exato, arquivo por família,
+    padrão da família.
+    """
+    name = model_name_from_path(model)
+    family = model_family(name)
+    overrides = load_overrides()
+
+    options = {'flash_attn': os.environ.get('WHISPER_FLASH_ATTN', '0') == '1'}
+    options.update(DEFAULT_PROFILES.get(family, {}))
+    options.update(overrides.get(family, {}))
+    options.update(overrides.get(name, {}))
+    return ModelProfile(**{k: v for k, v in options.items() if k in _FIELDS})
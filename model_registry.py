@@ -0,0 +1,394 @@
+"""
+Registro de modelos do whisper.cpp
+
+Mantém, para o processo inteiro, a lista de modelos ggml disponíveis em
+`whisper.cpp/models`. O diretório é varrido uma única vez e só volta a ser
+lido quando seu mtime muda (arquivo adicionado, removido ou renomeado), e o
+cabeçalho de cada arquivo é lido apenas uma vez enquanto tamanho e mtime não
+mudarem.
+
+Do cabeçalho ggml são extraídos os hiperparâmetros do modelo (camadas,
+dimensões, vocabulário, mels) e o tipo de quantização (ftype).
+
+Variantes quantizadas seguem o nome do modelo com o sufixo da quantização
+('ggml-base-q5_0.bin', 'ggml-large-v3-q8_0.bin'). Com WHISPER_QUANTIZATION,
+nomes de modelos são resolvidos para a variante quantizada quando ela está
+instalada (em máquinas só com CPU, q5_0/q8_0 reduzem tempo e memória).
+
+Modelos também podem ser pré-carregados no page cache do sistema
+operacional na inicialização, para que a primeira transcrição não pague a
+leitura do disco.
+
+Configuração via variáveis de ambiente:
+    PRELOAD_MODELS: modelos a pré-carregar na inicialização (ex: 'base,small')
+    WHISPER_QUANTIZATION: quantização preferida (ex: 'q5_0')
+    WHISPER_MODELS_DIR: diretório dos modelos (padrão: whisper.cpp/models)
+
+Exemplo de uso:
+    registry = get_model_registry()
+    info = registry.get("base")
+    print(info.quantization, info.hparams["n_audio_layer"])
+"""
+
+import os
+import re
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+GGML_MAGIC = 0x67676d6c  # 'ggml'
+
+# Ordem dos hiperparâmetros no cabeçalho dos modelos whisper.cpp
+_HPARAMS = (
+    'n_vocab', 'n_audio_ctx', 'n_audio_state', 'n_audio_head', 'n_audio_layer',
+    'n_text_ctx', 'n_text_state', 'n_text_head', 'n_text_layer', 'n_mels', 'ftype'
+)
+
+# ftype do ggml (módulo GGML_QNT_VERSION_FACTOR) para o nome da quantização
+_FTYPES = {
+    0: 'f32', 1: 'f16', 2: 'q4_0', 3: 'q4_1', 4: 'q4_1_f16', 7: 'q8_0',
+    8: 'q5_0', 9: 'q5_1', 10: 'q2_k', 11: 'q3_k', 12: 'q4_k', 13: 'q5_k', 14: 'q6_k'
+}
+GGML_QNT_VERSION_FACTOR = 1000
+
+# Tamanho do modelo pelo número de camadas do encoder
+_MODEL_TYPES = {4: 'tiny', 6: 'base', 12: 'small', 24: 'medium', 32: 'large'}
+
+STANDARD_MODELS = ('tiny', 'base', 'small', 'medium', 'large')
+
+# Sufixo de quantização no nome do arquivo ('base-q5_0', 'large-v3-q8_0')
+_QUANT_SUFFIX = re.compile(r'-(q\d(?:_[0-9k])?|f16|f32)$')
+
+PRELOAD_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class ModelInfo:
+    """
+    Metadados de um arquivo de modelo
+
+    Attributes:
+        name: Nome curto (ex: 'base', 'large-v3', 'large-v3-q5_0')
+        base_name: Nome sem o sufixo de quantização (ex: 'large-v3')
+        path: Caminho do arquivo .bin
+        size_bytes: Tamanho do arquivo
+        mtime: Data de modificação do arquivo
+        hparams: Hiperparâmetros lidos do cabeçalho ggml (vazio se ilegível)
+        quantization: 'f16', 'q5_0', 'q8_0'... (None se desconhecida)
+        model_type: 'tiny', 'base', 'small', 'medium' ou 'large' (pelas camadas)
+        multilingual: False para modelos somente em inglês (.en)
+    """
+
+    def __init__(self, name: str, path: str, size_bytes: int, mtime: float, hparams: Dict[str, int]):
+        self.name = name
+        self.base_name = _QUANT_SUFFIX.sub('', name)
+        self.path = path
+        self.size_bytes = size_bytes
+        self.mtime = mtime
+        self.hparams = hparams
+
+        ftype = hparams.get('ftype')
+        self.quantization = _FTYPES.get(ftype % GGML_QNT_VERSION_FACTOR) if ftype is not None else None
+        self.model_type = _MODEL_TYPES.get(hparams.get('n_audio_layer'))
+        self.multilingual = hparams.get('n_vocab', 51865) >= 51865
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'base_name': self.base_name,
+            'path': self.path,
+            'size_bytes': self.size_bytes,
+            'quantization': self.quantization,
+            'model_type': self.model_type,
+            'multilingual': self.multilingual,
+            'hparams': self.hparams
+        }
+
+
+def read_ggml_header(path: str) -> Dict[str, int]:
+    """
+    Lê os hiperparâmetros do cabeçalho de um modelo ggml do whisper.cpp
+
+    Returns:
+        Dicionário com os hiperparâmetros, ou vazio se o arquivo não for ggml
+    """
+    size = 4 * (len(_HPARAMS) + 1)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(size)
+    except OSError:
+        return {}
+    if len(data) < size:
+        return {}
+    values = struct.unpack(f'<{len(_HPARAMS) + 1}i', data)
+    if values[0] != GGML_MAGIC:
+        return {}
+    return dict(zip(_HPARAMS, values[1:]))
+
+
+class ModelRegistry:
+    """
+    Lista de modelos do diretório, atualizada somente quando o diretório muda
+
+    Args:
+        models_dir: Diretório com os arquivos ggml-*.bin
+        check_interval: Intervalo mínimo, em segundos, entre verificações do mtime
+        quantization: Quantização preferida ao resolver nomes (ex: 'q5_0')
+    """
+
+    def __init__(self, models_dir: str, check_interval: float = 2.0, quantization: Optional[str] = None):
+        self.models_dir = models_dir
+        self.check_interval = check_interval
+        self.quantization = quantization
+
+        self._models: Dict[str, ModelInfo] = {}
+        self._aliases: Dict[str, str] = {}
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._preloaded: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def models(self) -> Dict[str, ModelInfo]:
+        """Modelos por nome, incluindo os nomes curtos ('large' → versão mais recente)"""
+        self.refresh()
+        with self._lock:
+            result = dict(self._models)
+            for alias, name in self._aliases.items():
+                result.setdefault(alias, self._models[name])
+            return result
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        """Metadados de um modelo por nome curto ou caminho"""
+        if os.path.isabs(name) or name.endswith('.bin'):
+            name = model_name_from_path(name)
+        return self.models().get(name)
+
+    def variants(self, name: str) -> Dict[str, str]:
+        """Variantes instaladas de um modelo, por quantização ({'f16': 'base', 'q5_0': 'base-q5_0'})"""
+        models = self.models()
+        info = models.get(name)
+        if info is None:
+            return {}
+        return {
+            other.quantization or 'desconhecida': other.name
+            for other_name, other in models.items()
+            if other.base_name == info.base_name and other_name == other.name
+        }
+
+    def smallest(self, multilingual: bool = True) -> Optional[ModelInfo]:
+        """Menor modelo instalado (pelo tamanho do arquivo); com multilingual, ignora os modelos .en"""
+        candidates = [
+            info for name, info in self.models().items()
+            if name == info.name and (info.multilingual or not multilingual)
+        ]
+        return min(candidates, key=lambda info: (info.size_bytes, info.hparams.get('n_audio_layer', 0)), default=None)
+
+    def english_variant(self, name: str) -> Optional[str]:
+        """
+        Nome da variante somente em inglês instalada ('base' → 'base.en',
+        'small-q5_0' → 'small.en-q5_0'), ou None se não houver
+        """
+        info = self.get(name)
+        if info is None:
+            return None
+        if info.base_name.endswith('.en'):
+            return info.name
+        suffix = info.name[len(info.base_name):]
+        models = self.models()
+        for candidate in (f"{info.base_name}.en{suffix}", f"{info.base_name}.en"):
+            if candidate in models:
+                return models[candidate].name
+        return None
+
+    def path_for(self, name: str, quantization: Optional[str] = None) -> str:
+        """
+        Caminho do modelo (nome curto ou caminho), mesmo que o arquivo não exista
+
+        Args:
+            name: Nome curto ('base', 'large', 'base-q5_0') ou caminho do arquivo
+            quantization: Quantização desejada (padrão: a preferida do registro);
+                          usada apenas se a variante estiver instalada
+        """
+        if os.path.isabs(name) or name.endswith('.bin'):
+            return name
+        models = self.models()
+        info = models.get(name)
+        if info is None:
+            return os.path.join(self.models_dir, f"ggml-{name}.bin")
+
+        quantization = quantization or self.quantization
+        if quantization and info.quantization != quantization:
+            variant = models.get(f"{info.base_name}-{quantization}")
+            if variant is not None:
+                return variant.path
+        return info.path
+
+    def resolve(self, name: str, quantization: Optional[str] = None) -> str:
+        """
+        Caminho de um modelo existente
+
+        Raises:
+            FileNotFoundError: Se o modelo não for encontrado
+        """
+        path = self.path_for(name, quantization)
+        if os.path.dirname(path) == self.models_dir:
+            # Arquivo do diretório: a lista (atualizada pelo mtime) já diz se existe
+            if self.get(path) is None:
+                raise FileNotFoundError(f"Modelo não encontrado: {path}")
+        elif not os.path.exists(path):
+            raise FileNotFoundError(f"Modelo não encontrado: {path}")
+        return path
+
+    def refresh(self, force: bool = False):
+        """Relê o diretório se o mtime mudou (no máximo a cada check_interval segundos)"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                dir_mtime = os.stat(self.models_dir).st_mtime_ns
+            except OSError:
+                self._models, self._aliases, self._dir_mtime = {}, {}, None
+                return
+            if not force and dir_mtime == self._dir_mtime:
+                return
+            self._dir_mtime = dir_mtime
+            self._scan_locked()
+
+    def preload(self, names: Iterable[str], background: bool = True) -> Optional[threading.Thread]:
+        """
+        Lê os modelos para o page cache do sistema, para a primeira transcrição não ir ao disco
+
+        Usa posix_fadvise(WILLNEED) quando disponível e, em seguida, lê o
+        arquivo sequencialmente.
+        """
+        paths = []
+        for name in names:
+            try:
+                paths.append(self.resolve(name))
+            except FileNotFoundError as e:
+                print(f"Pré-carregamento ignorado: {e}")
+
+        def run():
+            for path in paths:
+                start = time.perf_counter()
+                _read_into_page_cache(path)
+                with self._lock:
+                    self._preloaded[path] = round(time.perf_counter() - start, 3)
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='model-preload', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'models_dir': self.models_dir,
+                'count': len(self._models),
+                'quantization': self.quantization,
+                'preloaded': {model_name_from_path(p): s for p, s in self._preloaded.items()}
+            }
+
+    def _scan_locked(self):
+        previous = {info.path: info for info in self._models.values()}
+        models = {}
+        for file in sorted(os.listdir(self.models_dir)):
+            if not (file.startswith('ggml-') and file.endswith('.bin')):
+                continue
+            path = os.path.join(self.models_dir, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = previous.get(path)
+            if cached and cached.size_bytes == stat.st_size and cached.mtime == stat.st_mtime:
+                info = cached
+            else:
+                info = ModelInfo(model_name_from_path(path), path, stat.st_size,
+                                 stat.st_mtime, read_ggml_header(path))
+            models[info.name] = info
+
+        self._models = models
+        self._aliases = _standard_aliases(models)
+
+
+def model_name_from_path(path: str) -> str:
+    """'.../ggml-large-v3.bin' → 'large-v3'"""
+    name = os.path.basename(path)
+    if name.startswith('ggml-'):
+        name = name[len('ggml-'):]
+    if name.endswith('.bin'):
+        name = name[:-len('.bin')]
+    return name
+
+
+def model_family(name: Optional[str]) -> Optional[str]:
+    """'large-v3-q5_0' → 'large', 'medium.en' → 'medium'; None para modelos fora da escala"""
+    if not name:
+        return None
+    family = re.split(r'[-.]', model_name_from_path(name))[0]
+    return family if family in STANDARD_MODELS else None
+
+
+def _standard_aliases(models: Dict[str, ModelInfo]) -> Dict[str, str]:
+    """
+    Nomes curtos para versões ('large' → 'large-v3')
+
+    Prefere modelos não quantizados e, entre eles, a versão mais recente.
+    """
+    aliases = {}
+    for base in STANDARD_MODELS:
+        candidates: List[ModelInfo] = [
+            info for name, info in models.items()
+            if name.split('-')[0] == base and name != base
+        ]
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda info: (info.quantization in (None, 'f16', 'f32'), info.name))
+        aliases[base] = best.name
+    return aliases
+
+
+def _read_into_page_cache(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        print(f"Erro ao pré-carregar {path}: {e}")
+        return
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        while os.read(fd, PRELOAD_BLOCK_SIZE):
+            pass
+    finally:
+        os.close(fd)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Registro de modelos compartilhado pelo processo"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                project_root = os.path.dirname(os.path.abspath(__file__))
+                _registry = ModelRegistry(
+                    os.environ.get('WHISPER_MODELS_DIR') or os.path.join(project_root, "whisper.cpp", "models"),
+                    quantization=os.environ.get('WHISPER_QUANTIZATION') or None
+                )
+    return _registry
+
+
+def preload_models_from_env() -> List[str]:
+    """Pré-carrega (em segundo plano) os modelos listados em PRELOAD_MODELS"""
+    names = [n.strip() for n in os.environ.get('PRELOAD_MODELS', '').split(',') if n.strip()]
+    if names:
+        get_model_registry().preload(names)
+    return names
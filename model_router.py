@@ -0,0 +1,199 @@
+"""
+Escolha automática do modelo de transcrição
+
+Quando a requisição usa model='auto', o roteador escolhe entre tiny, base,
+small, medium e large a partir de:
+
+- duração do áudio
+- ocupação da fila (tempo estimado até o trabalho começar)
+- orçamento de latência da requisição, ou o derivado do nível de qualidade
+
+Escolhe o maior modelo, até o teto do nível de qualidade, cuja espera na
+fila somada ao tempo estimado de transcrição cabe no orçamento. Com a fila
+cheia, a espera consome o orçamento e os trabalhos passam para modelos mais
+rápidos em vez de acumular.
+
+O tempo de transcrição é estimado pelo fator de tempo real de cada modelo
+(segundos de processamento por segundo de áudio), que começa com valores
+aproximados e passa a ser a média móvel das transcrições observadas.
+
+Configuração via variáveis de ambiente:
+    MODEL_QUALITY: nível de qualidade padrão ('fast', 'balanced' ou 'best')
+
+Exemplo de uso:
+    router = ModelRouter(lambda: registry.models().keys())
+    decision = router.choose(duration=620, queued=3, active=2, workers=2)
+    print(decision.model, decision.reason)
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from model_registry import model_family
+
+AUTO_MODEL = 'auto'
+
+# Do mais rápido para o mais preciso
+MODEL_LADDER = ('tiny', 'base', 'small', 'medium', 'large')
+
+# Fator de tempo real inicial de cada modelo, substituído pelo observado
+DEFAULT_RTF = {'tiny': 0.02, 'base': 0.04, 'small': 0.12, 'medium': 0.35, 'large': 0.7}
+
+# Teto de modelo e orçamento padrão (fração da duração do áudio) por nível
+QUALITY_TIERS = {
+    'fast': {'max_model': 'base', 'budget_factor': 0.1},
+    'balanced': {'max_model': 'medium', 'budget_factor': 0.3},
+    'best': {'max_model': 'large', 'budget_factor': 1.0}
+}
+
+# Orçamento mínimo, em segundos (áudios curtos não ficam presos ao menor modelo)
+MIN_BUDGET = 10.0
+
+# Duração assumida quando não é possível ler o áudio
+DEFAULT_DURATION = 60.0
+
+# Duração média inicial de um trabalho, até haver observações
+DEFAULT_JOB_SECONDS = 30.0
+
+EWMA_ALPHA = 0.2
+
+
+class RoutingDecision:
+    """
+    Modelo escolhido e a estimativa que levou à escolha
+
+    Attributes:
+        model: Nome do modelo (None se nenhum modelo da escala estiver instalado)
+        reason: Descrição curta da escolha
+        estimated_seconds: Espera na fila + transcrição estimadas
+        queue_wait: Espera estimada na fila
+        budget: Orçamento de latência considerado
+        quality: Nível de qualidade considerado
+    """
+
+    def __init__(self, model, reason, estimated_seconds, queue_wait, budget, quality):
+        self.model = model
+        self.reason = reason
+        self.estimated_seconds = estimated_seconds
+        self.queue_wait = queue_wait
+        self.budget = budget
+        self.quality = quality
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'reason': self.reason,
+            'estimated_seconds': round(self.estimated_seconds, 1),
+            'queue_wait': round(self.queue_wait, 1),
+            'budget': round(self.budget, 1),
+            'quality': self.quality
+        }
+
+
+def parse_quality(value: Optional[str], default: str = 'balanced') -> str:
+    """
+    Valida o nível de qualidade recebido na requisição
+
+    Raises:
+        ValueError: Se o nível não existir
+    """
+    if not value:
+        return default
+    if value not in QUALITY_TIERS:
+        raise ValueError(f"Qualidade inválida: {value} (use {', '.join(QUALITY_TIERS)})")
+    return value
+
+
+class ModelRouter:
+    """
+    Política de escolha de modelo por duração, fila e orçamento de latência
+
+    Args:
+        available: Função que retorna os nomes dos modelos instalados
+        default_quality: Nível usado quando a requisição não informa um
+    """
+
+    def __init__(self, available: Callable[[], Iterable[str]], default_quality: str = 'balanced'):
+        self.available = available
+        self.default_quality = parse_quality(default_quality)
+        self._rtf = dict(DEFAULT_RTF)
+        self._job_seconds = DEFAULT_JOB_SECONDS
+        self._observations = 0
+        self._lock = threading.Lock()
+
+    def choose(
+        self,
+        duration: Optional[float],
+        queued: int,
+        active: int,
+        workers: int,
+        latency_budget: Optional[float] = None,
+        quality: Optional[str] = None
+    ) -> RoutingDecision:
+        """
+        Escolhe o modelo para um áudio
+
+        Args:
+            duration: Duração do áudio em segundos (None se desconhecida)
+            queued: Trabalhos aguardando na fila
+            active: Trabalhos em execução
+            workers: Trabalhos executados simultaneamente
+            latency_budget: Segundos aceitáveis até o resultado (opcional)
+            quality: 'fast', 'balanced' ou 'best' (opcional)
+
+        Raises:
+            ValueError: Se o nível de qualidade não existir
+        """
+        quality = parse_quality(quality, self.default_quality)
+        tier = QUALITY_TIERS[quality]
+        duration = duration or DEFAULT_DURATION
+
+        installed = set(self.available())
+        ceiling = MODEL_LADDER.index(tier['max_model'])
+        candidates = [m for m in MODEL_LADDER[:ceiling + 1] if m in installed]
+        if not candidates:
+            # Nenhum modelo até o teto: aceitar qualquer um da escala
+            candidates = [m for m in MODEL_LADDER if m in installed][:1]
+
+        with self._lock:
+            rtf = dict(self._rtf)
+            job_seconds = self._job_seconds
+
+        # Trabalhos à frente deste que não cabem nos workers livres
+        ahead = queued + active - workers + 1
+        queue_wait = max(0, ahead) / max(1, workers) * job_seconds
+        budget = latency_budget or max(MIN_BUDGET, duration * tier['budget_factor'])
+
+        if not candidates:
+            return RoutingDecision(None, 'nenhum modelo instalado', queue_wait, queue_wait, budget, quality)
+
+        for model in reversed(candidates):
+            estimate = queue_wait + duration * rtf[model]
+            if estimate <= budget:
+                reason = 'cabe no orçamento' if model == candidates[-1] else 'reduzido para caber no orçamento'
+                return RoutingDecision(model, reason, estimate, queue_wait, budget, quality)
+
+        model = candidates[0]
+        return RoutingDecision(
+            model, 'orçamento excedido, usando o mais rápido',
+            queue_wait + duration * rtf[model], queue_wait, budget, quality
+        )
+
+    def observe(self, model: Optional[str], audio_seconds: Optional[float], elapsed: float):
+        """Atualiza o fator de tempo real do modelo e a duração média dos trabalhos"""
+        with self._lock:
+            self._job_seconds += EWMA_ALPHA * (elapsed - self._job_seconds)
+            self._observations += 1
+            base = model_family(model)
+            if base and audio_seconds:
+                self._rtf[base] += EWMA_ALPHA * (elapsed / audio_seconds - self._rtf[base])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'default_quality': self.default_quality,
+                'rtf': {model: round(value, 3) for model, value in self._rtf.items()},
+                'job_seconds': round(self._job_seconds, 1),
+                'observations': self._observations
+            }
+
@@ -0,0 +1,197 @@
+"""
+Áudio decodificado mantido em memória
+
+Com AUDIO_IN_MEMORY=1, o FFmpeg decodifica o upload direto para a memória
+(PCM s16le, 16 kHz, mono) e o áudio é entregue ao whisper.cpp pelo stdin do
+whisper-cli ou no corpo da requisição ao whisper-server, sem gravar o WAV
+convertido em uploads/. Trechos de arquivos longos são fatias (memoryview)
+do mesmo buffer, sem cópia.
+
+Os buffers ficam em um PcmMemoryStore limitado em bytes; os menos usados
+são descartados e, se ainda forem necessários, decodificados novamente a
+partir do upload original.
+
+Configuração via variáveis de ambiente:
+    AUDIO_IN_MEMORY: '1' mantém o áudio decodificado em memória
+    AUDIO_IN_MEMORY_MAX_MB: memória máxima usada pelos buffers
+
+Exemplo de uso:
+    audio, elapsed = audio_utils.decode_to_memory("podcast.mp3")
+    store.put("uploads/podcast_converted.wav", audio)
+    whisper.transcribe(store.get("uploads/podcast_converted.wav"), language="pt")
+"""
+
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Union
+
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # s16le
+
+# Tamanho dos blocos escritos em pipes e sockets
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+
+def wav_header(n_bytes: int, rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> bytes:
+    """Cabeçalho RIFF/WAVE (PCM 16 bits) para `n_bytes` de amostras"""
+    block_align = channels * SAMPLE_WIDTH
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + n_bytes, b'WAVE',
+        b'fmt ', 16, 1, channels, rate, rate * block_align, block_align, SAMPLE_WIDTH * 8,
+        b'data', n_bytes
+    )
+
+
+class PcmAudio:
+    """
+    Áudio PCM s16le 16 kHz mono em memória
+
+    Attributes:
+        pcm: Amostras (bytes ou memoryview, sem cabeçalho)
+        name: Identificador usado em logs e mensagens (ex: o caminho do WAV virtual)
+    """
+
+    def __init__(self, pcm: Union[bytes, memoryview], name: str = 'audio.wav'):
+        self.pcm = memoryview(pcm).cast('B')
+        self.name = name
+        self._sha256 = None
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho do WAV equivalente (cabeçalho + amostras)"""
+        return 44 + len(self.pcm)
+
+    @property
+    def nframes(self) -> int:
+        return len(self.pcm) // (SAMPLE_WIDTH * CHANNELS)
+
+    @property
+    def duration(self) -> float:
+        return self.nframes / float(SAMPLE_RATE)
+
+    def slice(self, start: float, end: float) -> 'PcmAudio':
+        """Trecho entre `start` e `end` segundos, sem copiar as amostras"""
+        frame_bytes = SAMPLE_WIDTH * CHANNELS
+        first = max(0, int(start * SAMPLE_RATE)) * frame_bytes
+        last = min(self.nframes, int(end * SAMPLE_RATE)) * frame_bytes
+        return PcmAudio(self.pcm[first:max(first, last)], name=self.name)
+
+    def iter_wav(self, block_size: int = WRITE_BLOCK_SIZE) -> Iterator[Union[bytes, memoryview]]:
+        """Produz o WAV (cabeçalho e blocos das amostras) para escrita em pipes e sockets"""
+        yield wav_header(len(self.pcm))
+        for offset in range(0, len(self.pcm), block_size):
+            yield self.pcm[offset:offset + block_size]
+
+    def sha256(self) -> str:
+        """SHA-256 do WAV equivalente (mesma chave de cache do arquivo em disco)"""
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            for block in self.iter_wav():
+                digest.update(block)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def open(self) -> 'PcmReader':
+        """Leitor com a mesma interface de wave.open(caminho, 'rb')"""
+        return PcmReader(self)
+
+    def __repr__(self):
+        return f"PcmAudio({self.name!r}, {self.duration:.1f}s)"
+
+
+class PcmReader:
+    """Subconjunto de wave.Wave_read sobre um PcmAudio (usado por audio_utils)"""
+
+    def __init__(self, audio: PcmAudio):
+        self.audio = audio
+        self._pos = 0
+
+    def getnchannels(self) -> int:
+        return CHANNELS
+
+    def getsampwidth(self) -> int:
+        return SAMPLE_WIDTH
+
+    def getframerate(self) -> int:
+        return SAMPLE_RATE
+
+    def getnframes(self) -> int:
+        return self.audio.nframes
+
+    def setpos(self, pos: int):
+        self._pos = max(0, min(pos, self.audio.nframes))
+
+    def readframes(self, n: int) -> bytes:
+        frame_bytes = SAMPLE_WIDTH * CHANNELS
+        start = self._pos * frame_bytes
+        data = self.audio.pcm[start:start + n * frame_bytes].tobytes()
+        self._pos += len(data) // frame_bytes
+        return data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PcmMemoryStore:
+    """
+    Buffers de áudio por chave, descartando os menos usados acima de `max_bytes`
+
+    Args:
+        max_bytes: Memória máxima ocupada pelos buffers
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[str, PcmAudio]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def put(self, key: str, audio: PcmAudio):
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= previous.nbytes
+            self._items[key] = audio
+            self._size += audio.nbytes
+            # O item recém-inserido é mantido mesmo que sozinho ultrapasse o limite
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= evicted.nbytes
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[PcmAudio]:
+        with self._lock:
+            audio = self._items.get(key)
+            if audio is not None:
+                self._items.move_to_end(key)
+            return audio
+
+    def discard(self, key: str):
+        with self._lock:
+            audio = self._items.pop(key, None)
+            if audio is not None:
+                self._size -= audio.nbytes
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,164 @@
+"""
+Upload resumível em partes (protocolo tus)
+
+Arquivos grandes são enviados em várias requisições PATCH, cada uma com o
+deslocamento (`Upload-Offset`) em que os bytes começam. Se a conexão cair, o
+cliente consulta o deslocamento atual com HEAD e continua de onde parou, em
+vez de reenviar tudo.
+
+Cada parte é gravada diretamente no arquivo de destino, em blocos, sem passar
+pelo parser multipart do Werkzeug nem por arquivos temporários. O CRC32 do
+arquivo é atualizado enquanto os bytes chegam (checksum acumulado), e cada
+parte pode ser validada pelo cabeçalho `Upload-Checksum`.
+
+Exemplo de uso:
+    metadata = parse_metadata(request.headers.get('Upload-Metadata', ''))
+    result = write_chunk(path, offset, request.stream, crc, checksum)
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import zlib
+from typing import BinaryIO, Dict, Optional, Tuple
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,checksum'
+CHECKSUM_ALGORITHMS = ('crc32', 'md5', 'sha1')
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(ValueError):
+    """Levantada quando o checksum de uma parte não confere"""
+
+
+class _Crc32:
+    """Interface de hashlib para o CRC32 do zlib"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data: bytes):
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(4, 'big')
+
+
+def parse_metadata(header: str) -> Dict[str, str]:
+    """
+    Decodifica o cabeçalho Upload-Metadata
+
+    Formato: pares 'chave valor_base64' separados por vírgula
+    (por exemplo 'filename YXVkaW8ubXAz,batch_id YWJj').
+    """
+    metadata = {}
+    for pair in header.split(','):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value).decode('utf-8') if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f"Upload-Metadata inválido para '{key}'")
+    return metadata
+
+
+def parse_checksum(header: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """
+    Decodifica o cabeçalho Upload-Checksum ('algoritmo digest_base64')
+
+    Raises:
+        ValueError: Se o algoritmo não for suportado ou o formato for inválido
+    """
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(' ')
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Algoritmo de checksum não suportado: {algorithm}")
+    try:
+        return algorithm, base64.b64decode(value)
+    except binascii.Error:
+        raise ValueError("Upload-Checksum inválido")
+
+
+def create_file(path: str):
+    """Cria o arquivo de destino vazio"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb'):
+        pass
+
+
+def write_chunk(
+    path: str,
+    offset: int,
+    stream: BinaryIO,
+    crc: int,
+    checksum: Optional[Tuple[str, bytes]] = None,
+    max_bytes: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Grava uma parte do upload a partir de `offset`, lendo o stream em blocos
+
+    Sem checksum, os bytes recebidos antes de uma queda de conexão são
+    mantidos, e o cliente retoma do novo deslocamento. Com checksum, a parte
+    só é aceita inteira: em caso de divergência ou queda, o arquivo volta
+    para `offset`.
+
+    Args:
+        path: Arquivo de destino (já existente)
+        offset: Deslocamento atual do upload
+        stream: Corpo da requisição
+        crc: CRC32 acumulado dos bytes já recebidos
+        checksum: (algoritmo, digest) esperado para esta parte
+        max_bytes: Máximo de bytes aceitos nesta parte
+
+    Returns:
+        (novo deslocamento, novo CRC32 acumulado)
+
+    Raises:
+        ChecksumMismatch: Se o checksum da parte não conferir
+        ValueError: Se a parte ultrapassar max_bytes
+    """
+    digest = None
+    if checksum:
+        digest = _Crc32() if checksum[0] == 'crc32' else hashlib.new(checksum[0])
+
+    written = 0
+    new_crc = crc
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.truncate()
+        try:
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if max_bytes is not None and written > max_bytes:
+                    raise ValueError("A parte ultrapassa o tamanho declarado do upload")
+                f.write(block)
+                new_crc = zlib.crc32(block, new_crc)
+                if digest is not None:
+                    digest.update(block)
+        except ValueError:
+            f.truncate(offset)
+            raise
+        except Exception:
+            # Conexão interrompida (ClientDisconnected, OSError...)
+            if digest is not None:
+                f.truncate(offset)
+                raise
+            # Sem checksum: manter o que chegou para o cliente retomar daí
+            return offset + written, new_crc
+
+        if digest is not None and digest.digest() != checksum[1]:
+            f.truncate(offset)
+            raise ChecksumMismatch("Checksum da parte não confere")
+
+    return offset + written, new_crc
+
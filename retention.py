@@ -0,0 +1,201 @@
+"""
+Retenção e limpeza contínua de uploads e transcrições
+
+Uma thread em segundo plano aplica periodicamente a política de retenção
+usando os arquivos registrados no armazenamento de trabalhos (nunca percorre
+os diretórios):
+
+1. Remove o WAV convertido de arquivos já transcritos com sucesso
+2. Remove uploads e transcrições mais antigos que a idade máxima
+3. Remove os arquivos mais antigos enquanto o total ultrapassar a cota
+
+Arquivos de trabalhos ainda em andamento nunca são removidos, exceto uploads
+resumíveis parados há mais tempo que a idade máxima dos uploads.
+
+Configuração via variáveis de ambiente:
+    UPLOAD_RETENTION_HOURS: idade máxima de uploads (0 = sem limite)
+    TRANSCRIPTION_RETENTION_DAYS: idade máxima de transcrições (0 = sem limite)
+    STORAGE_QUOTA_MB: limite de uploads + transcrições (0 = sem limite)
+    DELETE_WAV_AFTER_SUCCESS: '0' mantém os WAVs após a transcrição
+    RETENTION_INTERVAL_SECONDS: intervalo entre as limpezas
+
+Exemplo de uso:
+    janitor = StorageJanitor(job_store, RetentionPolicy.from_env())
+    janitor.start()
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+BATCH_SIZE = 100
+
+
+class RetentionPolicy:
+    """
+    Regras de retenção
+
+    Attributes:
+        upload_max_age: Idade máxima de uploads em segundos (None = sem limite)
+        transcription_max_age: Idade máxima de transcrições em segundos (None = sem limite)
+        quota_bytes: Limite total em bytes (None = sem limite)
+        delete_wav_after_success: Remover o WAV convertido após a transcrição
+        interval: Segundos entre as execuções da limpeza
+    """
+
+    def __init__(
+        self,
+        upload_max_age: Optional[float] = 72 * 3600,
+        transcription_max_age: Optional[float] = None,
+        quota_bytes: Optional[int] = None,
+        delete_wav_after_success: bool = True,
+        interval: float = 300
+    ):
+        self.upload_max_age = upload_max_age
+        self.transcription_max_age = transcription_max_age
+        self.quota_bytes = quota_bytes
+        self.delete_wav_after_success = delete_wav_after_success
+        self.interval = interval
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        upload_hours = float(os.environ.get('UPLOAD_RETENTION_HOURS', 72))
+        transcription_days = float(os.environ.get('TRANSCRIPTION_RETENTION_DAYS', 0))
+        quota_mb = float(os.environ.get('STORAGE_QUOTA_MB', 0))
+        return cls(
+            upload_max_age=upload_hours * 3600 or None,
+            transcription_max_age=transcription_days * 86400 or None,
+            quota_bytes=int(quota_mb * 1024 * 1024) or None,
+            delete_wav_after_success=os.environ.get('DELETE_WAV_AFTER_SUCCESS', '1') != '0',
+            interval=float(os.environ.get('RETENTION_INTERVAL_SECONDS', 300))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'upload_max_age_hours': self.upload_max_age / 3600 if self.upload_max_age else None,
+            'transcription_max_age_days': (
+                self.transcription_max_age / 86400 if self.transcription_max_age else None
+            ),
+            'quota_bytes': self.quota_bytes,
+            'delete_wav_after_success': self.delete_wav_after_success,
+            'interval_seconds': self.interval
+        }
+
+
+class StorageJanitor:
+    """
+    Thread de limpeza que aplica uma RetentionPolicy
+
+    Args:
+        store: JobStore com os arquivos registrados (track_file)
+        policy: Regras de retenção
+        on_deleted: Chamada com o registro de cada arquivo removido (opcional)
+    """
+
+    def __init__(
+        self,
+        store,
+        policy: RetentionPolicy,
+        on_deleted: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.store = store
+        self.policy = policy
+        self.on_deleted = on_deleted
+        self.last_run = None
+        self.last_result = {'deleted': 0, 'freed_bytes': 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='storage-janitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'policy': self.policy.to_dict(),
+            'last_run': self.last_run,
+            'last_result': self.last_result
+        }
+
+    def run_once(self) -> Dict[str, int]:
+        """Executa uma limpeza completa e retorna arquivos e bytes liberados"""
+        with self._lock:
+            result = {'deleted': 0, 'freed_bytes': 0}
+            now = time.time()
+            policy = self.policy
+
+            if policy.delete_wav_after_success:
+                self._delete_matching(result, roles=['wav'], job_status='completed')
+
+            if policy.upload_max_age:
+                cutoff = now - policy.upload_max_age
+                self._delete_matching(result, area='uploads', older_than=cutoff)
+                # Uploads resumíveis abandonados pertencem a lotes em andamento
+                self._delete_matching(result, roles=['partial'], older_than=cutoff, include_active=True)
+
+            if policy.transcription_max_age:
+                self._delete_matching(
+                    result, area='transcriptions', older_than=now - policy.transcription_max_age
+                )
+
+            if policy.quota_bytes:
+                self._enforce_quota(result)
+
+            self.last_run = now
+            self.last_result = result
+            return result
+
+    def _loop(self):
+        while not self._stop.wait(self.policy.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Erro na limpeza de armazenamento: {e}")
+
+    def _delete_matching(self, result: Dict[str, int], **filters):
+        while True:
+            rows = self.store.list_storage_files(limit=BATCH_SIZE, **filters)
+            deleted = result['deleted']
+            for row in rows:
+                self._delete(row, result)
+            # Parar também se nada pôde ser removido, para não repetir o mesmo lote
+            if len(rows) < BATCH_SIZE or result['deleted'] == deleted:
+                return
+
+    def _enforce_quota(self, result: Dict[str, int]):
+        # Uploads são removidos antes das transcrições
+        for area in ('uploads', 'transcriptions'):
+            while self._total_bytes() > self.policy.quota_bytes:
+                rows = self.store.list_storage_files(area=area, limit=BATCH_SIZE)
+                deleted = result['deleted']
+                for row in rows:
+                    self._delete(row, result)
+                    if self._total_bytes() <= self.policy.quota_bytes:
+                        return
+                if result['deleted'] == deleted:
+                    break
+
+    def _total_bytes(self) -> int:
+        return sum(area['bytes'] for area in self.store.storage_totals().values())
+
+    def _delete(self, row: Dict[str, Any], result: Dict[str, int]):
+        try:
+            os.remove(row['path'])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Erro ao remover {row['path']}: {e}")
+            return
+        if self.store.untrack_file(row['path']) is None:
+            # Outro processo já removeu este arquivo
+            return
+        result['deleted'] += 1
+        result['freed_bytes'] += row['size']
+        if self.on_deleted:
+            self.on_deleted(row)
@@ -2,13 +2,22 @@
 """
 Script de inicialização da aplicação Transcritor de Áudio
 Verifica dependências e inicia o servidor Flask
+
+Uso:
+    python run.py                 # servidor de desenvolvimento do Flask
+    python run.py --prod          # gunicorn com vários processos (ou waitress no Windows)
+    python run.py --prod --workers 4 --threads 50 --timeout 120
 """
 
+import argparse
 import sys
 import os
 import subprocess
 import importlib
 
+HOST = '0.0.0.0'
+PORT = 8080
+
 def check_python_version():
     """Verifica se a versão do Python é compatível"""
     if sys.version_info < (3, 8):
@@ -37,7 +46,7 @@ def check_ffmpeg():
 
 def check_dependencies():
     """Verifica se as dependências estão instaladas"""
-    required_packages = ['flask', 'speech_recognition', 'pydub', 'werkzeug']
+    required_packages = ['flask', 'speech_recognition', 'werkzeug']
     missing_packages = []
 
     for package in required_packages:
@@ -64,23 +73,167 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
     print("✅ Diretórios criados/verificados")
 
-def start_app():
+# Threads de cada processo web reservadas às requisições comuns (uploads, status, exportações)
+REQUEST_THREADS = 16
+
+def default_stream_connections():
+    """Streams SSE abertos ao mesmo tempo por processo (padrão: 32)"""
+    return int(os.environ.get('WEB_STREAM_CONNECTIONS') or 32)
+
+def default_web_threads():
+    """
+    Threads por processo web: as requisições comuns mais as conexões longas
+
+    Cada stream SSE e cada sessão /live ocupa uma thread do gthread enquanto
+    estiver aberto, então elas são somadas às REQUEST_THREADS.
+    """
+    return REQUEST_THREADS + default_stream_connections() + int(os.environ.get('LIVE_MAX_SESSIONS', 2))
+
+def configure_stream_connections(threads):
+    """
+    Limita os streams SSE de cada processo às threads que sobram além das
+    REQUEST_THREADS e das sessões ao vivo; acima do limite, /events/* responde
+    503 e o frontend passa a consultar /transcription_status e /batch_status
+    """
+    live_sessions = int(os.environ.get('LIVE_MAX_SESSIONS', 2))
+    streams = max(1, min(default_stream_connections(), threads - REQUEST_THREADS - live_sessions))
+    os.environ['WEB_STREAM_CONNECTIONS'] = str(streams)
+    return streams
+
+def default_web_workers():
+    """Processos web padrão: um a cada 4 núcleos, entre 2 e 8"""
+    cpu_count = os.cpu_count() or 1
+    return max(2, min(8, cpu_count // 4))
+
+def configure_transcription_slots(web_workers):
+    """
+    Divide os núcleos entre os processos web
+
+    Cada processo tem seu próprio agendador, então os trabalhos simultâneos
+    (TRANSCRIBE_WORKERS) e as threads por trabalho (WHISPER_THREADS) são
+    calculados por processo, para que a soma não ultrapasse os núcleos.
+    Valores já definidos no ambiente são respeitados.
+    """
+    cpu_count = os.cpu_count() or 1
+    threads = int(os.environ.get('WHISPER_THREADS') or max(1, min(4, cpu_count // web_workers)))
+    slots = int(os.environ.get('TRANSCRIBE_WORKERS') or max(1, cpu_count // (threads * web_workers)))
+    os.environ['WHISPER_THREADS'] = str(threads)
+    os.environ['TRANSCRIBE_WORKERS'] = str(slots)
+    return threads, slots
+
+def drain_app_jobs(timeout):
+    """Aguarda as transcrições em andamento do processo atual antes de encerrar"""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.drain_jobs(timeout=timeout)
+
+def start_gunicorn(workers, threads, timeout, graceful_timeout):
+    """Inicia o gunicorn (workers gthread) carregando a aplicação em cada processo"""
+    from gunicorn.app.base import BaseApplication
+
+    def worker_exit(server, worker):
+        # O master envia SIGKILL após graceful_timeout; sobra uma margem para sair
+        drain_app_jobs(timeout=max(1, graceful_timeout - 5))
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f"{HOST}:{PORT}",
+                'workers': workers,
+                'worker_class': 'gthread',
+                'threads': threads,
+                'timeout': timeout,
+                'graceful_timeout': graceful_timeout,
+                'keepalive': 5,
+                'worker_exit': worker_exit
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Sem preload: cada processo abre o próprio banco e agendador após o fork
+            from app import app
+            return app
+
+    ProductionServer().run()
+
+def start_waitress(threads, timeout, graceful_timeout):
+    """Inicia o waitress (um processo, várias threads), usado onde não há gunicorn"""
+    from waitress import serve
+    from app import app
+
+    try:
+        serve(app, host=HOST, port=PORT, threads=threads, channel_timeout=timeout)
+    finally:
+        drain_app_jobs(timeout=graceful_timeout)
+
+def start_production(workers, threads, timeout, graceful_timeout):
+    """Inicia o servidor de produção disponível"""
+    whisper_threads, slots = configure_transcription_slots(workers)
+    streams = configure_stream_connections(threads)
+    print("\n🚀 Iniciando Transcritor de Áudio (produção)...")
+    print(f"   Acesse: http://localhost:{PORT}")
+    print(f"   Processos web: {workers} x {threads} threads (até {streams} streams SSE cada)")
+    print(f"   Transcrições por processo: {slots} x {whisper_threads} threads do whisper.cpp\n")
+
+    try:
+        start_gunicorn(workers, threads, timeout, graceful_timeout)
+        return
+    except ImportError:
+        pass
+
+    try:
+        # O waitress usa um único processo: todos os núcleos ficam com ele
+        os.environ.pop('TRANSCRIBE_WORKERS', None)
+        os.environ.pop('WHISPER_THREADS', None)
+        configure_transcription_slots(1)
+        start_waitress(threads, timeout, graceful_timeout)
+        return
+    except ImportError:
+        pass
+
+    print("⚠️  gunicorn/waitress não instalados, usando o servidor de desenvolvimento")
+    print("   Execute: pip install -r requirements.txt")
+    start_app(graceful_timeout)
+
+def start_app(graceful_timeout=None):
     """Inicia a aplicação Flask"""
     print("\n🚀 Iniciando Transcritor de Áudio...")
-    print("   Acesse: http://localhost:8080")
+    print(f"   Acesse: http://localhost:{PORT}")
     print("   Pressione Ctrl+C para parar\n")
 
     try:
         from app import app
-        app.run(debug=False, host='0.0.0.0', port=8080)
+        app.run(debug=False, host=HOST, port=PORT, threaded=True)
     except KeyboardInterrupt:
         print("\n👋 Aplicação encerrada")
     except Exception as e:
         print(f"❌ Erro ao iniciar aplicação: {e}")
         sys.exit(1)
+    finally:
+        drain_app_jobs(timeout=graceful_timeout)
+
+def parse_args():
+    """Lê as opções de linha de comando"""
+    parser = argparse.ArgumentParser(description="Transcritor de Áudio")
+    parser.add_argument('--prod', action='store_true',
+                        help="usa um servidor de produção com vários processos")
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_WORKERS') or default_web_workers()),
+                        help="processos web (padrão: núcleos / 4, entre 2 e 8)")
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('WEB_THREADS') or default_web_threads()),
+                        help="threads por processo web (padrão: 16 + streams SSE + sessões ao vivo)")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('WEB_TIMEOUT', 120)),
+                        help="segundos até reiniciar um processo travado (padrão: 120)")
+    parser.add_argument('--graceful-timeout', type=int,
+                        default=int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 330)),
+                        help="segundos para concluir as transcrições ao encerrar (padrão: 330)")
+    return parser.parse_args()
 
 def main():
     """Função principal"""
+    args = parse_args()
     print("🔍 Verificando requisitos do Transcritor de Áudio...\n")
 
     check_python_version()
@@ -101,7 +254,10 @@ def main():
     check_ffmpeg()
     create_directories()
 
-    start_app()
+    if args.prod:
+        start_production(args.workers, args.threads, args.timeout, args.graceful_timeout)
+    else:
+        start_app(args.graceful_timeout)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Agendador central de trabalhos de transcrição
+
+Este módulo mantém uma fila única (com prioridade) compartilhada pelas
+transcrições individuais e em lote, executada por um número limitado de
+workers. Cada worker executa um trabalho por vez e cada trabalho usa
+`threads_per_job` threads do whisper.cpp (opção `-t` do whisper-cli), de
+forma que `workers * threads_per_job` não ultrapasse os núcleos da máquina.
+
+Trabalhos em execução podem tomar emprestados slots ociosos (borrow_idle,
+ex: trechos paralelos de um arquivo longo) quando não há nada na fila, e
+trabalhos fora da fila (ex: sessões ao vivo) podem reservar um slot
+(reserve), com prioridade sobre a fila. Enquanto emprestados ou reservados,
+esses slots não executam novos trabalhos.
+
+Configuração via variáveis de ambiente:
+    TRANSCRIBE_WORKERS: número de trabalhos simultâneos
+    WHISPER_THREADS: threads do whisper.cpp por trabalho
+    TRANSCRIBE_MAX_QUEUE: tamanho máximo da fila antes de recusar novos trabalhos
+
+Exemplo de uso:
+    scheduler = JobScheduler()
+    position = scheduler.submit("job-1", funcao, arg1, priority=PRIORITY_HIGH)
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from metrics import observe_stage
+
+# Prioridades: valores menores são executados primeiro
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+PRIORITIES = {
+    'high': PRIORITY_HIGH,
+    'normal': PRIORITY_NORMAL,
+    'low': PRIORITY_LOW
+}
+
+
+def default_threads_per_job() -> int:
+    """Threads do whisper.cpp por trabalho (padrão: até 4, limitado aos núcleos)"""
+    env_value = os.environ.get('WHISPER_THREADS')
+    if env_value:
+        return max(1, int(env_value))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def default_worker_slots(threads_per_job: int) -> int:
+    """Número de trabalhos simultâneos (padrão: núcleos / threads por trabalho)"""
+    env_value = os.environ.get('TRANSCRIBE_WORKERS')
+    if env_value:
+        return max(1, int(env_value))
+    return max(1, (os.cpu_count() or 1) // threads_per_job)
+
+
+class QueueFullError(RuntimeError):
+    """Levantada quando a fila atingiu o limite de admissão"""
+
+
+class JobScheduler:
+    """
+    Fila de prioridade com um conjunto fixo de workers
+
+    Trabalhos com a mesma prioridade são executados em ordem de chegada (FIFO).
+    Os workers são criados sob demanda na primeira submissão, o que mantém o
+    agendador seguro para servidores que fazem fork após importar a aplicação.
+
+    Attributes:
+        workers: Número de trabalhos executados simultaneamente
+        threads_per_job: Threads do whisper.cpp usadas por cada trabalho
+        max_queue: Número máximo de trabalhos aguardando na fila
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threads_per_job: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.threads_per_job = threads_per_job or default_threads_per_job()
+        self.workers = workers or default_worker_slots(self.threads_per_job)
+        self.max_queue = max_queue or int(os.environ.get('TRANSCRIBE_MAX_QUEUE', 1000))
+
+        self._heap = []
+        self._queued_ids = set()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._active = 0
+        # Slots emprestados ou reservados fora da fila (ver borrow_idle e reserve)
+        self._reserved = 0
+        self._waiting_reservations = 0
+        self._shutdown = False
+
+    def submit(
+        self,
+        job_id: str,
+        fn: Callable[..., Any],
+        *args,
+        priority: int = PRIORITY_NORMAL,
+        **kwargs
+    ) -> int:
+        """
+        Enfileira um trabalho
+
+        Args:
+            job_id: Identificador do trabalho (usado para consultar a posição)
+            fn: Função a ser executada pelo worker
+            priority: Prioridade do trabalho (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+        Returns:
+            Posição do trabalho na fila (1 = próximo a ser executado)
+
+        Raises:
+            QueueFullError: Se a fila estiver cheia
+            RuntimeError: Se o agendador estiver encerrado
+        """
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Agendador encerrado")
+            if len(self._heap) >= self.max_queue:
+                raise QueueFullError(
+                    f"Fila de transcrição cheia ({self.max_queue} trabalhos aguardando)"
+                )
+
+            self._ensure_workers()
+            entry = (priority, next(self._counter), job_id, time.monotonic(), fn, args, kwargs)
+            heapq.heappush(self._heap, entry)
+            self._queued_ids.add(job_id)
+            position = self._position_locked(job_id)
+            self._condition.notify()
+            return position
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Retorna a posição do trabalho na fila ou None se não estiver aguardando"""
+        with self._condition:
+            if job_id not in self._queued_ids:
+                return None
+            return self._position_locked(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna informações de ocupação do agendador"""
+        with self._condition:
+            return {
+                'workers': self.workers,
+                'threads_per_job': self.threads_per_job,
+                'active': self._active,
+                'reserved': self._reserved,
+                'queued': len(self._heap),
+                'max_queue': self.max_queue
+            }
+
+    def borrow_idle(self, limit: int) -> int:
+        """
+        Toma emprestados até `limit` slots ociosos para o trabalho atual
+
+        Só empresta quando não há trabalhos aguardando, para não atrasar a
+        fila; os slots emprestados devem ser devolvidos com release().
+
+        Returns:
+            Número de slots emprestados (0 se não houver slots livres)
+        """
+        with self._condition:
+            if self._heap or self._waiting_reservations or self._shutdown:
+                return 0
+            slots = max(0, min(limit, self.workers - self._active - self._reserved))
+            self._reserved += slots
+            return slots
+
+    def reserve(self, timeout: Optional[float] = None) -> bool:
+        """
+        Reserva um slot para trabalho executado fora da fila (ex: sessão ao vivo)
+
+        Espera até `timeout` segundos por um slot livre; enquanto espera, os
+        workers não iniciam novos trabalhos da fila. O slot deve ser
+        devolvido com release(1).
+
+        Returns:
+            True se o slot foi reservado
+        """
+        with self._condition:
+            self._waiting_reservations += 1
+            try:
+                available = self._condition.wait_for(
+                    lambda: self._shutdown or self._has_capacity(), timeout
+                )
+                if not available or self._shutdown:
+                    return False
+                self._reserved += 1
+                return True
+            finally:
+                self._waiting_reservations -= 1
+                self._condition.notify_all()
+
+    def release(self, slots: int):
+        """Devolve slots emprestados ou reservados, liberando-os para os trabalhos da fila"""
+        if slots <= 0:
+            return
+        with self._condition:
+            self._reserved -= slots
+            self._condition.notify_all()
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None, cancel_pending: bool = False):
+        """
+        Encerra o agendador
+
+        Args:
+            wait: Se True, aguarda os trabalhos em execução (e os enfileirados,
+                  a menos que cancel_pending seja True)
+            timeout: Tempo máximo total de espera, em segundos
+            cancel_pending: Se True, descarta os trabalhos que ainda não começaram
+        """
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending or not wait:
+                self._heap.clear()
+                self._queued_ids.clear()
+            self._condition.notify_all()
+            threads = list(self._threads)
+
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in threads:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                thread.join(remaining)
+
+    def _position_locked(self, job_id: str) -> int:
+        for index, entry in enumerate(sorted(self._heap)):
+            if entry[2] == job_id:
+                return index + 1
+        return 0
+
+    def _has_capacity(self) -> bool:
+        return self._active + self._reserved < self.workers
+
+    def _can_start(self) -> bool:
+        # Reservas aguardando têm prioridade sobre a fila
+        return self._has_capacity() and not self._waiting_reservations
+
+    def _ensure_workers(self):
+        alive = [t for t in self._threads if t.is_alive()]
+        for i in range(len(alive), self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"transcribe-worker-{i + 1}",
+                daemon=True
+            )
+            thread.start()
+            alive.append(thread)
+        self._threads = alive
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while (not self._heap and not self._shutdown) or (self._heap and not self._can_start()):
+                    self._condition.wait()
+                if not self._heap:
+                    return
+                _, _, job_id, enqueued_at, fn, args, kwargs = heapq.heappop(self._heap)
+                self._queued_ids.discard(job_id)
+                self._active += 1
+
+            observe_stage('queue_wait', time.monotonic() - enqueued_at)
+
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"Erro no trabalho {job_id}: {e}")
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Substituto do FFmpeg para benchmarks e testes sem o FFmpeg instalado
+
+Aceita as linhas de comando usadas por audio_utils.convert_to_wav (copia
+a entrada para a saída) e audio_utils.decode_to_memory (escreve as
+amostras PCM no stdout). Só funciona com entradas que já são WAV 16 kHz mono
+(como as geradas pelo benchmark).
+
+Uso:
+    FFMPEG_BINARY=scripts/stub_ffmpeg.py python benchmark.py --stub
+"""
+
+import shutil
+import sys
+import wave
+
+
+def main():
+    args = sys.argv[1:]
+    if '-i' not in args or len(args) < 2:
+        print("uso: stub_ffmpeg.py ... -i entrada ... saida", file=sys.stderr)
+        return 1
+    input_path = args[args.index('-i') + 1]
+    output_path = args[-1]
+    try:
+        with wave.open(input_path, 'rb') as wav:
+            if wav.getframerate() != 16000 or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise wave.Error("formato diferente de 16 kHz mono s16le")
+    except (wave.Error, EOFError, OSError) as e:
+        print(f"{input_path}: {e}", file=sys.stderr)
+        return 1
+    if output_path == '-':
+        with wave.open(input_path, 'rb') as wav:
+            sys.stdout.buffer.write(wav.readframes(wav.getnframes()))
+        return 0
+    shutil.copyfile(input_path, output_path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
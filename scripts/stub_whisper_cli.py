@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Substituto do whisper-cli para benchmarks e testes sem o whisper.cpp
+
+Aceita os mesmos argumentos usados pelo WhisperCpp (-m, -f, -l, -t, -bs,
+--output-json...), espera um tempo proporcional à duração do áudio e
+produz um segmento a cada SEGMENT_SECONDS, no stdout (formato do
+whisper-cli) e no arquivo de saída lido pelo wrapper.
+
+O tempo simulado é `STUB_WHISPER_LOAD_SECONDS + duração * fator`, em que o
+fator depende da família do modelo (tiny é o mais rápido) e pode ser
+escalado por STUB_WHISPER_RTF.
+
+Com `-f -`, o WAV é lido do stdin (como no whisper-cli). Os arquivos de
+saída seguem a nomenclatura do whisper-cli: `<entrada>.json` (o nome
+completo, ex: audio.wav.json) ou `<-of>.json` quando `-of` é informado. Com
+`--detect-language`, apenas informa o idioma (STUB_WHISPER_LANGUAGE, padrão
+'pt') no stderr e termina.
+
+Uso:
+    WHISPER_CLI_PATH=scripts/stub_whisper_cli.py python benchmark.py --stub
+"""
+
+import io
+import json
+import os
+import sys
+import time
+import wave
+
+SEGMENT_SECONDS = 5.0
+
+# Fator de tempo real relativo de cada família (large = 1.0)
+FAMILY_FACTORS = {'tiny': 0.05, 'base': 0.1, 'small': 0.25, 'medium': 0.55, 'large': 1.0}
+
+_FLAGS = {'--output-txt', '--output-json', '--output-json-full', '--output-srt', '--output-vtt', '--no-prints', '-fa',
+          '--detect-language'}
+
+
+def parse_args(argv):
+    options = {}
+    flags = set()
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in _FLAGS:
+            flags.add(arg)
+            i += 1
+        else:
+            options[arg] = argv[i + 1] if i + 1 < len(argv) else None
+            i += 2
+    return options, flags
+
+
+def timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def main():
+    options, flags = parse_args(sys.argv[1:])
+    audio_path = options.get('-f')
+    model_path = options.get('-m') or ''
+    if audio_path == '-':
+        audio_file = io.BytesIO(sys.stdin.buffer.read())
+    elif not audio_path or not os.path.exists(audio_path):
+        print(f"error: input file not found '{audio_path}'", file=sys.stderr)
+        return 2
+    if not os.path.exists(model_path):
+        print(f"error: failed to load model '{model_path}'", file=sys.stderr)
+        return 3
+
+    with wave.open(audio_file if audio_path == '-' else audio_path, 'rb') as wav:
+        duration = wav.getnframes() / float(wav.getframerate())
+
+    name = os.path.basename(model_path).replace('ggml-', '').replace('.bin', '')
+    family = name.replace('.', '-').split('-')[0]
+    factor = FAMILY_FACTORS.get(family, 0.5) * float(os.environ.get('STUB_WHISPER_RTF', 0.02))
+    time.sleep(float(os.environ.get('STUB_WHISPER_LOAD_SECONDS', 0.05)))
+
+    if '--detect-language' in flags:
+        language = os.environ.get('STUB_WHISPER_LANGUAGE', 'pt')
+        print(f"whisper_full_with_state: auto-detected language: {language} (p = 0.953125)", file=sys.stderr)
+        return 0
+
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + SEGMENT_SECONDS)
+        time.sleep((end - start) * factor)
+        text = f"segmento {len(segments) + 1} ({name})"
+        segments.append((start, end, text))
+        print(f"[{timestamp(start)} --> {timestamp(end)}]   {text}", flush=True)
+        start = end
+
+    if audio_path == '-':
+        return 0
+    # Como no whisper-cli: '<entrada>.json' (ex: audio.wav.json) ou '<-of>.json'
+    base_name = options.get('-of') or audio_path
+    if '--output-json' in flags or '--output-json-full' in flags:
+        full = '--output-json-full' in flags
+        with open(f"{base_name}.json", 'w', encoding='utf-8') as f:
+            json.dump({'transcription': [
+                dict(
+                    {'offsets': {'from': int(s * 1000), 'to': int(e * 1000)}, 'text': f" {t}"},
+                    **({'tokens': [{'text': f" {word}", 'p': 0.9} for word in t.split()]} if full else {})
+                )
+                for s, e, t in segments
+            ]}, f)
+    elif '--output-txt' in flags:
+        with open(f"{base_name}.txt", 'w', encoding='utf-8') as f:
+            f.write('\n'.join(t for _, _, t in segments))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
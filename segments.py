@@ -0,0 +1,355 @@
+"""
+Segmentos de transcrição em estrutura compacta
+
+SegmentTable guarda os segmentos em colunas (array): início e fim em
+milissegundos, probabilidade média dos tokens (NaN quando o backend não a
+informa) e os textos em um único bloco UTF-8 com deslocamentos. Uma hora de
+áudio (~1000 segmentos) ocupa dezenas de KB, em vez de centenas em JSON, e
+a tabela é gravada uma vez por arquivo transcrito (.seg, ao lado do .txt).
+
+Os formatos de exportação (txt, json, md, srt, vtt) são gerados da tabela
+sob demanda, sem executar o whisper.cpp novamente. Com a diarização, cada
+segmento guarda também o falante, incluído nas exportações.
+
+Formato do arquivo .seg (little-endian):
+    cabeçalho: b'TSEG', versão (u16), colunas opcionais (u16), segmentos (u32)
+    start_ms int32[n], end_ms int32[n]
+    probability float32[n]          (se COLUMN_PROBABILITY)
+    speaker int16[n], -1 sem falante (se COLUMN_SPEAKER)
+    text_offsets uint32[n + 1], textos em UTF-8
+
+Exemplo de uso:
+    table = SegmentTable.from_dicts(result["segments"])
+    table.dump("transcriptions/20250101_transcription.seg")
+    srt = "".join(render(SegmentTable.load(path), "srt"))
+"""
+
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+MAGIC = b'TSEG'
+VERSION = 1
+
+# Colunas opcionais (bits do campo 'colunas' do cabeçalho)
+COLUMN_PROBABILITY = 1
+COLUMN_SPEAKER = 2
+
+_HEADER = struct.Struct('<4sHHI')
+
+EXPORT_FORMATS = ('txt', 'json', 'md', 'srt', 'vtt')
+
+MIMETYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+    'md': 'text/markdown; charset=utf-8',
+    'srt': 'application/x-subrip; charset=utf-8',
+    'vtt': 'text/vtt; charset=utf-8'
+}
+
+# Rótulos dos metadados no cabeçalho do Markdown
+MD_LABELS = {
+    'timestamp': 'Data',
+    'original_file': 'Arquivo Original',
+    'language': 'Idioma',
+    'model': 'Modelo',
+    'duration': 'Duração'
+}
+
+
+class Segment(NamedTuple):
+    start: float
+    end: float
+    text: str
+    probability: Optional[float] = None
+    speaker: Optional[int] = None
+
+
+class SegmentTable:
+    """Segmentos em colunas, com append incremental (usado como callback on_segment)"""
+
+    def __init__(self):
+        self._start = array('i')
+        self._end = array('i')
+        self._probability = array('f')
+        self._speaker = array('h')
+        self._offsets = array('I', [0])
+        self._text = bytearray()
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[Dict[str, Any]]) -> 'SegmentTable':
+        table = cls()
+        for segment in segments:
+            table.append(segment)
+        return table
+
+    @classmethod
+    def from_text(cls, text: str) -> 'SegmentTable':
+        """Texto sem tempos (ex: transcrição editada pelo usuário) como um único segmento"""
+        table = cls()
+        if text:
+            table.append({'start': 0.0, 'end': 0.0, 'text': text})
+        return table
+
+    def append(self, segment: Dict[str, Any]):
+        """Acrescenta um segmento no formato do WhisperCpp ({'start', 'end', 'text', 'probability'})"""
+        probability = segment.get('probability')
+        speaker = segment.get('speaker')
+        self._start.append(int(round((segment.get('start') or 0.0) * 1000)))
+        self._end.append(int(round((segment.get('end') or 0.0) * 1000)))
+        self._probability.append(math.nan if probability is None else probability)
+        self._speaker.append(-1 if speaker is None else speaker)
+        self._text.extend(segment['text'].strip().encode('utf-8'))
+        self._offsets.append(len(self._text))
+
+    def __len__(self) -> int:
+        return len(self._start)
+
+    def __getitem__(self, index: int) -> Segment:
+        if index < 0:
+            index += len(self)
+        probability = self._probability[index]
+        speaker = self._speaker[index]
+        return Segment(
+            self._start[index] / 1000.0,
+            self._end[index] / 1000.0,
+            self._text[self._offsets[index]:self._offsets[index + 1]].decode('utf-8'),
+            None if math.isnan(probability) else round(probability, 4),
+            None if speaker < 0 else speaker
+        )
+
+    def __iter__(self) -> Iterator[Segment]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def text(self) -> str:
+        return ' '.join(segment.text for segment in self).strip()
+
+    @property
+    def timed(self) -> bool:
+        """Se os segmentos têm tempos (False para texto avulso)"""
+        return any(self._end)
+
+    @property
+    def has_probability(self) -> bool:
+        return any(not math.isnan(p) for p in self._probability)
+
+    @property
+    def has_speakers(self) -> bool:
+        return any(speaker >= 0 for speaker in self._speaker)
+
+    def set_speakers(self, speakers: Iterable[Optional[int]]):
+        """Define o falante de cada segmento (resultado da diarização)"""
+        values = array('h', (-1 if speaker is None else speaker for speaker in speakers))
+        if len(values) != len(self):
+            raise ValueError("Um falante por segmento")
+        self._speaker = values
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [segment._asdict() for segment in self]
+
+    def to_bytes(self) -> bytes:
+        columns = COLUMN_PROBABILITY if self.has_probability else 0
+        if self.has_speakers:
+            columns |= COLUMN_SPEAKER
+        parts = [_HEADER.pack(MAGIC, VERSION, columns, len(self))]
+        arrays = [self._start, self._end]
+        if columns & COLUMN_PROBABILITY:
+            arrays.append(self._probability)
+        if columns & COLUMN_SPEAKER:
+            arrays.append(self._speaker)
+        arrays.append(self._offsets)
+        for values in arrays:
+            parts.append(_little_endian(values).tobytes())
+        parts.append(bytes(self._text))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SegmentTable':
+        """
+        Raises:
+            ValueError: Se os dados não forem uma tabela de segmentos válida
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Arquivo de segmentos truncado")
+        magic, version, columns, count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version > VERSION:
+            raise ValueError("Formato de segmentos desconhecido")
+
+        table = cls()
+        offset = _HEADER.size
+        try:
+            offset = _read_array(table._start, data, offset, count)
+            offset = _read_array(table._end, data, offset, count)
+            if columns & COLUMN_PROBABILITY:
+                offset = _read_array(table._probability, data, offset, count)
+            else:
+                table._probability.extend([math.nan] * count)
+            if columns & COLUMN_SPEAKER:
+                offset = _read_array(table._speaker, data, offset, count)
+            else:
+                table._speaker.extend([-1] * count)
+            table._offsets = array('I')
+            offset = _read_array(table._offsets, data, offset, count + 1)
+        except ValueError:
+            raise ValueError("Arquivo de segmentos truncado")
+        table._text = bytearray(data[offset:])
+        if len(table._text) != table._offsets[-1]:
+            raise ValueError("Arquivo de segmentos truncado")
+        return table
+
+    def dump(self, path: str):
+        """Grava a tabela (em um arquivo temporário renomeado ao final)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'SegmentTable':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _read_array(target: array, data: bytes, offset: int, count: int) -> int:
+    end = offset + count * target.itemsize
+    if end > len(data):
+        raise ValueError("dados insuficientes")
+    values = array(target.typecode)
+    values.frombytes(data[offset:end])
+    target.extend(_little_endian(values))
+    return end
+
+
+def segments_filename(transcription_filename: str) -> str:
+    """Nome do arquivo de segmentos de uma transcrição ('x_transcription.txt' → 'x_transcription.seg')"""
+    return f"{os.path.splitext(transcription_filename)[0]}.seg"
+
+
+def format_timestamp(seconds: float, separator: str = '.') -> str:
+    """00:01:02.345 (vtt) ou 00:01:02,345 (srt)"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def speaker_label(speaker: int) -> str:
+    """Rótulo do falante nas exportações ('Falante 1', 'Falante 2', ...)"""
+    return f"Falante {speaker + 1}"
+
+
+def speaker_turns(segments: SegmentTable) -> Iterator[Tuple[Optional[int], str]]:
+    """Segmentos consecutivos do mesmo falante unidos em (falante, texto)"""
+    speaker, texts = None, []
+    for segment in segments:
+        if texts and segment.speaker != speaker:
+            yield speaker, ' '.join(texts)
+            texts = []
+        speaker = segment.speaker
+        texts.append(segment.text)
+    if texts:
+        yield speaker, ' '.join(texts)
+
+
+def render(segments: SegmentTable, fmt: str, info: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Gera a exportação em partes (para gravar ou enviar em streaming)
+
+    Args:
+        segments: Segmentos da transcrição
+        fmt: 'txt', 'json', 'md', 'srt' ou 'vtt'
+        info: Metadados incluídos no json e no cabeçalho do md (ver MD_LABELS)
+
+    Raises:
+        ValueError: Se o formato não existir ou exigir tempos que os segmentos não têm
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    if fmt in ('srt', 'vtt') and not segments.timed:
+        raise ValueError("Legendas exigem os tempos dos segmentos")
+    return _RENDERERS[fmt](segments, info or {})
+
+
+def _render_txt(segments, info):
+    if not segments.has_speakers:
+        yield segments.text
+        return
+    # Um parágrafo por turno de fala
+    for index, (speaker, text) in enumerate(speaker_turns(segments)):
+        label = f"{speaker_label(speaker)}: " if speaker is not None else ''
+        yield ('' if index == 0 else '\n\n') + label + text
+
+
+def _render_json(segments, info):
+    head = dict(info, text=segments.text)
+    if not segments.timed:
+        yield json.dumps(head, ensure_ascii=False, indent=2)
+        return
+    # Segmentos escritos um a um, sem montar a lista inteira
+    yield json.dumps(head, ensure_ascii=False, indent=2)[:-2] + ',\n  "segments": ['
+    for index, segment in enumerate(segments):
+        item = {'start': segment.start, 'end': segment.end, 'text': segment.text}
+        if segment.probability is not None:
+            item['probability'] = segment.probability
+        if segment.speaker is not None:
+            item['speaker'] = speaker_label(segment.speaker)
+        yield ('\n    ' if index == 0 else ',\n    ') + json.dumps(item, ensure_ascii=False)
+    yield '\n  ]\n}'
+
+
+def _render_md(segments, info):
+    yield "# Transcrição de Áudio\n\n"
+    for key, label in MD_LABELS.items():
+        if info.get(key):
+            yield f"**{label}:** {info[key]}\n"
+    yield "\n## Transcrição\n\n"
+    if not segments.timed:
+        yield segments.text
+        return
+    for segment in segments:
+        speaker = f" {speaker_label(segment.speaker)}:" if segment.speaker is not None else ''
+        yield f"**[{format_timestamp(segment.start)[:8]}]{speaker}** {segment.text}\n\n"
+
+
+def _render_srt(segments, info):
+    for index, segment in enumerate(segments, 1):
+        yield (
+            f"{index}\n"
+            f"{format_timestamp(segment.start, ',')} --> {format_timestamp(segment.end, ',')}\n"
+            f"{_speaker_prefix(segment, '[{}] ')}{segment.text}\n\n"
+        )
+
+
+def _render_vtt(segments, info):
+    yield "WEBVTT\n\n"
+    for segment in segments:
+        # Falante como marcação de voz do WebVTT (<v Nome>)
+        yield (f"{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}\n"
+               f"{_speaker_prefix(segment, '<v {}>')}{segment.text}\n\n")
+
+
+def _speaker_prefix(segment, template):
+    return template.format(speaker_label(segment.speaker)) if segment.speaker is not None else ''
+
+
+_RENDERERS = {
+    'txt': _render_txt,
+    'json': _render_json,
+    'md': _render_md,
+    'srt': _render_srt,
+    'vtt': _render_vtt
+}
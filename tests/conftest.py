@@ -0,0 +1,36 @@
+"""
+Configuração comum dos testes
+
+Os testes usam os substitutos de scripts/ (whisper-cli e FFmpeg) e modelos
+com apenas o cabeçalho ggml, então rodam sem o whisper.cpp compilado.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUB_WHISPER_CLI = os.path.join(ROOT, 'scripts', 'stub_whisper_cli.py')
+
+
+@pytest.fixture(scope='session')
+def stub_models(tmp_path_factory):
+    """Diretório com modelos falsos, registrado antes do primeiro uso do registro de modelos"""
+    import benchmark
+
+    models_dir = str(tmp_path_factory.mktemp('models'))
+    benchmark.create_stub_models(models_dir, ['tiny', 'base'])
+    os.environ['WHISPER_MODELS_DIR'] = models_dir
+    os.environ['WHISPER_SERVER'] = '0'
+    return models_dir
+
+
+@pytest.fixture
+def whisper(stub_models):
+    """WhisperCpp apontando para o whisper-cli substituto, sem servidor nem cache"""
+    from whisper_wrapper import WhisperCpp
+
+    return WhisperCpp(model_name='base', whisper_cpp_path=STUB_WHISPER_CLI, use_server=False)
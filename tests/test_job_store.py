@@ -0,0 +1,23 @@
+"""Armazenamento de trabalhos"""
+
+import pytest
+
+from job_store import JobStore, SQLiteJobStore, process_owner
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class PartialStore(JobStore):
+        def get_job(self, job_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+def test_job_owners_lists_unfinished_files(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    store.create_job('b1', kind='batch', total=2)
+    store.add_file('b1', 0, status='processing', owner='outro:1')
+    store.add_file('b1', 1, status='completed', owner=process_owner())
+
+    assert store.get_job_owners('b1') == ['outro:1']
@@ -0,0 +1,65 @@
+"""Agendador: limite de trabalhos simultâneos e empréstimo de slots"""
+
+import threading
+
+from scheduler import JobScheduler
+
+
+def test_borrowed_slots_hold_back_queued_jobs():
+    scheduler = JobScheduler(workers=3, threads_per_job=1)
+    assert scheduler.borrow_idle(5) == 3
+    assert scheduler.borrow_idle(1) == 0
+
+    ran = threading.Event()
+    scheduler.submit('job', ran.set)
+    # Todos os slots emprestados: o trabalho espera na fila
+    assert not ran.wait(0.2)
+    scheduler.release(3)
+    assert ran.wait(2)
+    scheduler.shutdown()
+
+
+def test_borrow_does_not_exceed_free_slots():
+    scheduler = JobScheduler(workers=2, threads_per_job=1)
+    started, finish = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        finish.wait(2)
+
+    scheduler.submit('long', job)
+    assert started.wait(2)
+    assert scheduler.borrow_idle(4) == 1
+    assert scheduler.stats()['reserved'] == 1
+    scheduler.release(1)
+    finish.set()
+    scheduler.shutdown()
+
+
+def test_reservation_waits_ahead_of_queued_jobs():
+    scheduler = JobScheduler(workers=1, threads_per_job=1)
+    finish = threading.Event()
+    ran = threading.Event()
+    scheduler.submit('running', finish.wait, 2)
+    scheduler.submit('queued', ran.set)
+
+    reserved = []
+    waiter = threading.Thread(target=lambda: reserved.append(scheduler.reserve(timeout=2)))
+    waiter.start()
+    finish.set()
+    waiter.join()
+
+    # O slot liberado foi para a reserva, não para o trabalho enfileirado
+    assert reserved == [True]
+    assert not ran.wait(0.2)
+    scheduler.release(1)
+    assert ran.wait(2)
+    scheduler.shutdown()
+
+
+def test_reservation_times_out_without_free_slots():
+    scheduler = JobScheduler(workers=1, threads_per_job=1)
+    assert scheduler.borrow_idle(1) == 1
+    assert scheduler.reserve(timeout=0.1) is False
+    scheduler.release(1)
+    assert scheduler.reserve(timeout=0.1) is True
@@ -0,0 +1,18 @@
+"""Cache de transcrições"""
+
+from transcription_cache import TranscriptionCache
+
+
+def test_language_lookups_do_not_count_as_transcription_hits(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    transcription = cache.make_key('abc', 'base', 'pt', 'json')
+    language = cache.make_key('abc', 'tiny', 'auto', 'language', seconds=30)
+    cache.put(transcription, {'text': 'olá'})
+    cache.put(language, {'language': 'pt', 'probability': 0.9})
+
+    assert cache.get(transcription) == {'text': 'olá'}
+    assert cache.get(language, kind='language')['language'] == 'pt'
+    assert cache.get(cache.make_key('def', 'tiny', 'auto', 'language'), kind='language') is None
+
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.stats()['by_kind'] == {'language': {'hits': 1, 'misses': 1}}
@@ -0,0 +1,70 @@
+"""Transcrição pelo whisper-cli a partir de arquivos (saída gravada em disco)"""
+
+import os
+
+import benchmark
+import whisper_wrapper
+
+
+def test_json_output_is_read_from_cli_file(whisper, tmp_path):
+    audio = str(tmp_path / 'short.wav')
+    benchmark.generate_fixture(audio, 12, seed=1)
+
+    result = whisper.transcribe(audio, language='pt', output_format='json')
+
+    assert result['text']
+    assert len(result['segments']) == 3
+    assert result['segments'][0]['start'] == 0.0
+    # O arquivo de saída do whisper-cli não fica ao lado do áudio
+    assert os.listdir(tmp_path) == ['short.wav']
+
+
+def test_long_audio_chunks_keep_segments(whisper, tmp_path, monkeypatch):
+    monkeypatch.setattr(whisper_wrapper, 'LONG_AUDIO_THRESHOLD', 60)
+    monkeypatch.setattr(whisper_wrapper, 'LONG_AUDIO_CHUNK_SECONDS', 40)
+    audio = str(tmp_path / 'long.wav')
+    benchmark.generate_fixture(audio, 120, seed=2)
+
+    result = whisper.transcribe(audio, language='pt', output_format='json')
+    streamed = list(whisper.transcribe_stream(audio, language='pt'))
+
+    assert result['text']
+    assert result['segments'] and streamed
+    assert [s['text'] for s in streamed] == [s['text'] for s in result['segments']]
+    assert os.listdir(tmp_path) == ['long.wav']
+
+
+def test_token_probabilities_reach_segment_file(whisper, tmp_path):
+    from segments import SegmentTable
+
+    audio = str(tmp_path / 'probability.wav')
+    benchmark.generate_fixture(audio, 12, seed=3)
+
+    result = whisper.transcribe(audio, language='pt', output_format='json')
+    table = SegmentTable.from_dicts(result['segments'])
+    path = str(tmp_path / 'probability.seg')
+    table.dump(path)
+    loaded = SegmentTable.load(path)
+
+    # --output-json-full: média das probabilidades dos tokens de cada segmento
+    assert loaded.has_probability
+    assert [round(segment.probability, 2) for segment in loaded] == [0.9, 0.9, 0.9]
+
+
+def test_profile_change_misses_cache(stub_models, tmp_path, monkeypatch):
+    import model_profiles
+    from conftest import STUB_WHISPER_CLI
+    from transcription_cache import TranscriptionCache
+    from whisper_wrapper import WhisperCpp
+
+    whisper = WhisperCpp(model_name='base', whisper_cpp_path=STUB_WHISPER_CLI, use_server=False,
+                         cache=TranscriptionCache(str(tmp_path / 'cache')))
+    audio = str(tmp_path / 'profile.wav')
+    benchmark.generate_fixture(audio, 12, seed=4)
+    monkeypatch.setattr(model_profiles, '_overrides', {})
+    whisper.transcribe(audio, language='pt', output_format='json')
+    assert whisper.is_cached(audio, language='pt', output_format='json')
+
+    # Beam search diferente altera o texto: a entrada anterior não vale mais
+    monkeypatch.setattr(model_profiles, '_overrides', {'base': {'beam_size': 1}})
+    assert not whisper.is_cached(audio, language='pt', output_format='json')
@@ -0,0 +1,246 @@
+"""
+Cache de transcrições endereçado por conteúdo
+
+Os resultados são indexados pelo hash SHA-256 do áudio decodificado, junto
+com o modelo (caminho, tamanho e data de modificação), o idioma e o formato
+de saída. Reenviar o mesmo arquivo devolve o resultado anterior sem executar
+o whisper.cpp novamente.
+
+Cada entrada é um arquivo JSON em `cache_dir/<2 primeiros caracteres>/<chave>.json`.
+Entradas mais antigas que `max_age` segundos são descartadas e, quando o total
+ultrapassa `max_bytes`, as menos usadas recentemente são removidas.
+
+Exemplo de uso:
+    cache = TranscriptionCache("cache")
+    key = cache.make_key(cache.hash_file("audio.wav"), "ggml-base.bin", "pt", "json")
+    result = cache.get(key)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class TranscriptionCache:
+    """
+    Cache em disco com expiração por idade e limite de tamanho
+
+    Attributes:
+        cache_dir: Diretório das entradas
+        max_bytes: Tamanho máximo total do cache
+        max_age: Idade máxima de uma entrada, em segundos
+        hits: Número de consultas de transcrições atendidas pelo cache
+        misses: Número de consultas de transcrições sem resultado no cache
+        kind_counts: Acertos e falhas das demais entradas, por tipo (ex: 'language'),
+            contados à parte para não distorcer a taxa de acertos das transcrições
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024, max_age: float = 30 * 86400):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.kind_counts: Dict[str, Dict[str, int]] = {}
+
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict] = None  # caminho -> (mtime, tamanho)
+        self._size = 0
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def hash_file(self, path: str) -> str:
+        """
+        Calcula o SHA-256 de um arquivo, lendo-o em blocos
+
+        O resultado é memorizado por (caminho, tamanho, mtime), então consultar
+        o mesmo arquivo na fila e na execução calcula o hash apenas uma vez.
+        """
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        value = digest.hexdigest()
+
+        with self._lock:
+            if len(self._hash_memo) > 4096:
+                self._hash_memo.clear()
+            self._hash_memo[memo_key] = value
+        return value
+
+    def make_key(self, audio_hash: str, model_path: str, language: str, output_format: str, **options) -> str:
+        """
+        Monta a chave de cache
+
+        Substituir o arquivo do modelo (mesmo nome, conteúdo diferente) gera
+        chaves novas, pois o tamanho e a data de modificação fazem parte da chave.
+        Opções adicionais que alteram o resultado podem ser passadas por nome.
+        """
+        try:
+            stat = os.stat(model_path)
+            model_id = f"{os.path.abspath(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+        except OSError:
+            model_id = model_path
+
+        parts = [audio_hash, model_id, language or 'auto', output_format]
+        parts.extend(f"{name}={options[name]}" for name in sorted(options))
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def contains(self, key: str) -> bool:
+        """Verifica se há uma entrada válida, sem alterar contadores nem a ordem de uso"""
+        try:
+            return time.time() - os.stat(self._path(key)).st_mtime <= self.max_age
+        except OSError:
+            return False
+
+    def get(self, key: str, kind: str = 'transcription') -> Optional[Dict[str, Any]]:
+        """Retorna o resultado armazenado ou None (`kind` escolhe os contadores da consulta)"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.max_age:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._count(kind, 'misses')
+            return None
+
+        # Atualizar mtime para a política de "menos usado recentemente"
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._count(kind, 'hits')
+            entries = self._load_entries()
+            if path in entries:
+                entries.move_to_end(path)
+                entries[path] = (time.time(), entries[path][1])
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Armazena um resultado e aplica a política de remoção"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            entries = self._load_entries()
+            if path in entries:
+                self._size -= entries.pop(path)[1]
+            entries[path] = (time.time(), size)
+            self._size += size
+        self.evict()
+
+    def evict(self):
+        """Remove entradas expiradas e as menos usadas até respeitar max_bytes"""
+        now = time.time()
+        to_remove = []
+        with self._lock:
+            entries = self._load_entries()
+            for path, (mtime, size) in list(entries.items()):
+                if now - mtime > self.max_age or self._size > self.max_bytes:
+                    entries.pop(path)
+                    self._size -= size
+                    to_remove.append(path)
+                else:
+                    break
+
+        for path in to_remove:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            entries = self._load_entries()
+            paths = list(entries)
+            entries.clear()
+            self._size = 0
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._load_entries()
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'by_kind': {kind: dict(counts) for kind, counts in self.kind_counts.items()},
+                'entries': len(entries),
+                'size_bytes': self._size
+            }
+
+    def _count(self, kind: str, result: str):
+        if kind == 'transcription':
+            if result == 'hits':
+                self.hits += 1
+            else:
+                self.misses += 1
+            return
+        counts = self.kind_counts.setdefault(kind, {'hits': 0, 'misses': 0})
+        counts[result] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remove(self, path: str):
+        with self._lock:
+            entries = self._load_entries()
+            if path in entries:
+                self._size -= entries.pop(path)[1]
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _load_entries(self) -> OrderedDict:
+        # Varredura única do diretório; depois o índice é mantido em memória
+        if self._entries is not None:
+            return self._entries
+
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+
+        found.sort()
+        self._entries = OrderedDict((path, (mtime, size)) for mtime, path, size in found)
+        self._size = sum(size for _, _, size in found)
+        return self._entries
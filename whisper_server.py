@@ -0,0 +1,417 @@
+"""
+Servidores whisper.cpp residentes
+
+Este módulo mantém processos `whisper-server` (do whisper.cpp) em execução,
+cada um com um modelo já carregado na memória. Assim, vários arquivos curtos
+pagam o custo de carregar o modelo ggml apenas uma vez, em vez de uma vez
+por chamada do `whisper-cli`.
+
+Os servidores são iniciados sob demanda, um ou mais por modelo, e encerrados
+quando ficam ociosos por muito tempo ou quando o processo Python termina.
+
+Configuração via variáveis de ambiente:
+    WHISPER_SERVER: '0' desativa o uso de servidores residentes
+    WHISPER_SERVER_INSTANCES: número máximo de servidores por modelo
+    WHISPER_SERVER_IDLE_TIMEOUT: segundos até encerrar um servidor ocioso
+
+Exemplo de uso:
+    pool = get_server_pool()
+    result = pool.transcribe("ggml-base.bin", "audio.wav", language="pt")
+    print(result["text"])
+"""
+
+import atexit
+import http.client
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Union
+
+from metrics import observe_stage
+from model_profiles import profile_for
+from model_registry import model_name_from_path
+from pcm_audio import PcmAudio
+
+
+class WhisperServerUnavailable(RuntimeError):
+    """Levantada quando não é possível usar um servidor residente"""
+
+
+class WhisperServer:
+    """
+    Processo whisper-server com um modelo carregado
+
+    Attributes:
+        server_path: Caminho para o executável whisper-server
+        model_path: Caminho para o arquivo do modelo .bin
+        threads: Número de threads usadas pelo servidor
+        port: Porta local em que o servidor escuta
+    """
+
+    def __init__(
+        self,
+        server_path: str,
+        model_path: str,
+        threads: Optional[int] = None,
+        host: str = "127.0.0.1"
+    ):
+        self.server_path = server_path
+        self.model_path = model_path
+        self.threads = threads
+        self.host = host
+        self.port = None
+        self.process = None
+        self.last_used = time.monotonic()
+
+    def start(self, timeout: float = 120):
+        """
+        Inicia o processo e aguarda o modelo ser carregado
+
+        Raises:
+            WhisperServerUnavailable: Se o servidor não responder dentro do timeout
+        """
+        self.port = _find_free_port(self.host)
+        cmd = [
+            self.server_path,
+            "-m", self.model_path,
+            "--host", self.host,
+            "--port", str(self.port)
+        ]
+        # Threads e opções de decodificação do perfil do modelo
+        cmd.extend(profile_for(self.model_path).cli_args(self.threads))
+
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise WhisperServerUnavailable(f"Falha ao iniciar whisper-server: {e}")
+
+        started = time.monotonic()
+        deadline = started + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise WhisperServerUnavailable(
+                    f"whisper-server encerrou ao carregar {self.model_path}"
+                )
+            if self._is_ready():
+                self.last_used = time.monotonic()
+                observe_stage('model_load', self.last_used - started, model_name_from_path(self.model_path))
+                return
+            time.sleep(0.2)
+
+        self.stop()
+        raise WhisperServerUnavailable("Timeout ao aguardar o whisper-server")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        """Encerra o processo do servidor"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def inference(
+        self,
+        audio_path: Union[str, PcmAudio],
+        language: str = "auto",
+        response_format: str = "json",
+        timeout: float = 300
+    ) -> Dict[str, Any]:
+        """
+        Envia um arquivo de áudio para o endpoint /inference
+
+        O arquivo é enviado em partes, sem ser carregado inteiro na memória;
+        um PcmAudio é enviado direto do buffer, sem arquivo intermediário.
+
+        Returns:
+            Resposta JSON do servidor (contém a chave 'text')
+        """
+        boundary = uuid.uuid4().hex
+        fields = {
+            "response_format": response_format,
+            "language": language,
+            "temperature": "0.0"
+        }
+
+        head = b""
+        for name, value in fields.items():
+            head += (
+                f"--{boundary}\r\n"
+                f"Content-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                f"{value}\r\n"
+            ).encode("utf-8")
+        in_memory = isinstance(audio_path, PcmAudio)
+        filename = os.path.basename(audio_path.name if in_memory else audio_path)
+        head += (
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"file\"; "
+            f"filename=\"{filename}\"\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        size = audio_path.nbytes if in_memory else os.path.getsize(audio_path)
+        length = len(head) + size + len(tail)
+        started = time.monotonic()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.putrequest("POST", "/inference")
+            conn.putheader("Content-Type", f"multipart/form-data; boundary={boundary}")
+            conn.putheader("Content-Length", str(length))
+            conn.endheaders()
+            conn.send(head)
+            if in_memory:
+                for block in audio_path.iter_wav():
+                    conn.send(block)
+            else:
+                with open(audio_path, "rb") as f:
+                    while True:
+                        chunk = f.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        conn.send(chunk)
+            conn.send(tail)
+
+            response = conn.getresponse()
+            body = response.read().decode("utf-8", errors="replace")
+            if response.status != 200:
+                raise RuntimeError(f"whisper-server retornou {response.status}: {body}")
+        finally:
+            conn.close()
+            self.last_used = time.monotonic()
+        observe_stage('inference', self.last_used - started, model_name_from_path(self.model_path))
+
+        data = json.loads(body)
+        if "error" in data:
+            raise RuntimeError(f"whisper-server: {data['error']}")
+        return data
+
+    def _is_ready(self) -> bool:
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=1)
+            conn.request("GET", "/health")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+        except OSError:
+            return False
+        # Versões antigas do servidor não têm /health; responder já indica que carregou
+        return response.status in (200, 404)
+
+
+class WhisperServerPool:
+    """
+    Conjunto de servidores residentes, indexado pelo caminho do modelo
+
+    Cada modelo pode ter até `max_instances` servidores, permitindo que vários
+    workers do agendador transcrevam em paralelo com o mesmo modelo.
+    """
+
+    def __init__(
+        self,
+        server_path: str,
+        max_instances: int = 1,
+        threads: Optional[int] = None,
+        idle_timeout: float = 600,
+        retry_after: float = 300
+    ):
+        self.server_path = server_path
+        self.max_instances = max(1, max_instances)
+        self.threads = threads
+        self.idle_timeout = idle_timeout
+        self.retry_after = retry_after
+
+        self._servers: Dict[str, List[WhisperServer]] = {}
+        self._idle: Dict[str, List[WhisperServer]] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    def is_available(self) -> bool:
+        return os.path.exists(self.server_path)
+
+    def transcribe(
+        self,
+        model_path: str,
+        audio_path: Union[str, PcmAudio],
+        language: str = "auto",
+        timeout: float = 300,
+        response_format: str = "json"
+    ) -> Dict[str, Any]:
+        """
+        Transcreve usando um servidor com o modelo já carregado
+
+        Raises:
+            WhisperServerUnavailable: Se não houver servidor para o modelo
+        """
+        server = self._acquire(model_path)
+        try:
+            return server.inference(
+                audio_path,
+                language=language,
+                response_format=response_format,
+                timeout=timeout
+            )
+        except Exception:
+            # Servidor em estado desconhecido: descartar em vez de reutilizar
+            self._discard(model_path, server)
+            raise
+        finally:
+            self._release(model_path, server)
+
+    def preload(self, model_path: str):
+        """Inicia um servidor para o modelo antes da primeira requisição"""
+        server = self._acquire(model_path)
+        self._release(model_path, server)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                os.path.basename(path): {
+                    'instances': len(servers),
+                    'idle': len(self._idle.get(path, []))
+                }
+                for path, servers in self._servers.items()
+            }
+
+    def shutdown(self):
+        """Encerra todos os servidores"""
+        with self._condition:
+            servers = [s for group in self._servers.values() for s in group]
+            self._servers.clear()
+            self._idle.clear()
+        for server in servers:
+            server.stop()
+
+    def _acquire(self, model_path: str) -> WhisperServer:
+        if not self.is_available():
+            raise WhisperServerUnavailable(f"whisper-server não encontrado em {self.server_path}")
+
+        with self._condition:
+            failed_at = self._failed_at.get(model_path)
+            if failed_at and time.monotonic() - failed_at < self.retry_after:
+                raise WhisperServerUnavailable(f"whisper-server indisponível para {model_path}")
+
+            self._stop_idle_locked()
+            while True:
+                idle = self._idle.setdefault(model_path, [])
+                while idle:
+                    server = idle.pop()
+                    if server.is_alive():
+                        return server
+                    self._servers[model_path].remove(server)
+
+                servers = self._servers.setdefault(model_path, [])
+                if len(servers) < self.max_instances:
+                    server = WhisperServer(self.server_path, model_path, self.threads)
+                    servers.append(server)
+                    break
+                self._condition.wait()
+
+        # Carregar o modelo fora do lock para não bloquear outros modelos
+        try:
+            server.start()
+        except WhisperServerUnavailable:
+            with self._condition:
+                self._servers[model_path].remove(server)
+                self._failed_at[model_path] = time.monotonic()
+                self._condition.notify_all()
+            raise
+        return server
+
+    def _release(self, model_path: str, server: WhisperServer):
+        with self._condition:
+            if server in self._servers.get(model_path, []):
+                self._idle.setdefault(model_path, []).append(server)
+            self._condition.notify_all()
+
+    def _discard(self, model_path: str, server: WhisperServer):
+        with self._condition:
+            if server in self._servers.get(model_path, []):
+                self._servers[model_path].remove(server)
+        server.stop()
+
+    def _stop_idle_locked(self):
+        now = time.monotonic()
+        for model_path, idle in self._idle.items():
+            for server in list(idle):
+                if now - server.last_used > self.idle_timeout:
+                    idle.remove(server)
+                    self._servers[model_path].remove(server)
+                    server.stop()
+
+
+def _find_free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def server_enabled() -> bool:
+    return os.environ.get('WHISPER_SERVER', '1') != '0'
+
+
+def configure_server_pool(
+    server_path: Optional[str] = None,
+    max_instances: Optional[int] = None,
+    threads: Optional[int] = None
+) -> WhisperServerPool:
+    """
+    Cria (ou recria) o conjunto de servidores compartilhado pelo processo
+
+    Args:
+        server_path: Caminho para o executável whisper-server
+        max_instances: Servidores por modelo (padrão: WHISPER_SERVER_INSTANCES ou 1)
+        threads: Threads por servidor (opção -t)
+    """
+    global _pool
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    server_path = server_path or os.path.join(
+        project_root, "whisper.cpp", "build", "bin", "whisper-server"
+    )
+    if max_instances is None:
+        max_instances = int(os.environ.get('WHISPER_SERVER_INSTANCES', 1))
+    idle_timeout = float(os.environ.get('WHISPER_SERVER_IDLE_TIMEOUT', 600))
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = WhisperServerPool(
+            server_path,
+            max_instances=max_instances,
+            threads=threads,
+            idle_timeout=idle_timeout
+        )
+        return _pool
+
+
+def get_server_pool() -> Optional[WhisperServerPool]:
+    """Retorna o conjunto de servidores do processo, ou None se desativado"""
+    if not server_enabled():
+        return None
+    if _pool is None:
+        configure_server_pool()
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown()
@@ -4,6 +4,11 @@ Wrapper Python para whisper.cpp
 Este módulo fornece uma interface Python para o whisper.cpp, permitindo
 transcrição de áudio usando os modelos Whisper da OpenAI compilados em C++.
 
+O áudio pode ser o caminho de um arquivo ou um PcmAudio já decodificado em
+memória; nesse caso ele é enviado pelo stdin do whisper-cli (ou no corpo da
+requisição ao whisper-server) e os segmentos são lidos do stdout, sem
+arquivos intermediários.
+
 Exemplo de uso:
     whisper = WhisperCpp(model_name="tiny")
     result = whisper.transcribe("audio.wav", language="pt")
@@ -13,8 +18,39 @@ Exemplo de uso:
 import subprocess
 import os
 import json
+import math
+import re
 import tempfile
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Union
+
+import audio_utils
+from pcm_audio import PcmAudio
+from metrics import observe_stage
+from model_profiles import profile_for
+from model_registry import get_model_registry, model_name_from_path
+from whisper_server import WhisperServerUnavailable, get_server_pool
+from transcription_cache import TranscriptionCache
+
+# Arquivos mais longos que LONG_AUDIO_THRESHOLD segundos são divididos em
+# trechos de ~LONG_AUDIO_CHUNK_SECONDS, cortados em silêncios e transcritos em paralelo
+LONG_AUDIO_THRESHOLD = float(os.environ.get('LONG_AUDIO_THRESHOLD', 300))
+LONG_AUDIO_CHUNK_SECONDS = float(os.environ.get('LONG_AUDIO_CHUNK_SECONDS', 120))
+LONG_AUDIO_OVERLAP = 1.0
+# Trechos transcritos ao mesmo tempo quando quem chama não informa: cada
+# trecho é um whisper-cli com `threads` threads, então o padrão é 1 para
+# não ultrapassar o orçamento de núcleos do agendador (o app empresta slots
+# ociosos do JobScheduler para paralelizar)
+LONG_AUDIO_WORKERS = int(os.environ.get('LONG_AUDIO_WORKERS', 1))
+
+# Detecção de idioma: trecho inicial analisado e modelo usado (padrão: o menor multilíngue instalado)
+LANGUAGE_DETECTION_SECONDS = float(os.environ.get('LANGUAGE_DETECTION_SECONDS', 30))
+LANGUAGE_DETECTION_MODEL = os.environ.get('LANGUAGE_DETECTION_MODEL')
+
+# Caminho de um arquivo de áudio ou áudio decodificado em memória
+AudioInput = Union[str, PcmAudio]
 
 class WhisperCpp:
     """
@@ -27,36 +63,43 @@ class WhisperCpp:
         project_root: Diretório raiz do projeto
         whisper_cpp_path: Caminho para o executável whisper-cli
         model_path: Caminho para o arquivo do modelo .bin
+        use_server: Se True, usa servidores whisper-server residentes quando disponíveis
+        cache: Cache de transcrições consultado antes de executar o whisper.cpp (opcional)
     """
     
-    def __init__(self, model_name: str = None, whisper_cpp_path: str = None):
+    def __init__(
+        self,
+        model_name: str = None,
+        whisper_cpp_path: str = None,
+        use_server: bool = True,
+        cache: Optional[TranscriptionCache] = None
+    ):
         """
         Inicializa wrapper do whisper.cpp
 
         Args:
-            model_name: Nome do modelo (ex: 'base', 'tiny', 'small', 'medium', 'large')
+            model_name: Nome do modelo (ex: 'base', 'tiny', 'small', 'medium', 'large',
+                        ou uma variante quantizada como 'base-q5_0')
                         ou caminho completo para o arquivo do modelo .bin
             whisper_cpp_path: Caminho para o executável whisper-cli do whisper.cpp
+            use_server: Se True, envia as transcrições para um whisper-server com o
+                        modelo já carregado, usando o whisper-cli como alternativa
+            cache: Cache de transcrições indexado pelo hash do áudio (opcional)
         """
         self.project_root = os.path.dirname(os.path.abspath(__file__))
+        self.use_server = use_server
+        self.cache = cache
         
-        # Usar o executável 'whisper-cli' atualizado
-        self.whisper_cpp_path = whisper_cpp_path or os.path.join(
+        # Usar o executável 'whisper-cli' atualizado (WHISPER_CLI_PATH permite outro binário)
+        self.whisper_cpp_path = whisper_cpp_path or os.environ.get('WHISPER_CLI_PATH') or os.path.join(
             self.project_root, "whisper.cpp", "build", "bin", "whisper-cli"
         )
 
-        # Construir caminho do modelo
+        # Construir caminho do modelo (nomes curtos são resolvidos pelo registro)
         if model_name is None:
             model_name = "base"
-        
-        # Se model_name já é um caminho completo, use-o diretamente
-        if os.path.isabs(model_name) or model_name.endswith('.bin'):
-            self.model_path = model_name
-        else:
-            # Construa o caminho completo com base no nome do modelo
-            self.model_path = os.path.join(
-                self.project_root, "whisper.cpp", "models", f"ggml-{model_name}.bin"
-            )
+        self.registry = get_model_registry()
+        self.model_path = self.registry.path_for(model_name)
 
         # Verificar se o executável existe
         if not os.path.exists(self.whisper_cpp_path):
@@ -68,45 +111,540 @@ class WhisperCpp:
 
     def transcribe(
         self,
-        audio_path: str,
+        audio_path: AudioInput,
         language: str = "auto",
         model: str = None,
-        output_format: str = "txt"
+        output_format: str = "txt",
+        threads: Optional[int] = None,
+        chunk_workers: Optional[int] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Transcreve arquivo de áudio usando whisper.cpp
 
+        Arquivos WAV mais longos que LONG_AUDIO_THRESHOLD são transcritos em
+        trechos paralelos (ver transcribe_chunked).
+
         Args:
-            audio_path: Caminho para o arquivo de áudio
+            audio_path: Caminho para o arquivo de áudio ou PcmAudio
             language: Idioma do áudio ('pt', 'en', 'auto' para detecção automática)
             model: Caminho para modelo específico (opcional, sobrescreve o modelo padrão)
             output_format: Formato de saída ('txt', 'json', 'srt', 'vtt')
+            threads: Número de threads do whisper.cpp (opção -t, opcional)
+            chunk_workers: Trechos transcritos simultaneamente em arquivos longos
+            use_cache: False ignora o cache (ex: janelas da transcrição ao vivo,
+                que nunca se repetem)
 
         Returns:
             Dicionário com resultado da transcrição contendo a chave 'text'
+            (e 'segments' com início/fim em segundos e a probabilidade média dos
+            tokens, quando o backend a informa, para o formato json; ver
+            segments.SegmentTable)
             
         Raises:
             FileNotFoundError: Se o arquivo de áudio ou modelo não for encontrado
             RuntimeError: Se ocorrer erro na transcrição ou timeout
         """
-        if not os.path.exists(audio_path):
+        self._check_audio(audio_path)
+
+        model_to_use = self.resolve_model(model)
+
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self._cache_key(audio_path, model_to_use, language, output_format)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if output_format in ("txt", "json") and self._is_long_audio(audio_path):
+            result = self.transcribe_chunked(
+                audio_path,
+                language=language,
+                model=model_to_use,
+                threads=threads,
+                workers=chunk_workers
+            )
+            if output_format == "txt":
+                result = {"text": result["text"]}
+        else:
+            result = self._transcribe_with_model(audio_path, language, model_to_use, output_format, threads)
+
+        if cache_key is not None and result.get("text"):
+            self.cache.put(cache_key, result)
+        return result
+
+    def is_cached(
+        self,
+        audio_path: AudioInput,
+        language: str = "auto",
+        model: str = None,
+        output_format: str = "txt"
+    ) -> bool:
+        """
+        Verifica se a transcrição já está no cache, sem transcrever
+
+        Returns:
+            True se houver cache e uma entrada válida para o áudio
+        """
+        if self.cache is None:
+            return False
+        if not isinstance(audio_path, PcmAudio) and not os.path.exists(audio_path):
+            return False
+        key = self._cache_key(audio_path, self.resolve_model(model), language, output_format)
+        return self.cache.contains(key)
+
+    def detect_language(
+        self,
+        audio_path: AudioInput,
+        model: str = None,
+        threads: Optional[int] = None,
+        seconds: float = LANGUAGE_DETECTION_SECONDS
+    ) -> Dict[str, Any]:
+        """
+        Detecta o idioma nos primeiros `seconds` segundos do áudio
+
+        Executa o whisper-cli com --detect-language sobre o trecho inicial (só o
+        encoder e o primeiro passo do decoder), com o menor modelo multilíngue
+        instalado. O resultado fica no cache de transcrições, indexado pelo
+        áudio completo.
+
+        Args:
+            audio_path: Caminho do WAV ou PcmAudio
+            model: Modelo da detecção (padrão: LANGUAGE_DETECTION_MODEL ou o menor multilíngue)
+            threads: Threads do whisper.cpp (opção -t, opcional)
+            seconds: Duração do trecho analisado
+
+        Returns:
+            {'language': 'pt', 'probability': 0.97}
+
+        Raises:
+            FileNotFoundError: Se o áudio ou um modelo multilíngue não for encontrado
+            RuntimeError: Se o whisper.cpp falhar ou não informar o idioma
+        """
+        self._check_audio(audio_path)
+        model_to_use = self.detection_model(model)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._language_cache_key(audio_path, model_to_use, seconds)
+            cached = self.cache.get(cache_key, kind='language')
+            if cached is not None:
+                return cached
+
+        prefix = _audio_prefix(audio_path, seconds)
+        cmd = [self.whisper_cpp_path, "-m", model_to_use, "-f", "-", "-l", "auto", "--detect-language"]
+        cmd.extend(profile_for(model_to_use).cli_args(threads))
+
+        started = time.monotonic()
+        try:
+            # O idioma aparece no log do whisper.cpp (sem --no-prints)
+            process = subprocess.run(
+                cmd,
+                input=b"".join(prefix.iter_wav()),
+                capture_output=True,
+                timeout=120
+            )
+        except subprocess.TimeoutExpired:
+            raise RuntimeError("Timeout na detecção de idioma")
+        except OSError as e:
+            raise RuntimeError(f"Erro na detecção de idioma: {str(e)}")
+        observe_stage('language_detect', time.monotonic() - started, model_name_from_path(model_to_use))
+
+        output = process.stderr.decode("utf-8", "replace") + process.stdout.decode("utf-8", "replace")
+        match = _DETECTED_LANGUAGE.search(output)
+        if process.returncode != 0 or not match:
+            raise RuntimeError(f"Erro na detecção de idioma: {output.strip()[-500:]}")
+
+        result = {"language": match.group(1), "probability": round(float(match.group(2)), 4)}
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+        return result
+
+    def cached_language(
+        self,
+        audio_path: AudioInput,
+        model: str = None,
+        seconds: float = LANGUAGE_DETECTION_SECONDS
+    ) -> Optional[Dict[str, Any]]:
+        """Idioma já detectado para o áudio (do cache), sem executar o whisper.cpp"""
+        if self.cache is None:
+            return None
+        try:
+            self._check_audio(audio_path)
+            key = self._language_cache_key(audio_path, self.detection_model(model), seconds)
+        except FileNotFoundError:
+            return None
+        return self.cache.get(key, kind='language') if self.cache.contains(key) else None
+
+    def _cache_key(self, audio_path: AudioInput, model_to_use: str, language: str, output_format: str) -> str:
+        # As opções de decodificação do perfil (-bs/-bo/-ac/-fa) alteram o texto
+        options = profile_for(model_to_use).result_options()
+        return self.cache.make_key(self._audio_hash(audio_path), model_to_use, language, output_format, **options)
+
+    def _language_cache_key(self, audio_path: AudioInput, model_to_use: str, seconds: float) -> str:
+        return self.cache.make_key(self._audio_hash(audio_path), model_to_use, "auto", "language", seconds=seconds)
+
+    def detection_model(self, model: str = None) -> str:
+        """
+        Caminho do modelo usado na detecção de idioma
+
+        Raises:
+            FileNotFoundError: Se não houver modelo multilíngue instalado
+        """
+        name = model or LANGUAGE_DETECTION_MODEL
+        if name:
+            return self.resolve_model(name)
+        info = self.registry.smallest(multilingual=True)
+        if info is None:
+            raise FileNotFoundError("Nenhum modelo multilíngue instalado para detectar o idioma")
+        return info.path
+
+    def transcribe_chunked(
+        self,
+        audio_path: AudioInput,
+        language: str = "auto",
+        model: str = None,
+        threads: Optional[int] = None,
+        workers: Optional[int] = None,
+        chunk_seconds: float = None,
+        overlap: float = LONG_AUDIO_OVERLAP
+    ) -> Dict[str, Any]:
+        """
+        Transcreve um WAV longo dividindo-o em trechos cortados em silêncios
+
+        Cada trecho começa `overlap` segundos antes do ponto de corte. Os trechos
+        são transcritos em paralelo e os segmentos são reunidos com os tempos
+        corrigidos; segmentos e palavras repetidos na sobreposição são descartados.
+
+        Args:
+            audio_path: WAV PCM 16 bits (saída de audio_utils.convert_to_wav) ou PcmAudio
+            language: Idioma do áudio
+            model: Nome ou caminho do modelo (opcional)
+            threads: Threads do whisper.cpp por trecho
+            workers: Trechos simultâneos (padrão: LONG_AUDIO_WORKERS)
+            chunk_seconds: Duração aproximada de cada trecho
+            overlap: Sobreposição entre trechos, em segundos
+
+        Returns:
+            Dicionário com 'text', 'segments' e 'chunks' (número de trechos)
+        """
+        model_to_use = self.resolve_model(model)
+        boundaries, ranges = self._plan_chunks(audio_path, chunk_seconds or LONG_AUDIO_CHUNK_SECONDS, overlap)
+        segments = list(self._iter_chunked_segments(
+            audio_path, language, model_to_use, threads, workers, boundaries, ranges
+        ))
+
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "chunks": len(ranges)
+        }
+
+    def _plan_chunks(self, audio_path: AudioInput, chunk_seconds: float, overlap: float):
+        """Calcula os pontos de corte e os intervalos (com sobreposição) de cada trecho"""
+        duration = audio_utils.get_wav_duration(audio_path)
+        boundaries = [0.0] + audio_utils.find_split_points(audio_path, chunk_seconds) + [duration]
+        ranges = [
+            (max(0.0, boundaries[i] - (overlap if i else 0.0)), boundaries[i + 1])
+            for i in range(len(boundaries) - 1)
+        ]
+        return boundaries, ranges
+
+    def _iter_chunked_segments(
+        self,
+        audio_path: AudioInput,
+        language: str,
+        model_to_use: str,
+        threads: Optional[int],
+        workers: Optional[int],
+        boundaries: List[float],
+        ranges: List[tuple]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Transcreve os trechos em paralelo e produz os segmentos em ordem
+
+        Os segmentos de um trecho são produzidos assim que ele e todos os
+        anteriores terminam, sem esperar o arquivo inteiro. Com áudio em
+        memória, os trechos são fatias do mesmo buffer, sem arquivos temporários.
+        """
+        workers = max(1, workers or LONG_AUDIO_WORKERS)
+
+        if isinstance(audio_path, PcmAudio):
+            yield from self._merge_chunks(
+                [audio_path.slice(start, end) for start, end in ranges],
+                language, model_to_use, threads, workers, boundaries, ranges
+            )
+            return
+
+        with tempfile.TemporaryDirectory(prefix="chunks_", dir=os.path.dirname(os.path.abspath(audio_path))) as tmp_dir:
+            chunk_paths = audio_utils.split_wav(audio_path, ranges, tmp_dir)
+            yield from self._merge_chunks(
+                chunk_paths, language, model_to_use, threads, workers, boundaries, ranges
+            )
+
+    def _merge_chunks(
+        self,
+        chunks: List[AudioInput],
+        language: str,
+        model_to_use: str,
+        threads: Optional[int],
+        workers: int,
+        boundaries: List[float],
+        ranges: List[tuple]
+    ) -> Iterator[Dict[str, Any]]:
+        """Transcreve os trechos em paralelo e reúne os segmentos, descartando a sobreposição"""
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = [
+                executor.submit(self._transcribe_with_model, chunk, language, model_to_use, "json", threads)
+                for chunk in chunks
+            ]
+
+            previous_words: List[str] = []
+            for i, future in enumerate(futures):
+                chunk_result = future.result()
+                offset = ranges[i][0]
+                nominal_start = boundaries[i]
+                first_in_chunk = True
+                for segment in chunk_result.get("segments", []):
+                    start = segment["start"] + offset
+                    end = segment["end"] + offset
+                    # Segmento contido na sobreposição já foi transcrito pelo trecho anterior
+                    if i and (start + end) / 2 < nominal_start:
+                        continue
+                    text = segment["text"].strip()
+                    if i and first_in_chunk:
+                        text = _strip_repeated_prefix(previous_words, text)
+                    first_in_chunk = False
+                    if not text:
+                        continue
+                    previous_words = text.split()[-8:]
+                    yield {"start": round(start, 3), "end": round(end, 3), "text": text}
+
+    def transcribe_stream(
+        self,
+        audio_path: AudioInput,
+        language: str = "auto",
+        model: str = None,
+        threads: Optional[int] = None,
+        timeout: float = 300,
+        chunk_workers: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Transcreve produzindo os segmentos à medida que o whisper.cpp os decodifica
+
+        Executa o whisper-cli com Popen e lê a saída linha a linha, no formato
+        "[00:00:01.000 --> 00:00:04.000]  texto". Arquivos longos são
+        transcritos em trechos paralelos e produzidos em ordem. O resultado
+        completo é gravado no cache (formato json) ao final.
+
+        Args:
+            audio_path: Caminho para o arquivo de áudio ou PcmAudio
+            language: Idioma do áudio
+            model: Nome ou caminho do modelo (opcional)
+            threads: Número de threads do whisper.cpp
+            timeout: Tempo máximo sem concluir a transcrição, em segundos
+            chunk_workers: Trechos transcritos simultaneamente em arquivos longos
+
+        Yields:
+            Dicionários com 'start', 'end' (segundos) e 'text'
+
+        Raises:
+            FileNotFoundError: Se o arquivo de áudio ou modelo não for encontrado
+            RuntimeError: Se ocorrer erro na transcrição ou timeout
+        """
+        self._check_audio(audio_path)
+
+        model_to_use = self.resolve_model(model)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(audio_path, model_to_use, language, "json")
+            cached = self.cache.get(cache_key)
+            if cached is not None and "segments" in cached:
+                yield from cached["segments"]
+                return
+
+        segments = []
+        if self._is_long_audio(audio_path):
+            boundaries, ranges = self._plan_chunks(audio_path, LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_OVERLAP)
+            source = self._iter_chunked_segments(
+                audio_path, language, model_to_use, threads, chunk_workers, boundaries, ranges
+            )
+        else:
+            source = self._stream_cli(audio_path, language, model_to_use, threads, timeout)
+
+        for segment in source:
+            segments.append(segment)
+            yield segment
+
+        if cache_key is not None and segments:
+            self.cache.put(cache_key, {
+                "text": " ".join(segment["text"] for segment in segments),
+                "segments": segments
+            })
+
+    def _stream_cli(
+        self,
+        audio_path: AudioInput,
+        language: str,
+        model_to_use: str,
+        threads: Optional[int],
+        timeout: float
+    ) -> Iterator[Dict[str, Any]]:
+        # Áudio em memória: o whisper-cli lê o WAV do stdin ('-f -')
+        in_memory = isinstance(audio_path, PcmAudio)
+        cmd = [self.whisper_cpp_path, "-m", model_to_use, "-f", "-" if in_memory else audio_path]
+        if language != "auto":
+            cmd.extend(["-l", language])
+        cmd.extend(profile_for(model_to_use).cli_args(threads))
+        cmd.append("--no-prints")
+
+        started = time.monotonic()
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if in_memory else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1
+            )
+        except OSError as e:
+            raise RuntimeError(f"Erro na transcrição: {str(e)}")
+
+        # O timeout é aplicado por um timer, já que a leitura do stdout bloqueia
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill_on_timeout)
+        timer.daemon = True
+        timer.start()
+        stderr_lines: List[str] = []
+        stderr_reader = threading.Thread(
+            target=lambda: stderr_lines.extend(process.stderr),
+            daemon=True
+        )
+        stderr_reader.start()
+        if in_memory:
+            threading.Thread(
+                target=_write_stdin,
+                args=(process, audio_path),
+                name="whisper-stdin",
+                daemon=True
+            ).start()
+
+        try:
+            for line in process.stdout:
+                match = _SEGMENT_LINE.match(line.strip())
+                if match:
+                    yield {
+                        "start": _parse_timestamp(match.group(1)),
+                        "end": _parse_timestamp(match.group(2)),
+                        "text": match.group(3).strip()
+                    }
+            process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_reader.join(timeout=1)
+        observe_stage('inference', time.monotonic() - started, model_name_from_path(model_to_use))
+
+        if timed_out.is_set():
+            raise RuntimeError(f"Timeout na transcrição ({int(timeout // 60)} minutos)")
+        if process.returncode != 0:
+            raise RuntimeError(f"Erro na transcrição: {''.join(stderr_lines)}")
+
+    def _is_long_audio(self, audio_path: AudioInput) -> bool:
+        if not LONG_AUDIO_THRESHOLD:
+            return False
+        if isinstance(audio_path, PcmAudio):
+            return audio_path.duration > LONG_AUDIO_THRESHOLD
+        if not audio_path.lower().endswith(".wav"):
+            return False
+        try:
+            return audio_utils.get_wav_duration(audio_path) > LONG_AUDIO_THRESHOLD
+        except Exception:
+            return False
+
+    def _check_audio(self, audio_path: AudioInput):
+        if not isinstance(audio_path, PcmAudio) and not os.path.exists(audio_path):
             raise FileNotFoundError(f"Arquivo de áudio não encontrado: {audio_path}")
 
-        # Usar modelo específico se fornecido
-        model_to_use = model or self.model_path
+    def _audio_hash(self, audio_path: AudioInput) -> str:
+        if isinstance(audio_path, PcmAudio):
+            return audio_path.sha256()
+        return self.cache.hash_file(audio_path)
+
+    def resolve_model(self, model: str = None) -> str:
+        """
+        Resolve um nome curto ('base', 'tiny') ou caminho para o arquivo do modelo
 
+        Raises:
+            FileNotFoundError: Se o modelo não for encontrado
+        """
+        # Usar modelo específico se fornecido (nomes curtos como 'base' e 'tiny')
         if model:
-            # Permitir nomes curtos como 'base' e 'tiny'
-            if not (os.path.isabs(model) or model.endswith('.bin')):
-                candidate = os.path.join(
-                    self.project_root, "whisper.cpp", "models", f"ggml-{model}.bin"
-                )
-                if os.path.exists(candidate):
-                    model_to_use = candidate
-                else:
-                    raise FileNotFoundError(f"Modelo não encontrado: {candidate}")
-            elif not os.path.exists(model_to_use):
-                raise FileNotFoundError(f"Modelo não encontrado: {model_to_use}")
+            return self.registry.resolve(model)
+        return self.model_path
+
+    def _transcribe_with_model(
+        self,
+        audio_path: AudioInput,
+        language: str,
+        model_to_use: str,
+        output_format: str,
+        threads: Optional[int]
+    ) -> Dict[str, Any]:
+        # Servidor residente: o modelo já está carregado na memória
+        if self.use_server and output_format in ("txt", "json"):
+            pool = get_server_pool()
+            if pool is not None and pool.is_available():
+                try:
+                    data = pool.transcribe(
+                        model_to_use,
+                        audio_path,
+                        language=language,
+                        response_format="verbose_json"
+                    )
+                    result = {"text": data.get("text", "").strip()}
+                    if output_format == "json":
+                        result["segments"] = [
+                            {
+                                "start": float(segment.get("start", 0.0)),
+                                "end": float(segment.get("end", 0.0)),
+                                "text": segment.get("text", "").strip(),
+                                "probability": _server_segment_probability(segment)
+                            }
+                            for segment in data.get("segments", [])
+                        ]
+                    return result
+                except WhisperServerUnavailable:
+                    pass
+                except Exception as e:
+                    print(f"whisper-server falhou, usando whisper-cli: {e}")
+
+        if isinstance(audio_path, PcmAudio):
+            if output_format in ("txt", "json"):
+                # Segmentos lidos do stdout, sem arquivo de saída
+                segments = list(self._stream_cli(audio_path, language, model_to_use, threads, timeout=300))
+                result = {"text": " ".join(segment["text"] for segment in segments).strip()}
+                if output_format == "json":
+                    result["segments"] = segments
+                return result
+            # srt/vtt são gerados pelo whisper-cli a partir de um arquivo
+            with tempfile.TemporaryDirectory(prefix="pcm_") as tmp_dir:
+                path = os.path.join(tmp_dir, "audio.wav")
+                with open(path, "wb") as f:
+                    for block in audio_path.iter_wav():
+                        f.write(block)
+                return self._transcribe_with_model(path, language, model_to_use, output_format, threads)
 
         # Construir comando baseado na API do whisper.cpp main
         cmd = [
@@ -119,11 +657,16 @@ class WhisperCpp:
         if language != "auto":
             cmd.extend(["-l", language])
 
+        # Threads (limitadas para não disputar núcleos com outros trabalhos),
+        # busca do decodificador e demais opções do perfil do modelo
+        cmd.extend(profile_for(model_to_use).cli_args(threads))
+
         # Adicionar formato de saída
         if output_format == "txt":
             cmd.append("--output-txt")
         elif output_format == "json":
-            cmd.append("--output-json")
+            # JSON completo: inclui os tokens com suas probabilidades
+            cmd.append("--output-json-full")
         elif output_format == "srt":
             cmd.append("--output-srt")
         elif output_format == "vtt":
@@ -132,36 +675,41 @@ class WhisperCpp:
         # Desabilitar prints desnecessários
         cmd.append("--no-prints")
 
+        # Arquivo de saída em um diretório temporário: sem -of, o whisper-cli
+        # grava '<entrada>.<formato>' (ex: audio.wav.json) ao lado do áudio
+        with tempfile.TemporaryDirectory(prefix="whisper_out_") as out_dir:
+            output_base = os.path.join(out_dir, "out")
+            cmd.extend(["-of", output_base])
+            return self._run_cli(cmd, model_to_use, output_format, output_base)
+
+    def _run_cli(
+        self,
+        cmd: List[str],
+        model_to_use: str,
+        output_format: str,
+        output_base: str
+    ) -> Dict[str, Any]:
+        """Executa o whisper-cli e lê o resultado de '<output_base>.<formato>' (ou do stdout)"""
         try:
-            # Executar whisper.cpp
+            # Executar whisper.cpp (o tempo inclui o carregamento do modelo)
+            started = time.monotonic()
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
                 timeout=300  # 5 minutos timeout
             )
+            observe_stage('inference', time.monotonic() - started, model_name_from_path(model_to_use))
 
             if result.returncode != 0:
                 raise RuntimeError(f"Erro na transcrição: {result.stderr}")
 
-            # O whisper.cpp main cria arquivos de saída automaticamente
-            # baseado no nome do arquivo de entrada
-            base_name = os.path.splitext(audio_path)[0]
-            
             text = ""
-            
-            if output_format == "txt":
-                output_file = f"{base_name}.txt"
-            elif output_format == "json":
-                output_file = f"{base_name}.json"
-            elif output_format == "srt":
-                output_file = f"{base_name}.srt"
-            elif output_format == "vtt":
-                output_file = f"{base_name}.vtt"
-            else:
-                output_file = f"{base_name}.txt"
+            segments = None
+            extension = output_format if output_format in ("txt", "json", "srt", "vtt") else "txt"
+            output_file = f"{output_base}.{extension}"
 
-            # Ler resultado do arquivo criado
+            # Ler resultado do arquivo criado (removido junto com o diretório temporário)
             if os.path.exists(output_file):
                 with open(output_file, 'r', encoding='utf-8') as f:
                     if output_format == "json":
@@ -169,24 +717,32 @@ class WhisperCpp:
                             json_data = json.load(f)
                             # Extrair texto dos segmentos JSON
                             if 'transcription' in json_data:
-                                segments = json_data['transcription']
-                                text = ' '.join([segment.get('text', '') for segment in segments])
+                                raw_segments = json_data['transcription']
+                                text = ' '.join([segment.get('text', '') for segment in raw_segments])
+                                segments = [
+                                    {
+                                        "start": segment.get('offsets', {}).get('from', 0) / 1000.0,
+                                        "end": segment.get('offsets', {}).get('to', 0) / 1000.0,
+                                        "text": segment.get('text', '').strip(),
+                                        "probability": _mean_probability(
+                                            token.get('p') for token in segment.get('tokens', [])
+                                            if not token.get('text', '').startswith('[_')
+                                        )
+                                    }
+                                    for segment in raw_segments
+                                ]
                             else:
                                 text = str(json_data)
                         except json.JSONDecodeError:
                             text = f.read()
                     else:
                         text = f.read()
-                
-                # Limpar arquivo de saída
-                try:
-                    os.unlink(output_file)
-                except:
-                    pass
             else:
                 # Se não encontrou arquivo de saída, usar stdout
                 text = result.stdout
 
+            if segments is not None:
+                return {"text": text.strip(), "segments": segments}
             return {"text": text.strip()}
 
         except subprocess.TimeoutExpired:
@@ -198,32 +754,13 @@ class WhisperCpp:
         """
         Lista modelos disponíveis no diretório de modelos
 
+        O diretório só é relido quando muda (ver model_registry). Versões como
+        'large-v3' também ficam acessíveis pelo nome curto ('large').
+
         Returns:
             Dicionário com nome e caminho dos modelos
         """
-        models_dir = os.path.join(self.project_root, "whisper.cpp", "models")
-        models = {}
-
-        if os.path.exists(models_dir):
-            for file in os.listdir(models_dir):
-                if file.endswith('.bin') and file.startswith('ggml-'):
-                    # Remove 'ggml-' prefix and '.bin' suffix
-                    name = file.replace('ggml-', '').replace('.bin', '')
-                    
-                    # Extract base model name (handle versioned models like large-v1, large-v2, etc.)
-                    base_name = name.split('-')[0] if '-' in name else name
-                    
-                    # Map to base name if it's a standard model with version
-                    # This allows 'large-v1' to be accessible as 'large'
-                    if base_name in ['tiny', 'base', 'small', 'medium', 'large']:
-                        # Use base name for standard models (prefer latest version)
-                        if base_name not in models:
-                            models[base_name] = os.path.join(models_dir, file)
-                    
-                    # Also add the full name for direct access
-                    models[name] = os.path.join(models_dir, file)
-
-        return models
+        return {name: info.path for name, info in self.registry.models().items()}
 
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -232,13 +769,84 @@ class WhisperCpp:
         Returns:
             Dicionário com informações do modelo
         """
+        info = self.registry.get(self.model_path)
         return {
             "model_path": self.model_path,
             "model_name": os.path.basename(self.model_path).replace('ggml-', '').replace('.bin', ''),
+            "quantization": info.quantization if info else None,
             "whisper_cli_path": self.whisper_cpp_path,
             "available_models": self.list_models()
         }
 
+# Linha de segmento impressa pelo whisper-cli: "[00:00:01.000 --> 00:00:04.000]  texto"
+_SEGMENT_LINE = re.compile(r'^\[(\d+:\d+:\d+[.,]\d+) --> (\d+:\d+:\d+[.,]\d+)\]\s*(.*)$')
+
+# Linha do log do whisper.cpp: "auto-detected language: en (p = 0.983429)"
+_DETECTED_LANGUAGE = re.compile(r'auto-detected language: (\w+) \(p = ([\d.]+)\)')
+
+
+def _mean_probability(values) -> Optional[float]:
+    """Média das probabilidades dos tokens do segmento (None se o backend não as informa)"""
+    values = [float(v) for v in values if v is not None]
+    if not values:
+        return None
+    return round(sum(values) / len(values), 4)
+
+
+def _server_segment_probability(segment: Dict[str, Any]) -> Optional[float]:
+    """Probabilidade do segmento na resposta verbose_json do whisper-server"""
+    probability = _mean_probability(word.get("probability") for word in segment.get("words") or [])
+    if probability is None and segment.get("avg_logprob") is not None:
+        probability = round(math.exp(float(segment["avg_logprob"])), 4)
+    return probability
+
+
+def _audio_prefix(audio_path: AudioInput, seconds: float) -> PcmAudio:
+    """Primeiros `seconds` segundos do áudio em memória (fatia sem cópia de um PcmAudio)"""
+    if isinstance(audio_path, PcmAudio):
+        return audio_path.slice(0, seconds)
+    with audio_utils.open_wav(audio_path) as wav:
+        data = wav.readframes(int(seconds * wav.getframerate()))
+    return PcmAudio(data, name=audio_path)
+
+
+def _write_stdin(process: subprocess.Popen, audio: PcmAudio):
+    """Escreve o WAV no stdin do whisper-cli (em uma thread, enquanto o stdout é lido)"""
+    try:
+        # stdin em modo texto (text=True no Popen): escrever no buffer binário
+        for block in audio.iter_wav():
+            process.stdin.buffer.write(block)
+    except (BrokenPipeError, OSError, ValueError):
+        # O processo terminou antes de ler tudo (erro ou timeout), tratado por quem lê
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def _parse_timestamp(value: str) -> float:
+    hours, minutes, seconds = value.replace(',', '.').split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _strip_repeated_prefix(previous_words: List[str], text: str) -> str:
+    """Remove do início de `text` as palavras que repetem o final do trecho anterior"""
+    if not previous_words:
+        return text
+    words = text.split()
+
+    def normalize(word):
+        return re.sub(r'\W+', '', word.lower())
+
+    tail = [normalize(w) for w in previous_words]
+    head = [normalize(w) for w in words]
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == head[:size]:
+            return " ".join(words[size:])
+    return text
+
 # Função de conveniência para uso rápido
 def transcribe_audio(audio_path: str, language: str = "auto", model: str = None) -> str:
     """
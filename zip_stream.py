@@ -0,0 +1,84 @@
+"""
+Arquivos ZIP gerados em streaming
+
+O zipfile grava em um buffer que não permite seek; nesse modo cada entrada é
+seguida de um descritor de dados (tamanhos e CRC conhecidos só ao final) e o
+diretório central é escrito no fechamento. Os bytes são retirados do buffer a
+cada escrita e enviados ao cliente, então a memória usada não depende do
+número nem do tamanho dos arquivos (apenas do diretório central, ~100 bytes
+por entrada).
+
+Exemplo de uso:
+    entries = [("01_aula.txt", open_chunks("transcriptions/x.txt"))]
+    return Response(stream_zip(entries), mimetype=ZIP_MIMETYPE)
+"""
+
+import io
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple, Union
+
+ZIP_MIMETYPE = 'application/zip'
+
+# Tamanho dos blocos lidos dos arquivos em disco
+READ_BLOCK_SIZE = 64 * 1024
+
+Chunk = Union[bytes, str]
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Destino do zipfile: acumula o que foi escrito até ser drenado"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def open_chunks(path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """Conteúdo de um arquivo em blocos, aberto apenas quando a entrada é gravada"""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def stream_zip(
+    entries: Iterable[Tuple[str, Iterable[Chunk]]],
+    compression: int = zipfile.ZIP_DEFLATED
+) -> Iterator[bytes]:
+    """
+    Gera um ZIP em partes a partir de (nome, partes do conteúdo)
+
+    As partes de texto são gravadas em UTF-8. Entradas e conteúdos são
+    consumidos sob demanda, à medida que o cliente lê a resposta.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = compression
+            with archive.open(info, 'w') as dest:
+                for chunk in chunks:
+                    dest.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    data = buffer.drain()
+    if data:
+        yield data